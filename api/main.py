@@ -1,28 +1,46 @@
 import asyncio
+import json
 import os
+import tempfile
 from datetime import datetime
 from random import uniform
-from typing import List
-from collections import deque
+from typing import List, Optional
 
-import pandas as pd
 from dotenv import load_dotenv
-from fastapi import Depends, FastAPI, HTTPException, WebSocket, WebSocketDisconnect
+from fastapi import (
+    Depends,
+    FastAPI,
+    HTTPException,
+    Query,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from pydantic import BaseModel, Field
+from starlette.background import BackgroundTask
 
-from core.brokers_api import (
-    get_binance_candles,
-    get_historical_klines,
-    get_historical_klines_from_kucoin,
-    get_kucoin_candles,
-)
-from core.strategiez.src_to_rafactor import (
-    backtest_signals,
-    calculate_indicator_signals,
-    generate_signals,
-)
+from core.journal import SignalJournal
+from core.lazy import lazy_import, warm_up
+from core.ws_sender import ClientSender
+
+# Heavy modules are imported on first use (or by the startup warm-up) so the
+# process accepts connections as soon as possible after a restart
+pd = lazy_import("pandas")
+brokers = lazy_import("core.brokers_api")
+screening = lazy_import("core.screener")
+streaming = lazy_import("core.strategiez.streaming")
+execution = lazy_import("core.strategiez.execution")
+strategies = lazy_import("core.strategiez.src_to_rafactor")
+streams = lazy_import("core.streams")
+incremental = lazy_import("core.strategiez.incremental")
+consistency = lazy_import("core.strategiez.consistency")
+orderbooks = lazy_import("core.orderbook")
+tradeflow = lazy_import("core.trades")
+exchanges = lazy_import("core.exchanges")
+portfolio = lazy_import("core.strategiez.portfolio")
+jobs = lazy_import("core.jobs")
 
 load_dotenv()
 
@@ -40,6 +58,21 @@ app.add_middleware(
 # Define paths
 BASE_DIR = os.path.dirname(os.path.abspath(__file__))
 HISTORICAL_DATA_PATH = os.path.join(BASE_DIR, "tests", "Historical_data.csv")
+# Uploads bigger than this are spooled to disk by /calculate/stream
+UPLOAD_SPOOL_SIZE = 16 * 1024 * 1024
+# Max random delay (seconds) before connecting to the exchange streams, so that
+# restarted workers don't all reconnect at the same instant
+STREAM_CONNECT_JITTER = float(os.environ.get("STREAM_CONNECT_JITTER", 5))
+SIGNAL_JOURNAL_PATH = os.environ.get(
+    "SIGNAL_JOURNAL_PATH", os.path.join(os.path.dirname(BASE_DIR), "data", "signals.db")
+)
+JOBS_DB_PATH = os.environ.get(
+    "JOBS_DB_PATH", os.path.join(os.path.dirname(BASE_DIR), "data", "jobs.db")
+)
+# Worker processes of the background jobs
+JOB_WORKERS = int(os.environ.get("JOB_WORKERS", 2))
+# Seconds between two progress checks of /ws/jobs
+JOB_POLL_INTERVAL = 0.5
 
 
 class CalculateRequest(BaseModel):
@@ -53,11 +86,24 @@ class GenerateRequest(BaseModel):
     price_data: list
 
 
+class ExecutionSettings(BaseModel):
+    maker_fee: float = Field(0.001, example=0.001)
+    taker_fee: float = Field(0.001, example=0.001)
+    spread: float = Field(0.0, example=0.0002)
+    slippage: float = Field(0.0, example=0.0005)
+    position_size: float = Field(1.0, example=0.25)
+    stop_loss: Optional[float] = Field(None, example=0.02)
+    take_profit: Optional[float] = Field(None, example=0.04)
+    side: str = Field("LONG", example="BOTH")
+
+
 class BacktestRequest(BaseModel):
     price_data: list
     buy_signals: list
     sell_signals: list
     initial_balance: float = 10000.0
+    # Without it, the legacy one-unit/no-fee backtest is used
+    execution: Optional[ExecutionSettings] = None
 
 
 class Strategy(BaseModel):
@@ -67,6 +113,31 @@ class Strategy(BaseModel):
     side: str = Field(..., example="LONG")
 
 
+class JobRequest(BaseModel):
+    kind: str = Field(..., example="walk_forward")
+    # Missing inputs (api, symbol, interval, limit, strategies) come from the settings
+    params: dict = Field(
+        default_factory=dict, example={"windows": [10, 20, 50], "lookbacks": [2, 3]}
+    )
+    # Run again even if the same job already finished
+    refresh: bool = False
+    # Unix time before which the job isn't started
+    not_before: Optional[float] = None
+
+
+class PortfolioBacktestRequest(BaseModel):
+    symbols: List[str] = Field(..., examples=[["BTC-USDT", "ETH-USDT", "SOL-USDT"]])
+    # Candles per symbol; fetched with the current settings (api, interval, limit) if omitted
+    price_data: Optional[dict] = None
+    # Defaults to the strategies of the current settings
+    strategies: Optional[List[Strategy]] = None
+    initial_balance: float = 10000.0
+    execution: Optional[ExecutionSettings] = None
+    max_symbol_exposure: float = Field(0.25, example=0.25)
+    max_gross_exposure: float = Field(1.0, example=1.0)
+    max_positions: Optional[int] = Field(None, example=20)
+
+
 # Define your settings model
 class Settings(BaseModel):
     symbol: str = Field(..., example="BTC-USDT")
@@ -83,11 +154,19 @@ class Settings(BaseModel):
                 },
             }]
     )
+    # Universe watched by the screener (KuCoin symbols), empty disables it
+    screener_symbols: List[str] = Field(
+        default_factory=list, examples=[["BTC-USDT", "ETH-USDT", "SOL-USDT"]]
+    )
+    # Symbols with a live L2 order book and trade flow (KuCoin), empty disables it
+    market_data_symbols: List[str] = Field(
+        default_factory=list, examples=[["BTC-USDT"]]
+    )
 
 
 # Initialize settings in app.state on startup
 @app.on_event("startup")
-def startup_event():
+async def startup_event():
     # initial settings; adjust as needed
     app.state.settings = Settings(
         symbol="BTC-USDT",
@@ -105,6 +184,54 @@ def startup_event():
         ],
         api="kucoin",
     )
+    app.state.warm = False
+    app.state.screener = None
+    app.state.screener_task = None
+    app.state.ws_senders = set()
+    app.state.journal = SignalJournal(SIGNAL_JOURNAL_PATH)
+    # Created by warm_up_app, they need the heavy modules
+    app.state.jobs = None
+    app.state.candle_hub = None
+    app.state.books = {}
+    app.state.trade_flows = {}
+    app.state.market_data_tasks = []
+    app.state.warm_up_task = asyncio.create_task(warm_up_app())
+
+
+@app.on_event("shutdown")
+def shutdown_event():
+    # Commit the signals still queued
+    app.state.journal.close()
+    # Running jobs are queued again on the next start
+    if app.state.jobs is not None:
+        app.state.jobs.close()
+
+
+async def warm_up_app():
+    """Import the heavy modules off the event loop, then start the streams."""
+    await asyncio.to_thread(
+        warm_up,
+        pd,
+        brokers,
+        screening,
+        streaming,
+        execution,
+        strategies,
+        streams,
+        exchanges,
+        jobs,
+        portfolio,
+    )
+    app.state.candle_hub = streams.CandleHub(stream_candles, history=get_stream_history)
+    app.state.jobs = await asyncio.to_thread(
+        jobs.JobManager,
+        JOBS_DB_PATH,
+        JOB_WORKERS,
+        context={"journal_path": SIGNAL_JOURNAL_PATH},
+    )
+    app.state.warm = True
+    start_screener(app.state.settings)
+    start_market_data(app.state.settings)
 
 
 # Dependency that returns the settings
@@ -112,6 +239,48 @@ def get_settings() -> Settings:
     return app.state.settings
 
 
+# Dependency that returns the job manager, once warmed up
+def get_jobs():
+    if app.state.jobs is None:
+        raise HTTPException(status_code=503, detail="Jobs are starting")
+    return app.state.jobs
+
+
+@app.get("/health")
+def health():
+    """Liveness probe: the process is up and serving requests."""
+    return {"status": "ok"}
+
+
+def streams_warm() -> bool:
+    """
+    True once every configured stream has data: the screener is seeded, the
+    order books are synced and the trade and candle feeds have streamed.
+    """
+    screener = app.state.screener
+    hub = app.state.candle_hub
+    return (
+        screener is not None
+        and screener.ready
+        and hub is not None
+        and hub.ready
+        and all(book.sequence is not None for book in app.state.books.values())
+        and all(flow.current() is not None for flow in app.state.trade_flows.values())
+    )
+
+
+@app.get("/ready")
+def ready():
+    """Readiness probe: heavy modules are imported and the streams are warm."""
+    status = {
+        "modules_loaded": app.state.warm,
+        "streams_warm": streams_warm(),
+    }
+    if not all(status.values()):
+        raise HTTPException(status_code=503, detail=status)
+    return {"ready": True, **status}
+
+
 # Endpoint to retrieve settings using DI
 @app.get("/settings")
 def read_settings(settings: Settings = Depends(get_settings)):
@@ -120,40 +289,389 @@ def read_settings(settings: Settings = Depends(get_settings)):
 
 # Endpoint to update the settings using DI
 @app.post("/settings")
-def update_settings(new_settings: Settings):
+async def update_settings(new_settings: Settings):
+    # The feeds restarted below need known symbols and interval
+    try:
+        for symbol in new_settings.screener_symbols + new_settings.market_data_symbols:
+            exchanges.normalize_symbol(symbol)
+        exchanges.normalize_interval(new_settings.interval)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    old_settings = app.state.settings
     app.state.settings = new_settings
+    # Before the warm-up is done, it will start the screener with the new settings
+    if app.state.warm and (
+        new_settings.screener_symbols != old_settings.screener_symbols
+        or new_settings.interval != old_settings.interval
+        or new_settings.strategies[0].params != old_settings.strategies[0].params
+    ):
+        start_screener(new_settings)
+    if app.state.warm and (
+        new_settings.market_data_symbols != old_settings.market_data_symbols
+        or new_settings.interval != old_settings.interval
+    ):
+        start_market_data(new_settings)
     return {"message": "Settings updated successfully"}
 
 
+async def run_screener_feed(screener: "screening.Screener", settings: Settings):
+    """Seed the screener from history, then keep it updated from the live candles."""
+    # Don't hammer the REST API with hundreds of requests at once
+    semaphore = asyncio.Semaphore(8)
+
+    exchange = exchanges.get_exchange(settings.api)
+
+    async def seed(symbol):
+        async with semaphore:
+            candles = await asyncio.to_thread(
+                exchange.history_candles, symbol, settings.interval, settings.limit
+            )
+        # The last candle is still in progress, it comes again from the stream
+        screener.seed(symbol, candles[:-1])
+
+    # Spread the connections of the workers over a few seconds
+    await asyncio.sleep(uniform(0, STREAM_CONNECT_JITTER))
+    backoff = 1
+    while True:
+        try:
+            if not screener.ready:
+                await asyncio.gather(*(seed(symbol) for symbol in screener.symbols))
+            async for symbol, candle in exchange.candles_multi(
+                screener.symbols, settings.interval
+            ):
+                screener.update(symbol, candle)
+                backoff = 1
+        except Exception as e:
+            print(f"Screener feed error: {e}")
+        # Exponential backoff with jitter, the exchange doesn't like reconnect storms
+        await asyncio.sleep(backoff + uniform(0, backoff))
+        backoff = min(backoff * 2, 60)
+
+
+def start_screener(settings: Settings):
+    """(Re)start the screener for the universe in ``settings``."""
+    if app.state.screener_task is not None:
+        app.state.screener_task.cancel()
+        app.state.screener_task = None
+    app.state.screener = screening.Screener(
+        [exchanges.normalize_symbol(symbol) for symbol in settings.screener_symbols],
+        sma_window=settings.strategies[0].params.get("window", 21),
+        sma_lookback=settings.strategies[0].params.get("lookback", 3),
+    )
+    if settings.screener_symbols:
+        app.state.screener_task = asyncio.create_task(
+            run_screener_feed(app.state.screener, settings)
+        )
+
+
+async def run_book_feed(book: "orderbooks.OrderBook"):
+    """Maintain ``book`` from the KuCoin level 2 stream, reconnecting on errors."""
+    await asyncio.sleep(uniform(0, STREAM_CONNECT_JITTER))
+    backoff = 1
+    while True:
+        updates = book.updates
+        try:
+            book.reset()
+            await orderbooks.maintain_book(
+                book,
+                brokers.get_kucoin_orderbook_diffs(book.symbol),
+                lambda: brokers.get_kucoin_orderbook_snapshot(book.symbol),
+            )
+        except Exception as e:
+            print(f"Order book feed error: {e}")
+        if book.updates > updates:
+            backoff = 1
+        await asyncio.sleep(backoff + uniform(0, backoff))
+        backoff = min(backoff * 2, 60)
+
+
+async def run_trade_feed(flows: dict):
+    """Aggregate the KuCoin trades of every symbol of ``flows``."""
+    await asyncio.sleep(uniform(0, STREAM_CONNECT_JITTER))
+    backoff = 1
+    while True:
+        try:
+            async for symbol, trade in brokers.get_kucoin_trades(list(flows)):
+                flows[symbol].add(
+                    trade["time"], trade["price"], trade["size"], trade["side"]
+                )
+                backoff = 1
+        except Exception as e:
+            print(f"Trade feed error: {e}")
+        await asyncio.sleep(backoff + uniform(0, backoff))
+        backoff = min(backoff * 2, 60)
+
+
+def start_market_data(settings: Settings):
+    """(Re)start the order book and trade feeds of ``settings.market_data_symbols``."""
+    for task in app.state.market_data_tasks:
+        task.cancel()
+    symbols = [
+        exchanges.normalize_symbol(symbol) for symbol in settings.market_data_symbols
+    ]
+    interval = exchanges.interval_seconds(settings.interval)
+    app.state.books = {symbol: orderbooks.OrderBook(symbol) for symbol in symbols}
+    app.state.trade_flows = {
+        symbol: tradeflow.TradeAggregator(interval) for symbol in symbols
+    }
+    app.state.market_data_tasks = [
+        asyncio.create_task(run_book_feed(book)) for book in app.state.books.values()
+    ]
+    if symbols:
+        app.state.market_data_tasks.append(
+            asyncio.create_task(run_trade_feed(app.state.trade_flows))
+        )
+
+
+@app.get("/orderbook/{symbol}")
+def read_orderbook(symbol: str, depth: int = Query(default=20, ge=1, le=1000)):
+    """Best ``depth`` levels of the live book, with mid, spread and imbalance."""
+    book = app.state.books.get(exchanges.normalize_symbol(symbol))
+    if book is None:
+        raise HTTPException(status_code=404, detail=f"No order book for {symbol}")
+    if book.sequence is None:
+        raise HTTPException(status_code=503, detail="Order book is syncing")
+    return book.to_dict(depth)
+
+
+@app.get("/tradeflow/{symbol}")
+def read_tradeflow(symbol: str, limit: int = Query(default=100, ge=1, le=1000)):
+    """Per-candle VWAP, buy/sell volume and trade count, most recent last."""
+    flow = app.state.trade_flows.get(exchanges.normalize_symbol(symbol))
+    if flow is None:
+        raise HTTPException(status_code=404, detail=f"No trade flow for {symbol}")
+    candles = list(flow.candles)[-limit:]
+    current = flow.current()
+    return {"candles": candles, "current": current, "late_trades": flow.late}
+
+
+@app.get("/screener")
+def screener(
+    where: List[str] = Query(default=[]),
+    sort_by: str = None,
+    descending: bool = False,
+    limit: int = 50,
+):
+    """
+    Filter and rank the screener universe, e.g.
+    ``/screener?where=rsi<30&where=cross_age<=1&sort_by=rsi``.
+    """
+    if app.state.screener is None:
+        raise HTTPException(status_code=503, detail="Screener is starting")
+    try:
+        rows = app.state.screener.query(where, sort_by, descending, limit)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"ready": app.state.screener.ready, "count": len(rows), "symbols": rows}
+
+
+@app.websocket("/ws/screener")
+async def websocket_screener_endpoint(websocket: WebSocket):
+    """
+    Push screener results every ``period`` seconds.
+
+    The client can send ``{"where": [...], "sort_by": ..., "descending": ...,
+    "limit": ..., "period": ...}`` at any time to change its query.
+    """
+    await websocket.accept()
+    query = {"where": [], "sort_by": None, "descending": False, "limit": 50}
+    period = 1.0
+    try:
+        while True:
+            try:
+                message = await asyncio.wait_for(
+                    websocket.receive_json(), timeout=period
+                )
+                period = float(message.pop("period", period))
+                query.update(message)
+            except asyncio.TimeoutError:
+                pass
+            if app.state.screener is None:
+                await websocket.send_json({"ready": False, "symbols": []})
+                continue
+            try:
+                rows = app.state.screener.query(
+                    query["where"],
+                    query["sort_by"],
+                    query["descending"],
+                    query["limit"],
+                )
+                await websocket.send_json(
+                    {"ready": app.state.screener.ready, "symbols": rows}
+                )
+            except ValueError as e:
+                await websocket.send_json({"error": str(e)})
+    except WebSocketDisconnect:
+        print("Client disconnected")
+    except Exception as e:
+        print(f"Error: {e}")
+
+
+@app.get("/signals")
+def read_signals(
+    symbol: str = None,
+    side: str = None,
+    source: str = None,
+    strategy: str = None,
+    start: int = None,
+    end: int = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    cursor: str = None,
+):
+    """
+    Journaled signals, most recent first. Pass ``next_cursor`` as ``cursor``
+    to get the next page.
+    """
+    try:
+        if symbol is not None:
+            symbol = exchanges.normalize_symbol(symbol)
+        signals, next_cursor = app.state.journal.query(
+            symbol, side, source, strategy, start, end, limit, cursor
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {"signals": signals, "next_cursor": next_cursor}
+
+
+@app.post("/jobs")
+def submit_job(
+    req: JobRequest,
+    settings: Settings = Depends(get_settings),
+    job_manager=Depends(get_jobs),
+):
+    """
+    Queue a background job. An identical job (same kind, params and last
+    candle) that is queued, running or done is returned instead, unless
+    ``refresh`` is set.
+    """
+    if req.kind not in jobs.JOB_KINDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Unknown job kind: {req.kind!r}, expected one of {list(jobs.JOB_KINDS)}",
+        )
+    defaults = {
+        "api": settings.api,
+        "symbol": settings.symbol,
+        "interval": settings.interval,
+        "limit": settings.limit,
+        "strategies": [strategy.model_dump() for strategy in settings.strategies],
+    }
+    _, fields, _ = jobs.JOB_KINDS[req.kind]
+    params = {**{field: defaults[field] for field in fields}, **req.params}
+    try:
+        job, cached = job_manager.submit(
+            req.kind, params, use_cache=not req.refresh, not_before=req.not_before
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+    return {**job, "cached": cached}
+
+
+@app.get("/jobs")
+def list_jobs(
+    status: str = None,
+    kind: str = None,
+    limit: int = Query(default=100, ge=1, le=1000),
+    job_manager=Depends(get_jobs),
+):
+    """Jobs without their results, newest first."""
+    return {"jobs": job_manager.list(status, kind, limit)}
+
+
+@app.get("/jobs/{job_id}")
+def read_job(job_id: int, job_manager=Depends(get_jobs)):
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.delete("/jobs/{job_id}")
+def cancel_job(job_id: int, job_manager=Depends(get_jobs)):
+    """Cancel a queued job, or stop a running one at its next progress report."""
+    job = job_manager.cancel(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@app.websocket("/ws/jobs/{job_id}")
+async def websocket_job_progress(websocket: WebSocket, job_id: int):
+    """Send the job (without its result) whenever its progress changes, until it finishes."""
+    await websocket.accept()
+    last = None
+    try:
+        if app.state.jobs is None:
+            await websocket.send_json({"error": "Jobs are starting"})
+            await websocket.close()
+            return
+        while True:
+            job = await asyncio.to_thread(app.state.jobs.get, job_id, False)
+            if job is None:
+                await websocket.send_json({"error": f"Job {job_id} not found"})
+                break
+            state = (job["status"], job["progress"], job["message"])
+            if state != last:
+                await websocket.send_json(job)
+                last = state
+            if job["status"] in jobs.FINISHED:
+                break
+            await asyncio.sleep(JOB_POLL_INTERVAL)
+        await websocket.close()
+    except WebSocketDisconnect:
+        pass
+
+
+@app.get("/consistency")
+def read_consistency(settings: Settings = Depends(get_settings)):
+    """
+    Replay the recent history through the live and the batch evaluators of
+    the first strategy and report the candles where they disagree.
+    """
+    df = exchanges.get_exchange(settings.api).history(
+        settings.symbol, settings.interval, settings.limit
+    )
+    params = settings.strategies[0].params
+    return consistency.check_consistency(
+        df, window=params["window"], lookback=params.get("lookback", 3)
+    )
+
+
 @app.get("/historical_data")
 def get_historical_data(settings: Settings = Depends(get_settings)):
     try:
-        # df = get_historical_klines(interval="1m", limit=50)
-        # TODO interval = "1m" or "1min"
-        df = get_historical_klines_from_kucoin(
-            interval=settings.interval, limit=settings.limit
+        candles = exchanges.get_exchange(settings.api).history_candles(
+            settings.symbol, settings.interval, settings.limit
         )
 
-        df = df.sort_values(by="timestamp", ascending=True)
-
         # Calculate indicators and generate signals
-        df, macd_signals = calculate_indicator_signals(
-            df,
+        df, macd_signals = strategies.calculate_indicator_signals(
+            candles,
             "MACD",
             {"fast_length": 12, "slow_length": 26, "signal_length": 9},
             detect_divergence=True,
         )
-        df, rsi_signals = calculate_indicator_signals(
+        df, rsi_signals = strategies.calculate_indicator_signals(
             df, "RSI", {"length": 14}, detect_divergence=True
         )
         if settings.strategies:
             # TODO: This should get outside of here - not in the "views" or "routers"
             # for strategy in settings.strategies:
             #     if strategy == "smacrossprice":
-            #         df, sma_signals = calculate_indicator_signals(
+            #         df, sma_signals = strategies.calculate_indicator_signals(
             #             df, "SMA", {"period": settings.strategies[0].params["window"]}, detect_divergence=True
             #         )
-            signals = generate_signals(df, settings)
+            signals = strategies.generate_signals(df, settings)
+            # The last candle is still in progress, only closed ones are journaled
+            in_progress = float(df["timestamp"].iloc[-1])
+            app.state.journal.record_many(
+                [signal for signal in signals if signal["timestamp"] < in_progress],
+                source="batch",
+                strategy=settings.strategies[0].operator,
+                params=settings.strategies[0].params,
+                symbol=exchanges.normalize_symbol(settings.symbol),
+                interval=settings.interval,
+            )
 
         # TODO: Harcoded SMA Parameter and calculation
         sma_window = settings.strategies[0].params["window"]
@@ -182,7 +700,7 @@ def calculate(req: CalculateRequest):
     # Ensure datetime is in Unix time format
     df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) // 10**9
 
-    df, signals = calculate_indicator_signals(
+    df, signals = strategies.calculate_indicator_signals(
         df, req.indicator_name, req.variables, req.detect_divergence
     )
 
@@ -194,16 +712,91 @@ def calculate(req: CalculateRequest):
     return {"data": df.to_dict(orient="records"), "signals": signals}
 
 
+@app.post("/calculate/stream")
+async def calculate_stream(
+    request: Request,
+    indicator_name: str,
+    variables: str = "{}",
+    detect_divergence: bool = False,
+    chunk_rows: int = Query(default=50_000, ge=1),
+):
+    """
+    Streaming version of ``/calculate`` for very large price histories.
+
+    The body is the raw upload (CSV, NDJSON or Arrow IPC stream, picked from the
+    Content-Type header), ``variables`` is a JSON object. The response is NDJSON:
+    one line per row, then a last ``{"signals": ...}`` line.
+    """
+    try:
+        variables = json.loads(variables)
+        if not isinstance(variables, dict):
+            raise ValueError("variables must be a JSON object")
+        indicator = streaming.ChunkedIndicator(indicator_name, variables)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    # Spool the upload instead of keeping it in memory
+    upload = tempfile.SpooledTemporaryFile(max_size=UPLOAD_SPOOL_SIZE)
+    async for chunk in request.stream():
+        upload.write(chunk)
+    empty = upload.tell() == 0
+    upload.seek(0)
+    if empty:
+        upload.close()
+        raise HTTPException(status_code=400, detail="The request body is empty")
+
+    try:
+        content_type = request.headers.get("content-type", streaming.CSV)
+        chunks = streaming.iter_chunks(upload, content_type, chunk_rows)
+    except ValueError as e:
+        upload.close()
+        raise HTTPException(status_code=415, detail=str(e))
+    # Errors in the first chunk (missing columns, bad values or variables) are
+    # still reportable, later ones can only end the stream
+    try:
+        frames = streaming.check_chunks(chunks, indicator)
+    except ValueError as e:
+        upload.close()
+        raise HTTPException(status_code=400, detail=str(e))
+
+    return StreamingResponse(
+        streaming.encode_indicator(frames, indicator, detect_divergence),
+        media_type=streaming.NDJSON,
+        background=BackgroundTask(upload.close),
+    )
+
+
+def open_sender(websocket: WebSocket) -> ClientSender:
+    """Non-blocking sender for ``websocket``, so a slow client never stalls upstream."""
+    sender = ClientSender(websocket.send_json, close=websocket.close)
+    app.state.ws_senders.add(sender)
+    return sender
+
+
+def close_sender(sender: ClientSender, sending: asyncio.Task):
+    sending.cancel()
+    app.state.ws_senders.discard(sender)
+
+
+@app.get("/stats/websockets")
+def websocket_stats():
+    """Send statistics (latency, conflated messages, queue) of the connected clients."""
+    return {"clients": [sender.stats() for sender in app.state.ws_senders]}
+
+
 @app.websocket("/ws/data")
 async def websocket_endpoint(
     websocket: WebSocket, settings: Settings = Depends(get_settings)
 ):
     await websocket.accept()
+    sender = open_sender(websocket)
+    sending = asyncio.create_task(sender.run())
     try:
-        async for candle in get_binance_candles(
-            symbol="btcusdt",
-            interval="1m",
+        async for candle in exchanges.get_exchange(settings.api).candles(
+            settings.symbol, settings.interval
         ):
+            if sender.closed:
+                break
             real_time_data = {
                 "time": candle["time"],
                 "open": candle["open"],
@@ -217,11 +810,13 @@ async def websocket_endpoint(
                 ),
                 "is_final": candle["is_final"],
             }
-            await websocket.send_json(real_time_data)
+            sender.offer(real_time_data, key="candle", reliable=candle["is_final"])
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        close_sender(sender, sending)
 
 
 @app.websocket("/ws/kucoin")
@@ -229,52 +824,38 @@ async def websocket_kucoin_endpoint(
     websocket: WebSocket, settings: Settings = Depends(get_settings)
 ):
     await websocket.accept()
+    sender = open_sender(websocket)
+    sending = asyncio.create_task(sender.run())
     try:
-        # TODO: The principle of Separation of Concerns are not strictly followed here
-        # What if it was a different interval?
-        # What if it was a different strategy?
-        # What if it was a different SMA Parameter?
-        # Also everything is shitty and hard-coded here!
-        # Don't be harsh on yourself, you're just starting, bro!
-
-        # Get last 10 candles for SMA calculation
-        sma_param = settings.strategies[0].params["window"]
-        historical_df = get_historical_klines_from_kucoin(
-            interval="1min", limit=sma_param + 1
+        # Same evaluator as /ws/stream, and the same rule as generate_signals,
+        # see core/strategiez/consistency.py
+        strategy = settings.strategies[0]
+        live = incremental.LiveSmaCross(
+            strategy.params["window"], strategy.params.get("lookback", 3)
         )
-        historical_closes = historical_df["close"].tolist()
-        historical_highs = historical_df["high"].iloc[-3:].tolist()
-        historical_lows = historical_df["low"].iloc[-3:].tolist()
-        current_sma = (
-            sum(historical_closes[-sma_param:]) / sma_param
-            if historical_closes
-            else None
+        exchange = exchanges.get_exchange(settings.api)
+        history = await asyncio.to_thread(
+            exchange.history_candles, settings.symbol, settings.interval, settings.limit
         )
-        queue = deque(maxlen=4)
-        async for candle in get_kucoin_candles(
-            symbol=settings.symbol,
-            interval=settings.interval,
-        ):
+        # The last candle is still in progress, it comes again from the stream
+        live.seed(history[:-1])
+        async for candle in exchange.candles(settings.symbol, settings.interval):
+            if sender.closed:
+                break
             is_final = candle["is_final"]
-            signal = None
-            if is_final:
-                queue.append(candle)
-                historical_closes.append(candle["close"])
-                historical_highs.append(candle["high"])
-                historical_lows.append(candle["low"])
-                historical_closes.pop(0)
-                historical_highs.pop(0)
-                historical_lows.pop(0)
-                current_sma = sum(historical_closes) / len(historical_closes)
-                if candle["high"] > current_sma and current_sma > candle["low"]:
-                    if current_sma < candle["close"] and all(
-                        current_sma > high for high in historical_highs
-                    ):
-                        signal = "BUY"
-                    elif current_sma > candle["close"] and all(
-                        current_sma < low for low in historical_lows
-                    ):
-                        signal = "SELL"
+            # Only a final candle can produce a signal
+            signal = live.update(candle)
+            if signal:
+                app.state.journal.record(
+                    source="live",
+                    strategy=strategy.operator,
+                    params=strategy.params,
+                    symbol=exchanges.normalize_symbol(settings.symbol),
+                    interval=settings.interval,
+                    candle_time=candle["time"],
+                    price=candle["close"],
+                    side=signal,
+                )
 
             real_time_data = {
                 "time": candle["time"],
@@ -282,33 +863,145 @@ async def websocket_kucoin_endpoint(
                 "high": candle["high"],
                 "low": candle["low"],
                 "close": candle["close"],
-                "sma": current_sma,
+                "sma": live.sma,
                 "signal": signal,
                 "is_final": candle["is_final"],
             }
-            await websocket.send_json(real_time_data)
+            # In-progress candles are conflated, final candles and signals are never dropped
+            sender.offer(
+                real_time_data, key="candle", reliable=is_final or signal is not None
+            )
     except WebSocketDisconnect:
         print("Client disconnected")
     except Exception as e:
         print(f"Error: {e}")
+    finally:
+        close_sender(sender, sending)
+
+
+def get_stream_history(symbol: str, interval: str):
+    """History used to warm up the indicators of a new /ws/stream feed."""
+    settings = app.state.settings
+    return exchanges.get_exchange(settings.api).history_candles(
+        symbol, interval, settings.limit
+    )
+
+
+def stream_candles(symbol: str, interval: str):
+    """Live candles of a /ws/stream feed."""
+    return exchanges.get_exchange(app.state.settings.api).candles(symbol, interval)
+
+
+@app.websocket("/ws/stream")
+async def websocket_stream_endpoint(websocket: WebSocket):
+    """
+    Multiplexed candle stream, see ``core/streams.py`` for the protocol.
+
+    The client subscribes to (symbol, interval, indicators) streams and gets
+    throttled, delta-encoded candle updates for all of them on this socket.
+    """
+    await websocket.accept()
+    if app.state.candle_hub is None:
+        await websocket.send_json({"error": "Streams are starting"})
+        await websocket.close()
+        return
+    sender = open_sender(websocket)
+    session = streams.ClientSession(
+        app.state.candle_hub, sender.send, evict=sender.evict
+    )
+    sending = asyncio.create_task(session.run())
+    try:
+        while True:
+            await session.handle(await websocket.receive_json())
+    except WebSocketDisconnect:
+        print("Client disconnected")
+    except Exception as e:
+        print(f"Error: {e}")
+    finally:
+        close_sender(sender, sending)
+        session.close()
 
 
 @app.post("/generate_signals")
 def generate(req: GenerateRequest):
     df = pd.DataFrame(req.price_data)
-    signals = generate_signals(df)
+    signals = strategies.generate_signals(df)
     return {"signals": signals}
 
 
 @app.post("/backtest")
 def backtest(req: BacktestRequest):
     df = pd.DataFrame(req.price_data)
-    final_balance = backtest_signals(
+    if req.execution is not None:
+        try:
+            model = execution.ExecutionModel(**req.execution.model_dump())
+            # KuCoin returns candles newest first, the simulation runs oldest first
+            df = df.iloc[execution.candle_times(df).argsort(kind="stable")]
+            df = df.reset_index(drop=True)
+            buy, sell = execution.signals_to_masks(
+                execution.candle_times(df), req.buy_signals + req.sell_signals
+            )
+        except (ValueError, KeyError) as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        close = df["close"]
+        return execution.simulate_execution(
+            df.get("open", close),
+            df.get("high", close),
+            df.get("low", close),
+            close,
+            buy,
+            sell,
+            model,
+            req.initial_balance,
+        )
+
+    final_balance = strategies.backtest_signals(
         df, req.buy_signals, req.sell_signals, req.initial_balance
     )
     return {"final_balance": final_balance}
 
 
+@app.post("/backtest/portfolio")
+def backtest_portfolio(
+    req: PortfolioBacktestRequest, settings: Settings = Depends(get_settings)
+):
+    """
+    Backtest several strategies over many symbols with one shared capital and
+    per-symbol / global exposure limits.
+    """
+    strategy_list = req.strategies or settings.strategies
+    try:
+        model = execution.ExecutionModel(
+            **(req.execution.model_dump() if req.execution else {})
+        )
+        limits = portfolio.PortfolioLimits(
+            req.max_symbol_exposure, req.max_gross_exposure, req.max_positions
+        )
+        if req.price_data is not None:
+            missing = set(req.symbols) - set(req.price_data)
+            if missing:
+                raise ValueError(f"No price data for {sorted(missing)}")
+            candles = {
+                exchanges.normalize_symbol(symbol): exchanges.normalize_candles(
+                    pd.DataFrame(req.price_data[symbol])
+                )
+                for symbol in req.symbols
+            }
+        else:
+            candles = exchanges.get_exchange(settings.api).history_many(
+                req.symbols, settings.interval, settings.limit
+            )
+        return portfolio.backtest_portfolio(
+            candles,
+            [strategy.model_dump() for strategy in strategy_list],
+            model,
+            limits,
+            req.initial_balance,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 html = (
     """
 <!DOCTYPE html>
@@ -0,0 +1,37 @@
+"""
+Path-dependent kernels throughput. Runs on the backend selected by
+``core.strategiez.jit`` (numba when installed, ``KERNEL_BACKEND`` to force one).
+
+    uv run -m benchmarks.bench_kernels
+"""
+
+import time
+
+import numpy as np
+
+from benchmarks.bench_screener import synthetic_history
+from core.strategiez import jit
+
+
+def main(candles=1_000_000, repeat=5):
+    rng = np.random.default_rng(0)
+    df = synthetic_history(candles, rng)
+    close = df["close"].to_numpy()
+    buy = rng.random(candles) < 0.05
+    sell = rng.random(candles) < 0.05
+    kernels = {
+        "first_cross": lambda: jit.first_cross(close, close[::-1].copy()),
+        "position_events": lambda: jit.position_events(buy, sell),
+    }
+    print(f"backend: {jit.BACKEND}")
+    for name, kernel in kernels.items():
+        kernel()  # Compilation (numba) is not timed
+        start = time.perf_counter()
+        for _ in range(repeat):
+            kernel()
+        elapsed = (time.perf_counter() - start) / repeat
+        print(f"{name} x {candles} candles: {elapsed * 1000:.2f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,51 @@
+"""
+Order book diff throughput.
+
+    uv run -m benchmarks.bench_orderbook
+"""
+
+import time
+
+import numpy as np
+
+from core.orderbook import OrderBook
+
+
+def main(levels=5000, diffs=100_000, changes=4):
+    rng = np.random.default_rng(0)
+    book = OrderBook("BTC-USDT")
+    book.load(
+        0,
+        np.column_stack((100 - np.arange(levels) * 0.01, rng.uniform(0, 5, levels))),
+        np.column_stack((100.01 + np.arange(levels) * 0.01, rng.uniform(0, 5, levels))),
+    )
+    # Most changes happen close to the top of the book
+    offsets = np.minimum(rng.exponential(50, (diffs, 2, changes)), levels - 1)
+    sizes = np.where(rng.random((diffs, 2, changes)) < 0.2, 0, 1.0)
+    updates = [
+        {
+            "first": i + 1,
+            "last": i + 1,
+            "bids": [
+                (round(100 - int(o) * 0.01, 2), s)
+                for o, s in zip(offsets[i, 0], sizes[i, 0])
+            ],
+            "asks": [
+                (round(100.01 + int(o) * 0.01, 2), s)
+                for o, s in zip(offsets[i, 1], sizes[i, 1])
+            ],
+        }
+        for i in range(diffs)
+    ]
+    start = time.perf_counter()
+    for diff in updates:
+        book.apply(**diff)
+    elapsed = time.perf_counter() - start
+    print(
+        f"{diffs} diffs x {2 * changes} levels: {elapsed:.2f}s, "
+        f"{diffs / elapsed:,.0f} diffs/s"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Candle pipeline throughput and latency against the local mock exchange.
+
+Starts ``core.mock_exchange`` in-process, reads ``symbols`` candle topics
+over the KuCoin websocket protocol and fetches their history through the
+exchange adapter. No network access needed.
+
+    uv run -m benchmarks.bench_pipeline
+"""
+
+import asyncio
+import threading
+import time
+from contextlib import aclosing
+
+import numpy as np
+import uvicorn
+
+from core import brokers_api
+from core.exchanges import get_exchange
+from core.mock_exchange import create_app
+
+
+def start_mock_exchange(**options):
+    """Run the mock exchange in a thread, returns (server, base URL)."""
+    server = uvicorn.Server(
+        uvicorn.Config(
+            create_app(**options), host="127.0.0.1", port=0, log_level="warning"
+        )
+    )
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    port = server.servers[0].sockets[0].getsockname()[1]
+    return server, f"http://127.0.0.1:{port}"
+
+
+async def consume(symbols, messages):
+    exchange = get_exchange("kucoin")
+    latencies = []
+    start = time.perf_counter()
+    async with aclosing(
+        brokers_api.kucoin_messages(
+            [f"/market/candles:{symbol}_1min" for symbol in symbols]
+        )
+    ) as stream:
+        async for data in stream:
+            latencies.append(time.time_ns() - data["data"]["time"])
+            if len(latencies) == messages:
+                break
+    elapsed = time.perf_counter() - start
+
+    candles = 0
+    start_history = time.perf_counter()
+    for symbol in symbols:
+        candles += len(exchange.history(symbol, "1min", 1500))
+    history_elapsed = time.perf_counter() - start_history
+    return elapsed, np.asarray(latencies) / 1e6, candles, history_elapsed
+
+
+def main(symbols=10, messages=50_000, rate=1000):
+    server, url = start_mock_exchange(rate=rate, ticks_per_candle=10)
+    brokers_api.KUCOIN_API_URL = url
+    names = [f"S{i}-USDT" for i in range(symbols)]
+    elapsed, latencies, candles, history_elapsed = asyncio.run(consume(names, messages))
+    print(f"{messages} updates from {symbols} topics: {messages / elapsed:,.0f}/s")
+    print(
+        f"latency p50 {np.percentile(latencies, 50):.2f}ms, "
+        f"p99 {np.percentile(latencies, 99):.2f}ms"
+    )
+    print(f"history: {candles} candles in {history_elapsed:.2f}s")
+    server.should_exit = True
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,39 @@
+"""
+Portfolio backtest time over many symbols.
+
+    uv run -m benchmarks.bench_portfolio
+"""
+
+import time
+
+from core.mock_exchange import synthetic_candles
+from core.strategiez.execution import ExecutionModel
+from core.strategiez.portfolio import PortfolioLimits, backtest_portfolio
+
+
+def main(symbols=300, candles=5000):
+    data = {}
+    for i in range(symbols):
+        df = data[f"S{i}-USDT"] = synthetic_candles(candles, seed=i)
+        df["timestamp"] *= 60
+    strategies = [
+        {"operator": "smacrossprice", "params": {"window": window}, "side": "BOTH"}
+        for window in (21, 50)
+    ]
+    start = time.perf_counter()
+    result = backtest_portfolio(
+        data,
+        strategies,
+        ExecutionModel(position_size=0.05, stop_loss=0.02),
+        PortfolioLimits(max_symbol_exposure=0.1, max_positions=40),
+    )
+    elapsed = time.perf_counter() - start
+    print(
+        f"{symbols} symbols x {candles} candles x {len(strategies)} strategies: "
+        f"{elapsed:.2f}s, {len(result['trades'])} trades, "
+        f"final balance {result['final_balance']:.2f}"
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,38 @@
+"""
+Walk-forward / sensitivity throughput, in-process vs process pool.
+
+    uv run -m benchmarks.bench_robustness
+"""
+
+import time
+
+import numpy as np
+
+from benchmarks.bench_screener import synthetic_history
+from core.strategiez import jit
+from core.strategiez.robustness import sensitivity, walk_forward
+
+
+def main(candles=200_000):
+    df = synthetic_history(candles, np.random.default_rng(0))
+    windows = range(10, 110, 10)
+    print(f"kernel backend: {jit.BACKEND}")
+    for workers in (1, None):
+        start = time.perf_counter()
+        walk_forward(
+            df,
+            windows,
+            lookbacks=(2, 3, 4),
+            train_size=20_000,
+            test_size=5_000,
+            max_workers=workers,
+        )
+        print(f"walk_forward workers={workers}: {time.perf_counter() - start:.2f}s")
+
+        start = time.perf_counter()
+        sensitivity(df, windows, max_workers=workers)
+        print(f"sensitivity workers={workers}: {time.perf_counter() - start:.2f}s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Screener query latency over a synthetic universe.
+
+    uv run -m benchmarks.bench_screener
+"""
+
+import time
+
+import numpy as np
+import pandas as pd
+
+from core.screener import Screener
+
+
+def synthetic_history(n, rng):
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame(
+        {
+            "timestamp": np.arange(n) * 60,
+            "open": close,
+            "high": close + rng.uniform(0, 2, n),
+            "low": close - rng.uniform(0, 2, n),
+            "close": close,
+            "volume": rng.uniform(1, 10, n),
+        }
+    )
+
+
+def main(symbols=500, history=300, queries=1000):
+    rng = np.random.default_rng(0)
+    screener = Screener()
+    start = time.perf_counter()
+    for i in range(symbols):
+        screener.seed(f"S{i}-USDT", synthetic_history(history, rng))
+    print(
+        f"seed {symbols} symbols x {history} candles: {time.perf_counter() - start:.2f}s"
+    )
+
+    start = time.perf_counter()
+    for _ in range(queries):
+        screener.query(["rsi<30", "cross_age<=5"], sort_by="rsi", limit=20)
+    elapsed = (time.perf_counter() - start) / queries
+    print(f"query: {elapsed * 1000:.3f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Import-time profile of the API process.
+
+Runs ``python -X importtime -c "import api.main"`` in a fresh interpreter and
+prints the total and the slowest modules (cumulative time).
+
+    uv run -m benchmarks.import_time [module] [--top N]
+"""
+
+import argparse
+import subprocess
+import sys
+
+
+def profile(module: str = "api.main"):
+    """Return {module: cumulative microseconds} for a cold import of ``module``."""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", f"import {module}"],
+        capture_output=True,
+        text=True,
+        check=True,
+    )
+    timings = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith("import time:") or "cumulative" in line:
+            continue
+        _, cumulative_us, name = line.split(":", 1)[1].split("|")
+        # Nested imports are indented, the name itself never has spaces
+        timings[name.strip()] = int(cumulative_us)
+    return timings
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument("module", nargs="?", default="api.main")
+    parser.add_argument("--top", type=int, default=15)
+    args = parser.parse_args()
+
+    timings = profile(args.module)
+    print(f"import {args.module}: {timings.get(args.module, 0) / 1000:.1f}ms")
+    top_level = {name: us for name, us in timings.items() if "." not in name}
+    for name, us in sorted(top_level.items(), key=lambda item: -item[1])[: args.top]:
+        print(f"  {name:<30} {us / 1000:8.1f}ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,22 +2,52 @@ import asyncio
 import json
 import os
 import time
+from functools import lru_cache
 
-import pandas as pd
-import requests
-import websockets
-from binance.spot import Spot
 from dotenv import load_dotenv
-from fastapi.responses import Response
+
+from core.lazy import lazy_import
+
+# Heavy clients are only imported when a function below is first used
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
+websockets = lazy_import("websockets")
+# core.exchanges imports this module
+exchanges = lazy_import("core.exchanges")
 
 load_dotenv()
-# TODO: Separate API key and secret from the code
-api_key = os.environ["BINANCE_API_KEY"]
-api_secret = os.environ["BINANCE_SECRET_KEY"]
+
+# Base URLs, point them to the mock exchange (core/mock_exchange.py) for offline runs
+KUCOIN_API_URL = os.getenv("KUCOIN_API_URL", "https://api.kucoin.com").rstrip("/")
+BINANCE_API_URL = os.getenv("BINANCE_API_URL", "https://api2.binance.com").rstrip("/")
+BINANCE_WS_URL = os.getenv("BINANCE_WS_URL", "wss://stream.binance.com:9443").rstrip(
+    "/"
+)
+
+# Fields of a KuCoin kline (REST and websocket)
+KUCOIN_KLINE_COLUMNS = ("time", "open", "close", "high", "low", "volume", "turnover")
+
+
+@lru_cache(maxsize=1)
+def get_binance_credentials():
+    """Binance API key and secret, read from the environment on first use."""
+    try:
+        return os.environ["BINANCE_API_KEY"], os.environ["BINANCE_SECRET_KEY"]
+    except KeyError as e:
+        raise RuntimeError(f"{e.args[0]} is not set (see env.example)") from None
+
+
+@lru_cache(maxsize=1)
+def get_binance_client():
+    """Shared Binance Spot client, created on first use."""
+    from binance.spot import Spot
+
+    api_key, api_secret = get_binance_credentials()
+    return Spot(base_url=BINANCE_API_URL, api_key=api_key, api_secret=api_secret)
 
 
 def get_kucoin_ws_token():
-    response = requests.post("https://api.kucoin.com/api/v1/bullet-public")
+    response = requests.post(f"{KUCOIN_API_URL}/api/v1/bullet-public")
     if response.status_code != 200:
         raise Exception(f"Error fetching token from KuCoin: {response.text}")
     return response.json()["data"]
@@ -81,11 +111,149 @@ async def get_kucoin_candles(symbol="BTC-USDT", interval="1min"):
                 yield candle
 
 
+async def kucoin_messages(topics):
+    """
+    Subscribe to public KuCoin websocket ``topics`` and yield the data messages.
+
+    The subscriptions are acknowledged before the first message is yielded.
+    """
+    # Blocking HTTP call, kept off the event loop
+    token_data = await asyncio.to_thread(get_kucoin_ws_token)
+    token = token_data["token"]
+    endpoint = token_data["instanceServers"][0]["endpoint"]
+    connect_id = str(int(time.time() * 1000))
+
+    url = f"{endpoint}?token={token}&connectId={connect_id}"
+    async with websockets.connect(url) as websocket:
+        welcome_message = await websocket.recv()
+        print("Welcome message:", welcome_message)
+
+        pending_acks = set()
+        for i, topic in enumerate(topics):
+            subscribe_message = {
+                "id": f"{connect_id}-{i}",
+                "type": "subscribe",
+                "topic": topic,
+                "privateChannel": False,
+                "response": True,
+            }
+            pending_acks.add(subscribe_message["id"])
+            await websocket.send(json.dumps(subscribe_message))
+
+        buffered = []
+        while pending_acks:
+            data = json.loads(await websocket.recv())
+            if data["type"] == "ack":
+                pending_acks.discard(data["id"])
+            elif data["type"] == "message":
+                buffered.append(data)
+        for data in buffered:
+            yield data
+        while True:
+            data = json.loads(await websocket.recv())
+            if data["type"] == "message":
+                yield data
+
+
+def get_kucoin_orderbook_snapshot(symbol="BTC-USDT"):
+    """
+    Top 100 levels of the KuCoin order book.
+
+    Returns:
+    Tuple[int, list, list]: (sequence, bids, asks), levels as (price, size) pairs.
+    """
+    response = requests.get(
+        f"{KUCOIN_API_URL}/api/v1/market/orderbook/level2_100",
+        params={"symbol": symbol},
+        timeout=10,
+    )
+    if response.status_code != 200:
+        raise Exception(f"Error fetching order book from KuCoin: {response.text}")
+    data = response.json()["data"]
+    return (
+        int(data["sequence"]),
+        [(float(price), float(size)) for price, size in data["bids"]],
+        [(float(price), float(size)) for price, size in data["asks"]],
+    )
+
+
+async def get_kucoin_orderbook_diffs(symbol="BTC-USDT"):
+    """
+    Level 2 order book changes, as diffs for ``orderbook.OrderBook.apply``.
+
+    Yields dicts with 'first', 'last' (sequence range), 'bids' and 'asks'
+    ((price, size) pairs, size 0 removes the level).
+    """
+    async for data in kucoin_messages([f"/market/level2:{symbol}"]):
+        if data["subject"] != "trade.l2update":
+            continue
+        update = data["data"]
+        changes = update["changes"]
+        yield {
+            "first": int(update["sequenceStart"]),
+            "last": int(update["sequenceEnd"]),
+            "bids": [
+                (float(price), float(size)) for price, size, *_ in changes["bids"]
+            ],
+            "asks": [
+                (float(price), float(size)) for price, size, *_ in changes["asks"]
+            ],
+        }
+
+
+async def get_kucoin_trades(symbols):
+    """
+    Public trades of ``symbols``.
+
+    Yields (symbol, trade) tuples, trade being a dict with 'time' (seconds),
+    'price', 'size' and 'side' (taker side, "buy" or "sell").
+    """
+    async for data in kucoin_messages([f"/market/match:{','.join(symbols)}"]):
+        if data["subject"] != "trade.l3match":
+            continue
+        trade = data["data"]
+        yield trade["symbol"], {
+            # KuCoin trade times are in nanoseconds
+            "time": int(trade["time"]) / 1e9,
+            "price": float(trade["price"]),
+            "size": float(trade["size"]),
+            "side": trade["side"],
+        }
+
+
+def fetch_kucoin_klines(interval: str, limit: int, symbol: str) -> list:
+    """
+    Raw KuCoin klines, newest first: lists of numeric strings in the order of
+    ``KUCOIN_KLINE_COLUMNS``.
+    """
+    if interval not in exchanges.INTERVAL_SECONDS:
+        raise ValueError("Invalid interval")
+
+    # Calculate endAt and startAt
+    end_at = int(time.time())
+    start_at = end_at - (limit * exchanges.INTERVAL_SECONDS[interval])
+
+    if symbol == "BTCUSDT":
+        symbol = "BTC-USDT"
+
+    response = requests.get(
+        f"{KUCOIN_API_URL}/api/v1/market/candles?type={interval}"
+        f"&symbol={symbol}&startAt={start_at}&endAt={end_at}",
+        timeout=10,
+        # retries=3,
+    )
+
+    if response.status_code != 200:
+        raise Exception(f"Error fetching data from KuCoin: {response.text}")
+
+    return response.json()["data"]
+
+
 def get_historical_klines_from_kucoin(
     interval: str = "1min",
     limit: int = 30,
     symbol: str = "BTCUSDT",
-) -> pd.DataFrame:
+) -> "pd.DataFrame":
     """
     Retrieves historical kline (candlestick) data from Binance API.
     This function fetches OHLCV (Open, High, Low, Close, Volume) data for a given trading pair
@@ -117,58 +285,11 @@ def get_historical_klines_from_kucoin(
     """
 
     print(interval)
-    interval_mapping = {
-        "1min": 60,
-        "3min": 180,
-        "5min": 300,
-        "15min": 900,
-        "30min": 1800,
-        "1hour": 3600,
-        "2hour": 7200,
-        "4hour": 14400,
-        "6hour": 21600,
-        "8hour": 28800,
-        "12hour": 43200,
-        "1day": 86400,
-        "1week": 604800,
-        "1month": 2592000,  # Approximation
-    }
-
-    if interval not in interval_mapping:
-        raise ValueError("Invalid interval")
 
-    # Calculate endAt and startAt
-    end_at = int(time.time())
-    start_at = end_at - (limit * interval_mapping[interval])
-
-    if symbol == "BTCUSDT":
-        symbol = "BTC-USDT"
-
-    response = requests.get(
-        f"https://api.kucoin.com/api/v1/market/candles?type={interval}"
-        f"&symbol={symbol}&startAt={start_at}&endAt={end_at}",
-        timeout=10,
-        # retries=3,
-    )
-
-    if response.status_code != 200:
-        raise Exception(f"Error fetching data from KuCoin: {response.text}")
-
-    data = response.json()["data"]
+    data = fetch_kucoin_klines(interval, limit, symbol)
 
     # Convert to DataFrame and select OHLC columns
-    df = pd.DataFrame(
-        data,
-        columns=[
-            "timestamp",
-            "open",
-            "close",
-            "high",
-            "low",
-            "volume",
-            "turnover",
-        ],
-    )
+    df = pd.DataFrame(data, columns=["timestamp", *KUCOIN_KLINE_COLUMNS[1:]])
 
     # Convert timestamp from milliseconds to seconds
     df["timestamp"] = df["timestamp"].astype(int)
@@ -188,12 +309,10 @@ def get_historical_klines(
     interval: str = "1m",
     limit: int = 30,
     symbol: str = "BTCUSDT",
-) -> pd.DataFrame:
+) -> "pd.DataFrame":
     # THIS IS BINANCE API
     # api key/secret are required for user data endpoints
-    client = Spot(
-        base_url="https://api2.binance.com", api_key=api_key, api_secret=api_secret
-    )
+    client = get_binance_client()
 
     #  Get candlestick data for BNBUSDT at 1h interval
     klines = client.klines(symbol=symbol, interval=interval, limit=limit)
@@ -230,7 +349,7 @@ def get_historical_klines(
 
 
 async def get_binance_candles(symbol="btcusdt", interval="3s"):
-    url = f"wss://stream.binance.com:9443/ws/{symbol}@kline_{interval}"
+    url = f"{BINANCE_WS_URL}/ws/{symbol}@kline_{interval}"
     async with websockets.connect(url) as websocket:
         print("In the socket (realtime candles)")
         while True:
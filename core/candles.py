@@ -0,0 +1,200 @@
+"""
+Compact candle storage.
+
+``Candles`` keeps a series of candles as one NumPy array per field: int64
+open times (seconds) and float64 or float32 prices and volumes. That is 48
+(float64) or 28 (float32) bytes per candle, against roughly 450 for the same
+candle as a dict. Slicing (by position or by time) returns views, and
+``to_frame`` wraps the arrays in a DataFrame without copying them.
+
+``CandleBuffer`` is the append-only, bounded version used for live history.
+"""
+
+import numpy as np
+
+from core.lazy import lazy_import
+
+pd = lazy_import("pandas")
+
+PRICE_FIELDS = ("open", "high", "low", "close", "volume")
+FIELDS = ("time", *PRICE_FIELDS)
+
+
+class Candles:
+    """
+    Candles of one symbol, oldest first.
+
+    Parameters:
+    time (array): Candle open times in seconds.
+    open, high, low, close, volume (array): Prices and volumes.
+    dtype (str): Dtype of the prices and volumes, "float64" or "float32".
+    """
+
+    __slots__ = FIELDS
+
+    def __init__(self, time, open, high, low, close, volume, dtype="float64"):
+        self.time = np.asarray(time, dtype="int64")
+        for field, values in zip(PRICE_FIELDS, (open, high, low, close, volume)):
+            setattr(self, field, np.asarray(values, dtype=dtype))
+
+    @classmethod
+    def empty(cls, dtype="float64"):
+        return cls(*([()] * len(FIELDS)), dtype=dtype)
+
+    @classmethod
+    def from_frame(cls, df: "pd.DataFrame", dtype="float64"):
+        """From a DataFrame with 'timestamp' (seconds) and the price columns."""
+        return cls(df["timestamp"], *(df[field] for field in PRICE_FIELDS), dtype=dtype)
+
+    @classmethod
+    def from_rows(cls, rows, columns, dtype="float64"):
+        """
+        From exchange rows (lists of numbers or numeric strings).
+
+        ``columns`` names the fields of every row, e.g. KuCoin's
+        ("time", "open", "close", "high", "low", "volume", "turnover");
+        unknown names are ignored.
+        """
+        # One parsing pass to float64, then only the needed columns are kept
+        table = np.asarray(rows, dtype="float64").reshape(len(rows), len(columns))
+        index = {name: i for i, name in enumerate(columns)}
+        return cls(
+            table[:, index["time"]],
+            *(table[:, index[field]] for field in PRICE_FIELDS),
+            dtype=dtype,
+        )
+
+    @classmethod
+    def from_records(cls, candles, dtype="float64"):
+        """From candle dicts ('time', 'open', ...), e.g. a live stream."""
+        candles = list(candles)
+        return cls(
+            *([candle[field] for candle in candles] for field in FIELDS), dtype=dtype
+        )
+
+    @classmethod
+    def concat(cls, parts):
+        parts = list(parts)
+        return cls(
+            *(np.concatenate([getattr(p, f) for p in parts]) for f in FIELDS),
+            dtype=parts[0].dtype,
+        )
+
+    @property
+    def dtype(self):
+        return self.close.dtype
+
+    @property
+    def nbytes(self) -> int:
+        return sum(getattr(self, field).nbytes for field in FIELDS)
+
+    def __len__(self):
+        return len(self.time)
+
+    def __getitem__(self, key):
+        """``candles["close"]`` is a column, ``candles[a:b]`` a view, ``candles[i]`` a dict."""
+        if isinstance(key, str):
+            return self.time if key == "timestamp" else getattr(self, key)
+        if isinstance(key, slice):
+            return Candles(*(getattr(self, f)[key] for f in FIELDS), dtype=self.dtype)
+        return {field: getattr(self, field)[key].item() for field in FIELDS}
+
+    def __iter__(self):
+        for i in range(len(self)):
+            yield self[i]
+
+    def between(self, start=None, end=None) -> "Candles":
+        """View of the candles opened in ``[start, end)`` (seconds), no copy."""
+        first = 0 if start is None else int(np.searchsorted(self.time, start, "left"))
+        last = (
+            len(self) if end is None else int(np.searchsorted(self.time, end, "left"))
+        )
+        return self[first:last]
+
+    def sorted(self) -> "Candles":
+        """Oldest first (exchanges often send newest first), ``self`` if already so."""
+        if np.all(self.time[1:] >= self.time[:-1]):
+            return self
+        order = np.argsort(self.time, kind="stable")
+        return Candles(*(getattr(self, f)[order] for f in FIELDS), dtype=self.dtype)
+
+    def astype(self, dtype) -> "Candles":
+        return Candles(*(getattr(self, f) for f in FIELDS), dtype=dtype)
+
+    def to_frame(self) -> "pd.DataFrame":
+        """DataFrame ('timestamp', 'open', ...) sharing the arrays, no copy."""
+        columns = {"timestamp": self.time}
+        columns.update((field, getattr(self, field)) for field in PRICE_FIELDS)
+        return pd.DataFrame(columns, copy=False)
+
+    def to_columns(self) -> dict:
+        """JSON friendly columns, much smaller than a list of candle dicts."""
+        return {field: getattr(self, field).tolist() for field in FIELDS}
+
+
+def as_frame(data) -> "pd.DataFrame":
+    """``Candles`` -> zero-copy DataFrame, DataFrames are returned as they are."""
+    return data.to_frame() if isinstance(data, Candles) else data
+
+
+class CandleBuffer:
+    """
+    The last ``maxlen`` finished candles, appended as they come.
+
+    Rows live in arrays of ``2 * maxlen`` rows: when they are full the last
+    ``maxlen`` rows are moved to the front, so appends are amortized O(1) and
+    ``view`` is always a contiguous, copy-free ``Candles``.
+    """
+
+    def __init__(self, maxlen: int, dtype="float64"):
+        if maxlen < 1:
+            raise ValueError(f"maxlen must be at least 1, got {maxlen}")
+        self.maxlen = maxlen
+        self._data = Candles(
+            np.zeros(2 * maxlen, dtype="int64"),
+            *(np.zeros(2 * maxlen) for _ in PRICE_FIELDS),
+            dtype=dtype,
+        )
+        self._start = self._end = 0
+
+    def __len__(self):
+        return self._end - self._start
+
+    def _make_room(self, n: int):
+        # Move the rows that stay to the front if ``n`` more don't fit
+        if self._end + n <= 2 * self.maxlen:
+            return
+        keep = min(len(self), self.maxlen - n)
+        for field in FIELDS:
+            column = getattr(self._data, field)
+            column[:keep] = column[self._end - keep : self._end]
+        self._start, self._end = 0, keep
+
+    def append(self, candle: dict):
+        self._make_room(1)
+        for field in FIELDS:
+            getattr(self._data, field)[self._end] = candle[field]
+        self._end += 1
+        self._start = max(self._start, self._end - self.maxlen)
+
+    def extend(self, candles: Candles):
+        candles = candles[-self.maxlen :]
+        n = len(candles)
+        self._make_room(n)
+        for field in FIELDS:
+            getattr(self._data, field)[self._end : self._end + n] = getattr(
+                candles, field
+            )
+        self._end += n
+        self._start = max(self._start, self._end - self.maxlen)
+
+    def view(self) -> Candles:
+        """The buffered candles; valid until the next ``append``."""
+        return self._data[self._start : self._end]
+
+    @property
+    def last_time(self):
+        return int(self._data.time[self._end - 1]) if len(self) else None
+
+    def __iter__(self):
+        return iter(self.view())
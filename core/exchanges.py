@@ -0,0 +1,307 @@
+"""
+Exchange adapters with one symbol, interval and candle format.
+
+- Symbols are ``BASE-QUOTE`` in upper case (``BTC-USDT``); ``BTCUSDT``,
+  ``btcusdt``, ``BTC/USDT`` and ``BTC_USDT`` are accepted as input.
+- Intervals use the settings names (``1min``, ``15min``, ``1hour``, ``1day``,
+  ...); the Binance names (``1m``, ``1h``, ...) are accepted as input.
+- Candles are dicts with 'time' (candle open, int seconds), 'open', 'high',
+  'low', 'close', 'volume' and 'is_final' (True for the last update of a
+  candle, with its final values). History is a ``core.candles.Candles``
+  (``history_candles``, int64 times and float64 or float32 values), or its
+  zero-copy DataFrame with 'timestamp' (int seconds), 'open', 'high', 'low',
+  'close' and 'volume' (``history``), oldest first.
+
+``get_exchange(settings.api)`` returns the adapter of an exchange. The REST
+and websocket base URLs come from ``core.brokers_api``
+(``KUCOIN_API_URL``, ``BINANCE_API_URL``, ``BINANCE_WS_URL``), so the whole
+pipeline can run against the mock exchange (``core/mock_exchange.py``).
+"""
+
+import json
+import re
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import aclosing
+from functools import lru_cache
+
+from core import brokers_api as brokers
+from core.candles import Candles
+from core.lazy import lazy_import
+
+pd = lazy_import("pandas")
+requests = lazy_import("requests")
+websockets = lazy_import("websockets")
+
+CANDLE_COLUMNS = ["timestamp", "open", "high", "low", "close", "volume"]
+BINANCE_KLINE_COLUMNS = ("time", "open", "high", "low", "close", "volume")
+
+# Longest first, so that e.g. "BTCUSDT" isn't split as "BTCUS" + "DT"
+QUOTE_ASSETS = (
+    "FDUSD",
+    "USDT",
+    "USDC",
+    "BUSD",
+    "TUSD",
+    "DAI",
+    "EUR",
+    "TRY",
+    "BTC",
+    "ETH",
+    "BNB",
+    "KCS",
+)
+
+INTERVAL_SECONDS = {
+    "1s": 1,
+    "1min": 60,
+    "3min": 180,
+    "5min": 300,
+    "15min": 900,
+    "30min": 1800,
+    "1hour": 3600,
+    "2hour": 7200,
+    "4hour": 14400,
+    "6hour": 21600,
+    "8hour": 28800,
+    "12hour": 43200,
+    "1day": 86400,
+    "1week": 604800,
+}
+_INTERVAL_UNITS = {
+    "s": "s",
+    "m": "min",
+    "min": "min",
+    "h": "hour",
+    "hour": "hour",
+    "d": "day",
+    "day": "day",
+    "w": "week",
+    "week": "week",
+}
+
+
+def normalize_symbol(symbol: str) -> str:
+    """``btcusdt``, ``BTC/USDT``, ... -> ``BTC-USDT``."""
+    symbol = symbol.strip().upper().replace("/", "-").replace("_", "-")
+    if "-" in symbol:
+        return symbol
+    for quote in QUOTE_ASSETS:
+        if symbol.endswith(quote) and len(symbol) > len(quote):
+            return f"{symbol[: -len(quote)]}-{quote}"
+    raise ValueError(f"Unknown quote asset in symbol: {symbol}")
+
+
+def normalize_interval(interval: str) -> str:
+    """``1m``, ``1min``, ``1h``, ... -> ``1min``, ``1hour``, ..."""
+    match = re.fullmatch(r"(\d+)([a-z]+)", interval.strip())
+    unit = match and _INTERVAL_UNITS.get(match.group(2))
+    name = f"{int(match.group(1))}{unit}" if unit else None
+    if name not in INTERVAL_SECONDS:
+        raise ValueError(f"Invalid interval: {interval}")
+    return name
+
+
+def interval_seconds(interval: str) -> int:
+    return INTERVAL_SECONDS[normalize_interval(interval)]
+
+
+def normalize_candles(df: "pd.DataFrame") -> "pd.DataFrame":
+    """
+    Candles in any of the formats found in the project (``timestamp`` in
+    seconds or milliseconds, ``Date``/``datetime`` strings, capitalized
+    columns, newest first) -> the common history format. A missing
+    ``volume`` is filled with 0.
+
+    Raises:
+    ValueError: If the time or a price column is missing.
+    """
+    df = df.rename(columns=str.lower)
+    if "timestamp" not in df.columns:
+        column = next(
+            (c for c in ("time", "datetime", "date") if c in df.columns), None
+        )
+        if column is None:
+            raise ValueError(
+                "Missing candle columns: ['timestamp'] (or 'time', 'datetime', 'date')"
+            )
+        df = df.rename(columns={column: "timestamp"})
+    if "volume" not in df.columns:
+        df = df.assign(volume=0.0)
+    missing = [column for column in CANDLE_COLUMNS if column not in df.columns]
+    if missing:
+        raise ValueError(f"Missing candle columns: {missing}")
+    if not pd.api.types.is_numeric_dtype(df["timestamp"]):
+        df["timestamp"] = pd.to_datetime(df["timestamp"]).astype("int64") // 10**9
+    elif len(df) and df["timestamp"].abs().max() > 10**11:
+        # Milliseconds
+        df["timestamp"] = df["timestamp"] // 1000
+    df = df[CANDLE_COLUMNS].astype("float64").astype({"timestamp": "int64"})
+    return df.sort_values("timestamp", ignore_index=True)
+
+
+class Exchange:
+    """
+    Adapter interface, symbols and intervals are normalized by every method.
+
+    Subclasses implement ``history_candles`` and ``candles_multi``.
+    """
+
+    name = None
+    intervals = {}  # Normalized interval -> exchange interval
+
+    def symbol(self, symbol: str) -> str:
+        """Exchange format of ``symbol``."""
+        return normalize_symbol(symbol)
+
+    def interval(self, interval: str) -> str:
+        """Exchange format of ``interval``."""
+        name = normalize_interval(interval)
+        if name not in self.intervals:
+            raise ValueError(f"{self.name} has no {name} candles")
+        return self.intervals[name]
+
+    def history_candles(
+        self, symbol: str, interval: str, limit: int, dtype="float64"
+    ) -> Candles:
+        """The last ``limit`` candles, oldest first."""
+        raise NotImplementedError
+
+    def history(self, symbol: str, interval: str, limit: int) -> "pd.DataFrame":
+        """``history_candles`` as a DataFrame (sharing its arrays)."""
+        return self.history_candles(symbol, interval, limit).to_frame()
+
+    def history_many(
+        self, symbols, interval: str, limit: int, dtype="float64", max_workers=8
+    ) -> dict:
+        """``history_candles`` of several symbols (normalized symbol -> Candles)."""
+        symbols = [normalize_symbol(symbol) for symbol in symbols]
+        # A few requests at a time, not to hit the rate limits
+        with ThreadPoolExecutor(max_workers=max_workers) as pool:
+            candles = pool.map(
+                lambda symbol: self.history_candles(symbol, interval, limit, dtype),
+                symbols,
+            )
+            return dict(zip(symbols, candles))
+
+    async def candles_multi(self, symbols, interval: str):
+        """Yield (symbol, candle) tuples for ``symbols`` over one connection."""
+        raise NotImplementedError
+        yield
+
+    async def candles(self, symbol: str, interval: str):
+        """Yield the candles of one symbol."""
+        async with aclosing(self.candles_multi([symbol], interval)) as candles:
+            async for _, candle in candles:
+                yield candle
+
+
+class KucoinExchange(Exchange):
+    name = "kucoin"
+    intervals = {name: name for name in INTERVAL_SECONDS if name != "1s"}
+
+    def history_candles(self, symbol, interval, limit, dtype="float64"):
+        rows = brokers.fetch_kucoin_klines(
+            self.interval(interval), limit, self.symbol(symbol)
+        )
+        candles = Candles.from_rows(rows, brokers.KUCOIN_KLINE_COLUMNS, dtype)
+        return candles.sorted()[-limit:]
+
+    async def candles_multi(self, symbols, interval):
+        interval = self.interval(interval)
+        symbols = [self.symbol(symbol) for symbol in symbols]
+        topics = [f"/market/candles:{symbol}_{interval}" for symbol in symbols]
+        last = {}  # Latest update of the current candle, per symbol
+        async with aclosing(brokers.kucoin_messages(topics)) as messages:
+            async for data in messages:
+                if data["subject"] != "trade.candles.update":
+                    continue
+                symbol = data["data"]["symbol"]
+                kline = data["data"]["candles"]
+                candle = {
+                    "time": int(kline[0]),
+                    "open": float(kline[1]),
+                    "high": float(kline[3]),
+                    "low": float(kline[4]),
+                    "close": float(kline[2]),
+                    "volume": float(kline[5]),
+                    "is_final": False,
+                }
+                # KuCoin doesn't flag closed candles: a candle is final once the next one starts
+                previous = last.get(symbol)
+                if previous is not None and candle["time"] > previous["time"]:
+                    yield symbol, {**previous, "is_final": True}
+                if previous is None or candle["time"] >= previous["time"]:
+                    last[symbol] = candle
+                    yield symbol, candle
+
+
+class BinanceExchange(Exchange):
+    name = "binance"
+    intervals = {
+        "1s": "1s",
+        "1min": "1m",
+        "3min": "3m",
+        "5min": "5m",
+        "15min": "15m",
+        "30min": "30m",
+        "1hour": "1h",
+        "2hour": "2h",
+        "4hour": "4h",
+        "6hour": "6h",
+        "8hour": "8h",
+        "12hour": "12h",
+        "1day": "1d",
+        "1week": "1w",
+    }
+
+    def symbol(self, symbol):
+        return normalize_symbol(symbol).replace("-", "")
+
+    def history_candles(self, symbol, interval, limit, dtype="float64"):
+        # Public endpoint, no API key needed (unlike ``get_historical_klines``)
+        response = requests.get(
+            f"{brokers.BINANCE_API_URL}/api/v3/klines",
+            params={
+                "symbol": self.symbol(symbol),
+                "interval": self.interval(interval),
+                "limit": min(limit, 1000),
+            },
+            timeout=10,
+        )
+        if response.status_code != 200:
+            raise Exception(f"Error fetching data from Binance: {response.text}")
+        klines = [kline[:6] for kline in response.json()]
+        candles = Candles.from_rows(klines, BINANCE_KLINE_COLUMNS, dtype)
+        candles.time //= 1000  # Milliseconds
+        return candles.sorted()
+
+    async def candles_multi(self, symbols, interval):
+        interval = self.interval(interval)
+        names = {self.symbol(symbol): normalize_symbol(symbol) for symbol in symbols}
+        streams = "/".join(f"{name.lower()}@kline_{interval}" for name in names)
+        url = f"{brokers.BINANCE_WS_URL}/stream?streams={streams}"
+        async with websockets.connect(url) as websocket:
+            while True:
+                data = json.loads(await websocket.recv())["data"]
+                kline = data["k"]
+                yield names[data["s"]], {
+                    "time": kline["t"] // 1000,
+                    "open": float(kline["o"]),
+                    "high": float(kline["h"]),
+                    "low": float(kline["l"]),
+                    "close": float(kline["c"]),
+                    "volume": float(kline["v"]),
+                    "is_final": kline["x"],
+                }
+
+
+EXCHANGES = {exchange.name: exchange for exchange in (KucoinExchange, BinanceExchange)}
+
+
+@lru_cache(maxsize=None)
+def get_exchange(name: str) -> Exchange:
+    """Adapter of exchange ``name`` (``settings.api``)."""
+    try:
+        return EXCHANGES[name.lower()]()
+    except KeyError:
+        raise ValueError(f"Unsupported exchange: {name}") from None
@@ -0,0 +1,549 @@
+"""
+Background jobs: backfills, portfolio backtests and robustness studies.
+
+Jobs are rows of a SQLite database (WAL mode), so the queue survives
+restarts: jobs that were running when the process stopped are queued again.
+A dispatcher thread hands queued jobs to a process pool, the workers write
+their progress and result back to the database.
+
+- Results are cached by inputs: submitting the same kind and params again
+  returns the finished (or queued / running) job instead of a new one, as
+  long as the history it fetches ends with the same candle (the key holds
+  the open time of the candle in progress). Backfills write to the signal
+  journal and are never served from the cache.
+- Cancelling a queued job removes it from the queue. A running job is
+  stopped at its next progress report (``JobCancelled``).
+- ``not_before`` delays a job, e.g. a nightly backfill.
+
+Job functions take ``(params, progress, context)``: ``params`` are the
+(JSON) inputs, ``progress(fraction, message=None)`` reports progress and
+``context`` holds server configuration that isn't part of the cache key.
+"""
+
+import hashlib
+import json
+import math
+import multiprocessing
+import os
+import sqlite3
+import threading
+import time
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+from core.lazy import lazy_import
+
+np = lazy_import("numpy")
+exchanges = lazy_import("core.exchanges")
+execution = lazy_import("core.strategiez.execution")
+portfolio = lazy_import("core.strategiez.portfolio")
+robustness = lazy_import("core.strategiez.robustness")
+consistency = lazy_import("core.strategiez.consistency")
+journal = lazy_import("core.journal")
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS jobs (
+    id INTEGER PRIMARY KEY,
+    kind TEXT NOT NULL,
+    params TEXT NOT NULL,
+    key TEXT NOT NULL,
+    status TEXT NOT NULL,
+    progress REAL NOT NULL DEFAULT 0,
+    message TEXT,
+    result TEXT,
+    error TEXT,
+    cancel_requested INTEGER NOT NULL DEFAULT 0,
+    not_before REAL NOT NULL,
+    created_at REAL NOT NULL,
+    started_at REAL,
+    finished_at REAL
+);
+CREATE INDEX IF NOT EXISTS jobs_key ON jobs (key);
+CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, not_before);
+"""
+
+STATUSES = ("queued", "running", "done", "failed", "cancelled")
+FINISHED = ("done", "failed", "cancelled")
+# Columns returned without the result (listings, progress)
+SUMMARY_COLUMNS = (
+    "id",
+    "kind",
+    "params",
+    "status",
+    "progress",
+    "message",
+    "error",
+    "not_before",
+    "created_at",
+    "started_at",
+    "finished_at",
+)
+# Min seconds between two progress writes of a job
+PROGRESS_INTERVAL = 0.2
+
+
+class JobCancelled(Exception):
+    """Raised by ``progress`` when the job was cancelled."""
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, timeout=10, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+def data_end(params: dict, now: float) -> int:
+    """Open time of the candle in progress at ``now``, where the fetched history ends."""
+    seconds = exchanges.interval_seconds(params["interval"])
+    return int(now // seconds) * seconds
+
+
+def job_key(kind: str, params: dict, end: int = None) -> str:
+    """Cache key of a job: hash of the kind, the canonical params and the data end."""
+    canonical = json.dumps([kind, params, end], sort_keys=True, separators=(",", ":"))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
+
+def _jsonable(value):
+    """NumPy values -> Python, non-finite floats -> None (strict JSON)."""
+    if isinstance(value, dict):
+        return {str(k): _jsonable(v) for k, v in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_jsonable(v) for v in value]
+    if hasattr(value, "tolist"):
+        return _jsonable(value.tolist())
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+def _row_to_job(row) -> dict:
+    job = dict(row)
+    job["params"] = json.loads(job["params"])
+    if job.get("result") is not None:
+        job["result"] = json.loads(job["result"])
+    return job
+
+
+# Job kinds
+
+
+def _history(params: dict, symbol: str):
+    return exchanges.get_exchange(params["api"]).history_candles(
+        symbol, params["interval"], params["limit"]
+    )
+
+
+def run_portfolio_backtest(params, progress, context):
+    """``portfolio.backtest_portfolio`` on the recent history of ``symbols``."""
+    progress(0.0, "Fetching candles")
+    candles = exchanges.get_exchange(params["api"]).history_many(
+        params["symbols"], params["interval"], params["limit"]
+    )
+    progress(0.2, "Backtesting")
+    return portfolio.backtest_portfolio(
+        candles,
+        params["strategies"],
+        execution.ExecutionModel(**params.get("execution", {})),
+        portfolio.PortfolioLimits(**params.get("limits", {})),
+        params.get("initial_balance", 10000.0),
+        progress=lambda fraction: progress(0.2 + 0.8 * fraction),
+    )
+
+
+def run_walk_forward(params, progress, context):
+    """``robustness.walk_forward`` on the recent history of ``symbol``."""
+    progress(0.0, "Fetching candles")
+    candles = _history(params, params["symbol"])
+    progress(0.1, "Optimizing")
+    # The job pool is the parallelism, no nested pool
+    return robustness.walk_forward(
+        candles,
+        params["windows"],
+        params.get("lookbacks", (3,)),
+        params.get("train_size", 1000),
+        params.get("test_size", 250),
+        params.get("step"),
+        max_workers=1,
+        progress=lambda fraction: progress(0.1 + 0.9 * fraction),
+    )
+
+
+def run_sensitivity(params, progress, context):
+    """``robustness.sensitivity`` on the recent history of ``symbol``."""
+    progress(0.0, "Fetching candles")
+    candles = _history(params, params["symbol"])
+    progress(0.1, "Backtesting the grid")
+    return robustness.sensitivity(
+        candles,
+        params["windows"],
+        params.get("lookbacks", (2, 3, 4, 5)),
+        max_workers=1,
+        progress=lambda fraction: progress(0.1 + 0.9 * fraction),
+    )
+
+
+def run_signal_backfill(params, progress, context):
+    """
+    Record the ``smacrossprice`` signals of the recent history of ``symbols``
+    in the signal journal (source "backfill").
+    """
+    signals = journal.SignalJournal(context["journal_path"])
+    counts = {}
+    try:
+        for i, symbol in enumerate(params["symbols"]):
+            symbol = exchanges.normalize_symbol(symbol)
+            progress(i / len(params["symbols"]), f"Backfilling {symbol}")
+            # The last candle is still in progress
+            candles = _history(params, symbol)[:-1]
+            counts[symbol] = 0
+            for strategy in params["strategies"]:
+                window = strategy["params"]["window"]
+                lookback = strategy["params"].get("lookback", 3)
+                _, sides = consistency.batch_signals(candles, window, lookback)
+                for index in np.flatnonzero([side is not None for side in sides]):
+                    signals.record(
+                        source="backfill",
+                        strategy=strategy["operator"],
+                        params=strategy["params"],
+                        symbol=symbol,
+                        interval=params["interval"],
+                        candle_time=candles.time[index],
+                        price=candles.close[index],
+                        side=sides[index],
+                    )
+                    counts[symbol] += 1
+    finally:
+        signals.close()
+    return {"signals": counts}
+
+
+# Kinds with side effects, always run again
+UNCACHED_KINDS = ("signal_backfill",)
+
+# Kind -> (function, settings fields used as default params, required params)
+JOB_KINDS = {
+    "portfolio_backtest": (
+        run_portfolio_backtest,
+        ("api", "interval", "limit", "strategies"),
+        ("symbols",),
+    ),
+    "walk_forward": (
+        run_walk_forward,
+        ("api", "symbol", "interval", "limit"),
+        ("windows",),
+    ),
+    "sensitivity": (
+        run_sensitivity,
+        ("api", "symbol", "interval", "limit"),
+        ("windows",),
+    ),
+    "signal_backfill": (
+        run_signal_backfill,
+        ("api", "interval", "limit", "strategies"),
+        ("symbols",),
+    ),
+}
+# Param -> expected type, checked when present
+PARAM_TYPES = {
+    "api": str,
+    "symbol": str,
+    "interval": str,
+    "limit": int,
+    "symbols": list,
+    "windows": list,
+    "lookbacks": list,
+    "strategies": list,
+}
+
+
+def check_params(kind: str, params: dict):
+    """
+    Reject params a job of ``kind`` would fail on, before it is queued.
+
+    Raises:
+    ValueError: If a required param is missing or a param has the wrong type.
+    """
+    _, _, required = JOB_KINDS[kind]
+    missing = [name for name in required if name not in params]
+    if missing:
+        raise ValueError(f"Missing params for a {kind} job: {missing}")
+    for name, expected in PARAM_TYPES.items():
+        value = params.get(name)
+        if value is None:
+            continue
+        if not isinstance(value, expected) or isinstance(value, bool):
+            raise ValueError(f"{name} must be a {expected.__name__}, got {value!r}")
+        if expected is list and not value:
+            raise ValueError(f"{name} must not be empty")
+
+
+class _Progress:
+    """``progress`` callback of a running job, throttled, raises ``JobCancelled``."""
+
+    def __init__(self, connection, job_id: int):
+        self.connection = connection
+        self.job_id = job_id
+        self.last_write = 0.0
+
+    def __call__(self, fraction: float, message: str = None):
+        now = time.monotonic()
+        if message is None and now - self.last_write < PROGRESS_INTERVAL:
+            return
+        self.last_write = now
+        with self.connection:
+            self.connection.execute(
+                "UPDATE jobs SET progress = ?, message = COALESCE(?, message) "
+                "WHERE id = ?",
+                (float(fraction), message, self.job_id),
+            )
+        cancelled = self.connection.execute(
+            "SELECT cancel_requested FROM jobs WHERE id = ?", (self.job_id,)
+        ).fetchone()[0]
+        if cancelled:
+            raise JobCancelled()
+
+
+def _run_job(path: str, job_id: int, context: dict):
+    """Worker entry point: run one claimed job and store its outcome."""
+    connection = _connect(path)
+    try:
+        row = connection.execute(
+            "SELECT kind, params FROM jobs WHERE id = ?", (job_id,)
+        ).fetchone()
+        function, _, _ = JOB_KINDS[row["kind"]]
+        progress = _Progress(connection, job_id)
+        try:
+            progress(0.0)
+            result = json.dumps(
+                _jsonable(function(json.loads(row["params"]), progress, context))
+            )
+            outcome = ("done", 1.0, result, None)
+        except JobCancelled:
+            outcome = ("cancelled", None, None, None)
+        except Exception as e:
+            outcome = ("failed", None, None, f"{type(e).__name__}: {e}")
+        status, fraction, result, error = outcome
+        with connection:
+            connection.execute(
+                "UPDATE jobs SET status = ?, progress = COALESCE(?, progress), "
+                "result = ?, error = ?, finished_at = ? WHERE id = ?",
+                (status, fraction, result, error, time.time(), job_id),
+            )
+    finally:
+        connection.close()
+
+
+class JobManager:
+    """
+    Parameters:
+    path (str): SQLite database file, created if needed.
+    max_workers (int): Worker processes, i.e. jobs running at the same time.
+    context (dict, optional): Passed to every job function (not part of the cache key).
+    """
+
+    def __init__(self, path: str, max_workers: int = 2, context: dict = None):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.max_workers = max_workers
+        self.context = context or {}
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._running = {}  # Job id -> Future
+        self._stopping = False
+        self._connection = _connect(path)
+        self._connection.executescript(SCHEMA)
+        with self._connection:
+            # Interrupted by a restart: run them again
+            self._connection.execute(
+                "UPDATE jobs SET status = 'queued', progress = 0, started_at = NULL "
+                "WHERE status = 'running'"
+            )
+        self._pool = self._new_pool()
+        self._dispatcher = threading.Thread(
+            target=self._dispatch_loop, name="job-dispatcher", daemon=True
+        )
+        self._dispatcher.start()
+
+    def _new_pool(self):
+        # Spawned workers: forking a process that runs threads is unsafe
+        return ProcessPoolExecutor(
+            max_workers=self.max_workers,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+
+    def _execute(self, sql: str, args=()):
+        with self._lock, self._connection:
+            return self._connection.execute(sql, args)
+
+    def _fetch(self, sql: str, args=()):
+        with self._lock:
+            return self._connection.execute(sql, args).fetchall()
+
+    def submit(self, kind: str, params: dict, use_cache: bool = True, not_before=None):
+        """
+        Queue a job, or return the existing one with the same inputs.
+
+        Returns:
+        Tuple[dict, bool]: The job and whether it came from the cache.
+
+        Raises:
+        ValueError: If the kind or the interval is unknown, or the params are
+        invalid (``check_params``).
+        """
+        if kind not in JOB_KINDS:
+            raise ValueError(
+                f"Unknown job kind: {kind!r}, expected one of {list(JOB_KINDS)}"
+            )
+        params = _jsonable(params)
+        check_params(kind, params)
+        now = time.time()
+        # A delayed job fetches its history when it starts
+        start = max(now, not_before or now)
+        key = job_key(
+            kind, params, data_end(params, start) if "interval" in params else None
+        )
+        if use_cache and kind not in UNCACHED_KINDS:
+            rows = self._fetch(
+                "SELECT id FROM jobs WHERE key = ? AND status IN "
+                "('queued', 'running', 'done') ORDER BY id DESC LIMIT 1",
+                (key,),
+            )
+            if rows:
+                return self.get(rows[0]["id"]), True
+        cursor = self._execute(
+            "INSERT INTO jobs (kind, params, key, status, not_before, created_at) "
+            "VALUES (?, ?, ?, 'queued', ?, ?)",
+            (kind, json.dumps(params), key, float(not_before or now), now),
+        )
+        self._wake.set()
+        return self.get(cursor.lastrowid), False
+
+    def get(self, job_id: int, with_result: bool = True):
+        """The job, None if it doesn't exist."""
+        columns = "*" if with_result else ", ".join(SUMMARY_COLUMNS)
+        rows = self._fetch(f"SELECT {columns} FROM jobs WHERE id = ?", (job_id,))
+        return _row_to_job(rows[0]) if rows else None
+
+    def list(self, status: str = None, kind: str = None, limit: int = 100):
+        """Jobs without their results, newest first."""
+        conditions, args = [], []
+        for column, value in (("status", status), ("kind", kind)):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                args.append(value)
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        rows = self._fetch(
+            f"SELECT {', '.join(SUMMARY_COLUMNS)} FROM jobs {where} "
+            "ORDER BY id DESC LIMIT ?",
+            [*args, limit],
+        )
+        return [_row_to_job(row) for row in rows]
+
+    def cancel(self, job_id: int):
+        """
+        Cancel a job: queued jobs are dropped, running ones stop at their
+        next progress report. Finished jobs are left as they are.
+        """
+        now = time.time()
+        cursor = self._execute(
+            "UPDATE jobs SET status = 'cancelled', finished_at = ? "
+            "WHERE id = ? AND status = 'queued'",
+            (now, job_id),
+        )
+        if not cursor.rowcount:
+            self._execute(
+                "UPDATE jobs SET cancel_requested = 1 "
+                "WHERE id = ? AND status = 'running'",
+                (job_id,),
+            )
+        return self.get(job_id, with_result=False)
+
+    def _claim(self, count: int):
+        """Mark up to ``count`` due jobs as running and return their ids."""
+        now = time.time()
+        rows = self._fetch(
+            "SELECT id FROM jobs WHERE status = 'queued' AND not_before <= ? "
+            "ORDER BY not_before, id LIMIT ?",
+            (now, count),
+        )
+        claimed = []
+        for row in rows:
+            cursor = self._execute(
+                "UPDATE jobs SET status = 'running', started_at = ? "
+                "WHERE id = ? AND status = 'queued'",
+                (now, row["id"]),
+            )
+            if cursor.rowcount:
+                claimed.append(row["id"])
+        return claimed
+
+    def _dispatch_loop(self):
+        while not self._stopping:
+            free = self.max_workers - len(self._running)
+            if free > 0:
+                for job_id in self._claim(free):
+                    try:
+                        self._start(job_id)
+                    except Exception as e:
+                        print(f"Job {job_id} could not start: {e}")
+                        self._execute(
+                            "UPDATE jobs SET status = 'failed', error = ?, "
+                            "finished_at = ? WHERE id = ?",
+                            (f"{type(e).__name__}: {e}", time.time(), job_id),
+                        )
+            # Woken by submit and finished jobs, the timeout picks up delayed ones
+            self._wake.wait(timeout=1.0)
+            self._wake.clear()
+
+    def _start(self, job_id: int):
+        try:
+            future = self._pool.submit(_run_job, self.path, job_id, self.context)
+        except BrokenProcessPool:
+            self._pool = self._new_pool()
+            future = self._pool.submit(_run_job, self.path, job_id, self.context)
+        self._running[job_id] = future
+        future.add_done_callback(lambda future: self._finished(job_id, future))
+
+    def _finished(self, job_id: int, future):
+        self._running.pop(job_id, None)
+        error = None if future.cancelled() else future.exception()
+        if error is not None and not self._stopping:
+            # The worker died (e.g. out of memory) before storing the outcome
+            print(f"Job {job_id} crashed: {error}")
+            self._execute(
+                "UPDATE jobs SET status = 'failed', error = ?, finished_at = ? "
+                "WHERE id = ? AND status = 'running'",
+                (f"{type(error).__name__}: {error}", time.time(), job_id),
+            )
+            if isinstance(error, BrokenProcessPool):
+                self._pool = self._new_pool()
+        self._wake.set()
+
+    def wait(self, job_id: int, timeout: float = None, poll: float = 0.05):
+        """Block until the job is finished, returns it (tests, scripts)."""
+        deadline = None if timeout is None else time.monotonic() + timeout
+        while True:
+            job = self.get(job_id)
+            if job is None or job["status"] in FINISHED:
+                return job
+            if deadline is not None and time.monotonic() > deadline:
+                raise TimeoutError(f"Job {job_id} still {job['status']}")
+            time.sleep(poll)
+
+    def close(self):
+        """Stop dispatching; running jobs are queued again on the next start."""
+        self._stopping = True
+        self._wake.set()
+        self._dispatcher.join()
+        # Don't wait for long jobs, their rows stay 'running' and are requeued
+        processes = list((getattr(self._pool, "_processes", None) or {}).values())
+        self._pool.shutdown(wait=False, cancel_futures=True)
+        for process in processes:
+            process.terminate()
+        with self._lock:
+            self._connection.close()
@@ -0,0 +1,221 @@
+"""
+Append-only signal journal.
+
+Every BUY/SELL decision (live or from ``generate_signals``) is stored in a
+SQLite database in WAL mode. ``record`` only puts the signal on a queue; a
+writer thread group-commits whatever is queued in one transaction, so the
+event loop never waits for the disk.
+"""
+
+import json
+import os
+import queue
+import sqlite3
+import threading
+import time
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS signals (
+    id INTEGER PRIMARY KEY,
+    source TEXT NOT NULL,
+    strategy TEXT NOT NULL,
+    params TEXT NOT NULL,
+    symbol TEXT NOT NULL,
+    interval TEXT NOT NULL,
+    candle_time INTEGER NOT NULL,
+    price REAL NOT NULL,
+    side TEXT NOT NULL,
+    recorded_at REAL NOT NULL,
+    UNIQUE (source, strategy, params, symbol, interval, candle_time, side)
+);
+CREATE INDEX IF NOT EXISTS signals_time ON signals (candle_time);
+CREATE INDEX IF NOT EXISTS signals_symbol_time ON signals (symbol, candle_time);
+"""
+
+COLUMNS = (
+    "source",
+    "strategy",
+    "params",
+    "symbol",
+    "interval",
+    "candle_time",
+    "price",
+    "side",
+    "recorded_at",
+)
+
+# Re-recording the same signal (e.g. /historical_data called twice) is a no-op
+INSERT = (
+    f"INSERT OR IGNORE INTO signals ({', '.join(COLUMNS)}) "
+    f"VALUES ({', '.join('?' * len(COLUMNS))})"
+)
+
+_STOP = object()
+
+
+def _connect(path: str) -> sqlite3.Connection:
+    connection = sqlite3.connect(path, check_same_thread=False)
+    connection.row_factory = sqlite3.Row
+    connection.execute("PRAGMA journal_mode=WAL")
+    connection.execute("PRAGMA synchronous=NORMAL")
+    return connection
+
+
+class SignalJournal:
+    """
+    Parameters:
+    path (str): SQLite database file, created if needed.
+    batch_size (int): Max signals per transaction.
+    """
+
+    def __init__(self, path: str, batch_size: int = 1000):
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        self.path = path
+        self.batch_size = batch_size
+        self._queue = queue.Queue()
+        connection = _connect(path)
+        connection.executescript(SCHEMA)
+        connection.close()
+        self._writer = threading.Thread(
+            target=self._write_loop, name="signal-journal", daemon=True
+        )
+        self._writer.start()
+
+    def record(
+        self,
+        source: str,
+        strategy: str,
+        params: dict,
+        symbol: str,
+        interval: str,
+        candle_time,
+        price: float,
+        side: str,
+    ):
+        """Queue one signal, never blocks."""
+        self._queue.put(
+            (
+                source,
+                strategy,
+                # Canonical form, so the UNIQUE constraint sees equal params as equal
+                json.dumps(params, sort_keys=True),
+                symbol,
+                interval,
+                int(candle_time),
+                float(price),
+                side,
+                time.time(),
+            )
+        )
+
+    def record_many(self, signals, **common):
+        """
+        Queue ``generate_signals`` output (dicts with timestamp, price and type).
+
+        ``common`` holds the other ``record`` arguments (source, strategy, ...).
+        """
+        for signal in signals:
+            self.record(
+                candle_time=signal["timestamp"],
+                price=signal["price"],
+                side=signal["type"],
+                **common,
+            )
+
+    def _write_loop(self):
+        connection = _connect(self.path)
+        while True:
+            batch = [self._queue.get()]
+            # Group commit: everything queued meanwhile goes in the same transaction
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            rows = [row for row in batch if row is not _STOP]
+            try:
+                if rows:
+                    with connection:
+                        connection.executemany(INSERT, rows)
+            except sqlite3.Error as e:
+                print(f"Signal journal write failed: {e}")
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if len(rows) < len(batch):
+                connection.close()
+                return
+
+    def flush(self):
+        """Wait until every queued signal is committed."""
+        self._queue.join()
+
+    def close(self):
+        self._queue.put(_STOP)
+        self._writer.join()
+
+    def query(
+        self,
+        symbol: str = None,
+        side: str = None,
+        source: str = None,
+        strategy: str = None,
+        start=None,
+        end=None,
+        limit: int = 100,
+        cursor: str = None,
+    ):
+        """
+        Signals, most recent candle first.
+
+        Parameters:
+        start, end (int, optional): Candle time range in seconds (inclusive).
+        cursor (str, optional): ``next_cursor`` of the previous page.
+
+        Returns:
+        Tuple[List[dict], str]: The page and the cursor of the next one (None at the end).
+        """
+        conditions, args = [], []
+        for column, value in (
+            ("symbol", symbol),
+            ("side", side),
+            ("source", source),
+            ("strategy", strategy),
+        ):
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                args.append(value)
+        if start is not None:
+            conditions.append("candle_time >= ?")
+            args.append(int(start))
+        if end is not None:
+            conditions.append("candle_time <= ?")
+            args.append(int(end))
+        if cursor:
+            # Keyset pagination, stays fast however deep the page is
+            try:
+                cursor_time, cursor_id = (int(part) for part in cursor.split(":"))
+            except ValueError:
+                raise ValueError(f"Invalid cursor: {cursor!r}") from None
+            conditions.append("(candle_time, id) < (?, ?)")
+            args += [cursor_time, cursor_id]
+
+        where = f"WHERE {' AND '.join(conditions)}" if conditions else ""
+        sql = (
+            f"SELECT id, {', '.join(COLUMNS)} FROM signals {where} "
+            "ORDER BY candle_time DESC, id DESC LIMIT ?"
+        )
+        connection = _connect(self.path)
+        try:
+            rows = connection.execute(sql, [*args, limit + 1]).fetchall()
+        finally:
+            connection.close()
+
+        signals = [dict(row, params=json.loads(row["params"])) for row in rows[:limit]]
+        next_cursor = None
+        if len(rows) > limit:
+            last = signals[-1]
+            next_cursor = f"{last['candle_time']}:{last['id']}"
+        return signals, next_cursor
@@ -0,0 +1,37 @@
+"""
+Deferred imports, to keep the API process start (and restarts) fast.
+"""
+
+import importlib
+import importlib.util
+import sys
+
+
+def lazy_import(name: str):
+    """
+    Return module ``name`` without executing it yet.
+
+    The module is really imported on the first attribute access, e.g.
+    ``pd = lazy_import("pandas")`` costs nothing until ``pd.DataFrame`` is used.
+    """
+    if name in sys.modules:
+        return sys.modules[name]
+    spec = importlib.util.find_spec(name)
+    if spec is None:
+        raise ModuleNotFoundError(f"No module named {name!r}", name=name)
+    loader = importlib.util.LazyLoader(spec.loader)
+    spec.loader = loader
+    module = importlib.util.module_from_spec(spec)
+    sys.modules[name] = module
+    loader.exec_module(module)
+    parent, _, child = name.rpartition(".")
+    if parent:
+        setattr(sys.modules[parent], child, module)
+    return module
+
+
+def warm_up(*modules):
+    """Force the import of lazily imported modules (e.g. in a background thread)."""
+    for module in modules:
+        # Any attribute access triggers the real import
+        module.__dict__
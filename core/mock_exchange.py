@@ -0,0 +1,251 @@
+"""
+Local mock exchange, speaking the public KuCoin protocol.
+
+Serves recorded or synthetic candles over REST (``/api/v1/market/candles``)
+and websocket (``/market/candles`` topics), with a configurable update rate.
+Point the API to it to test the whole pipeline offline and reproducibly,
+without exchange rate limits:
+
+    uv run -m core.mock_exchange --port 8001 --rate 100
+    KUCOIN_API_URL=http://127.0.0.1:8001 uv run uvicorn api.main:app
+
+Every candle is split into ``ticks_per_candle`` updates that converge to the
+final candle. The history served over REST ends with the first live candle,
+which starts at the current time.
+"""
+
+import argparse
+import asyncio
+import time
+import zlib
+
+import numpy as np
+import pandas as pd
+from fastapi import FastAPI, HTTPException, Request, WebSocket, WebSocketDisconnect
+
+from core.exchanges import interval_seconds, normalize_candles
+
+# Synthetic candles generated after the history, per market
+SYNTHETIC_LIVE_CANDLES = 100_000
+
+
+def synthetic_candles(n: int, seed: int, price: float = 100.0) -> pd.DataFrame:
+    """Random walk candles, timestamps 0, 1, 2, ... (rescaled by ``MockMarket``)."""
+    rng = np.random.default_rng(seed)
+    close = price * np.exp(np.cumsum(rng.normal(0, 0.002, n)))
+    open_ = np.r_[price, close[:-1]]
+    spread = close * rng.uniform(0, 0.002, n)
+    return pd.DataFrame(
+        {
+            "timestamp": np.arange(n),
+            "open": open_,
+            "high": np.maximum(open_, close) + spread,
+            "low": np.minimum(open_, close) - spread,
+            "close": close,
+            "volume": rng.uniform(1, 10, n),
+        }
+    )
+
+
+class MockMarket:
+    """
+    Candles of one (symbol, interval): the first ``history`` ones are the
+    past, served by REST, the others are replayed live.
+
+    Parameters:
+    candles (pd.DataFrame): Candles in the common history format, in order.
+    interval (int): Candle length in seconds.
+    history (int): Number of past candles.
+    """
+
+    def __init__(self, candles: pd.DataFrame, interval: int, history: int):
+        history = min(history, len(candles) - 1)
+        now = int(time.time()) // interval * interval
+        # Rescale the times so that the first live candle starts now
+        self.times = now + (np.arange(len(candles)) - history) * interval
+        self.values = candles[["open", "high", "low", "close", "volume"]].to_numpy()
+        self.history_size = history
+
+    def history(self, start_at: int, end_at: int):
+        """
+        Candles in ``[start_at, end_at]``, newest first (KuCoin REST format).
+
+        Like on KuCoin, the candle in progress (the first live one) is included.
+        """
+        times = self.times[: self.history_size + 1]
+        first = np.searchsorted(times, start_at, side="left")
+        last = np.searchsorted(times, end_at, side="right")
+        return [
+            _kline(self.times[i], *self.values[i])
+            for i in range(last - 1, first - 1, -1)
+        ]
+
+    def ticks(self, ticks_per_candle: int):
+        """Live updates, the last update of every candle has its final values."""
+        for i in range(self.history_size, len(self.times)):
+            open_, high, low, close, volume = self.values[i]
+            for tick in range(1, ticks_per_candle + 1):
+                if tick == ticks_per_candle:
+                    yield _kline(self.times[i], open_, high, low, close, volume)
+                    continue
+                price = open_ + (close - open_) * tick / ticks_per_candle
+                yield _kline(
+                    self.times[i],
+                    open_,
+                    max(open_, price),
+                    min(open_, price),
+                    price,
+                    volume * tick / ticks_per_candle,
+                )
+
+
+def _kline(time_, open_, high, low, close, volume):
+    # KuCoin order: time, open, close, high, low, volume, turnover
+    return [
+        str(int(time_)),
+        str(open_),
+        str(close),
+        str(high),
+        str(low),
+        str(volume),
+        str(volume * close),
+    ]
+
+
+def create_app(
+    candles: pd.DataFrame = None,
+    rate: float = 10.0,
+    ticks_per_candle: int = 10,
+    history: int = 1500,
+    seed: int = 0,
+) -> FastAPI:
+    """
+    Parameters:
+    candles (pd.DataFrame, optional): Recorded candles, served for every symbol.
+                                      Synthetic candles (seeded per symbol) otherwise.
+    rate (float): Websocket updates per second per topic, 0 for as fast as possible.
+    ticks_per_candle (int): Updates per candle.
+    history (int): Candles served by the REST endpoint before the live ones.
+    seed (int): Seed of the synthetic candles.
+    """
+    app = FastAPI(title="Mock exchange")
+    markets = {}
+
+    def market(symbol: str, interval: str) -> MockMarket:
+        key = (symbol, interval)
+        if key not in markets:
+            if candles is not None:
+                data = normalize_candles(candles)
+            else:
+                data = synthetic_candles(
+                    history + SYNTHETIC_LIVE_CANDLES,
+                    seed + zlib.crc32(symbol.encode()),
+                )
+            markets[key] = MockMarket(data, interval_seconds(interval), history)
+        return markets[key]
+
+    @app.post("/api/v1/bullet-public")
+    def bullet_public(request: Request):
+        endpoint = str(request.base_url).replace("http", "ws", 1) + "socket"
+        return {
+            "code": "200000",
+            "data": {
+                "token": "mock",
+                "instanceServers": [
+                    {
+                        "endpoint": endpoint,
+                        "protocol": "websocket",
+                        "encrypt": False,
+                        "pingInterval": 18000,
+                        "pingTimeout": 10000,
+                    }
+                ],
+            },
+        }
+
+    @app.get("/api/v1/market/candles")
+    def get_candles(type: str, symbol: str, startAt: int, endAt: int):
+        try:
+            rows = market(symbol, type).history(startAt, endAt)
+        except ValueError as e:
+            raise HTTPException(status_code=400, detail=str(e))
+        return {"code": "200000", "data": rows}
+
+    async def stream_candles(websocket: WebSocket, topic: str, symbol: str, interval):
+        for kline in market(symbol, interval).ticks(ticks_per_candle):
+            await websocket.send_json(
+                {
+                    "type": "message",
+                    "topic": topic,
+                    "subject": "trade.candles.update",
+                    "data": {
+                        "symbol": symbol,
+                        "candles": kline,
+                        "time": time.time_ns(),
+                    },
+                }
+            )
+            # sleep(0) still lets the other topics and the receive loop run
+            await asyncio.sleep(1 / rate if rate else 0)
+
+    @app.websocket("/socket")
+    async def socket(websocket: WebSocket):
+        await websocket.accept()
+        await websocket.send_json({"id": "mock", "type": "welcome"})
+        tasks = []
+        try:
+            while True:
+                message = await websocket.receive_json()
+                if message.get("type") == "ping":
+                    await websocket.send_json({"id": message["id"], "type": "pong"})
+                    continue
+                if message.get("type") != "subscribe":
+                    continue
+                channel, _, targets = message["topic"].partition(":")
+                if channel != "/market/candles":
+                    await websocket.send_json(
+                        {
+                            "id": message["id"],
+                            "type": "error",
+                            "data": f"Unsupported topic: {channel}",
+                        }
+                    )
+                    continue
+                await websocket.send_json({"id": message["id"], "type": "ack"})
+                for target in targets.split(","):
+                    symbol, _, interval = target.rpartition("_")
+                    topic = f"/market/candles:{target}"
+                    tasks.append(
+                        asyncio.create_task(
+                            stream_candles(websocket, topic, symbol, interval)
+                        )
+                    )
+        except WebSocketDisconnect:
+            pass
+        finally:
+            for task in tasks:
+                task.cancel()
+
+    return app
+
+
+def main():
+    import uvicorn
+
+    parser = argparse.ArgumentParser(description="Local mock exchange (KuCoin API)")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8001)
+    parser.add_argument("--data", help="CSV of recorded candles, synthetic if omitted")
+    parser.add_argument("--rate", type=float, default=10.0, help="Updates/s per topic")
+    parser.add_argument("--ticks-per-candle", type=int, default=10)
+    parser.add_argument("--history", type=int, default=1500)
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    candles = pd.read_csv(args.data) if args.data else None
+    app = create_app(candles, args.rate, args.ticks_per_candle, args.history, args.seed)
+    uvicorn.run(app, host=args.host, port=args.port)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,252 @@
+"""
+In-memory L2 order books, maintained from a snapshot plus a diff stream.
+
+Each side keeps its price levels in two preallocated NumPy arrays (prices and
+sizes) sorted so that the best level is the last one. Updates happen in
+place: a level change is a binary search, adding or removing a level only
+moves the levels above it, which near the top of the book is a handful.
+
+Diffs carry the exchange sequence range they cover (``first``..``last``).
+A diff that doesn't follow the book's sequence means updates were lost: the
+book is dropped and rebuilt from a new snapshot (``maintain_book``).
+"""
+
+import asyncio
+from collections import deque
+
+import numpy as np
+
+# Diffs kept while a snapshot is being fetched
+MAX_PENDING_DIFFS = 10_000
+
+
+class SequenceGap(Exception):
+    """A diff doesn't follow the book's sequence, the book must be resynced."""
+
+
+class BookSide:
+    """
+    Price levels of one side of the book.
+
+    Bids are stored by ascending price and asks by descending price (as
+    negated prices), so the best level is always the last one.
+    """
+
+    def __init__(self, is_bid: bool, capacity: int = 1024):
+        self._sign = 1.0 if is_bid else -1.0
+        self._keys = np.empty(capacity, dtype="float64")
+        self._sizes = np.empty(capacity, dtype="float64")
+        self._n = 0
+
+    def __len__(self):
+        return self._n
+
+    def clear(self):
+        self._n = 0
+
+    def _reserve(self, capacity: int):
+        if capacity <= len(self._keys):
+            return
+        capacity = max(capacity, 2 * len(self._keys))
+        for name in ("_keys", "_sizes"):
+            grown = np.empty(capacity, dtype="float64")
+            grown[: self._n] = getattr(self, name)[: self._n]
+            setattr(self, name, grown)
+
+    def load(self, prices, sizes):
+        """Replace all levels, e.g. with a snapshot."""
+        keys = self._sign * np.asarray(prices, dtype="float64")
+        sizes = np.asarray(sizes, dtype="float64")
+        keep = sizes > 0
+        keys, sizes = keys[keep], sizes[keep]
+        order = np.argsort(keys, kind="stable")
+        self._reserve(len(keys))
+        self._n = len(keys)
+        self._keys[: self._n] = keys[order]
+        self._sizes[: self._n] = sizes[order]
+
+    def set(self, price: float, size: float):
+        """Set the size of a level, 0 removes it."""
+        key = self._sign * price
+        n = self._n
+        keys, sizes = self._keys, self._sizes
+        i = int(keys[:n].searchsorted(key))
+        if i < n and keys[i] == key:
+            if size > 0:
+                sizes[i] = size
+            else:
+                keys[i : n - 1] = keys[i + 1 : n]
+                sizes[i : n - 1] = sizes[i + 1 : n]
+                self._n = n - 1
+        elif size > 0:
+            if n == len(keys):
+                self._reserve(n + 1)
+                keys, sizes = self._keys, self._sizes
+            keys[i + 1 : n + 1] = keys[i:n]
+            sizes[i + 1 : n + 1] = sizes[i:n]
+            keys[i] = key
+            sizes[i] = size
+            self._n = n + 1
+
+    def best(self):
+        """(price, size) of the best level, None if the side is empty."""
+        if not self._n:
+            return None
+        return self._sign * self._keys[self._n - 1], self._sizes[self._n - 1]
+
+    def top(self, depth: int = None):
+        """Prices and sizes of the ``depth`` best levels, best first."""
+        start = 0 if depth is None else max(self._n - depth, 0)
+        prices = self._sign * self._keys[start : self._n][::-1]
+        return prices, self._sizes[start : self._n][::-1].copy()
+
+    def volume(self, depth: int = None) -> float:
+        start = 0 if depth is None else max(self._n - depth, 0)
+        return float(self._sizes[start : self._n].sum())
+
+
+class OrderBook:
+    """
+    L2 book of one symbol.
+
+    Parameters:
+    symbol (str): Symbol, only used in messages.
+    capacity (int): Initial number of levels per side (grows when needed).
+    """
+
+    def __init__(self, symbol: str, capacity: int = 1024):
+        self.symbol = symbol
+        self.bids = BookSide(is_bid=True, capacity=capacity)
+        self.asks = BookSide(is_bid=False, capacity=capacity)
+        self.sequence = None  # None until a snapshot is loaded
+        self.updates = 0
+        self.resyncs = 0
+
+    def reset(self):
+        self.bids.clear()
+        self.asks.clear()
+        self.sequence = None
+
+    def load(self, sequence: int, bids, asks):
+        """Load a snapshot, ``bids``/``asks`` are (price, size) pairs."""
+        for side, levels in ((self.bids, bids), (self.asks, asks)):
+            levels = np.asarray(levels, dtype="float64").reshape(-1, 2)
+            side.load(levels[:, 0], levels[:, 1])
+        self.sequence = int(sequence)
+
+    def apply(self, first: int, last: int, bids=(), asks=()) -> bool:
+        """
+        Apply a diff covering the sequence numbers ``first``..``last``.
+
+        Levels carry the new absolute size, so a diff overlapping the
+        snapshot can be applied as a whole.
+
+        Returns:
+        bool: False if the diff is older than the book and was skipped.
+
+        Raises:
+        SequenceGap: If updates between the book and the diff are missing.
+        """
+        if self.sequence is None:
+            raise SequenceGap(f"{self.symbol}: no snapshot loaded")
+        if last <= self.sequence:
+            return False
+        if first > self.sequence + 1:
+            raise SequenceGap(
+                f"{self.symbol}: expected sequence {self.sequence + 1}, got {first}"
+            )
+        for price, size in bids:
+            self.bids.set(float(price), float(size))
+        for price, size in asks:
+            self.asks.set(float(price), float(size))
+        self.sequence = int(last)
+        self.updates += 1
+        return True
+
+    @property
+    def best_bid(self):
+        best = self.bids.best()
+        return None if best is None else float(best[0])
+
+    @property
+    def best_ask(self):
+        best = self.asks.best()
+        return None if best is None else float(best[0])
+
+    @property
+    def mid(self):
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return (self.best_bid + self.best_ask) / 2
+
+    @property
+    def spread(self):
+        if self.best_bid is None or self.best_ask is None:
+            return None
+        return self.best_ask - self.best_bid
+
+    def imbalance(self, depth: int = 10):
+        """(bid volume - ask volume) / total volume over the ``depth`` best levels."""
+        bid_volume = self.bids.volume(depth)
+        ask_volume = self.asks.volume(depth)
+        total = bid_volume + ask_volume
+        return (bid_volume - ask_volume) / total if total else None
+
+    def to_dict(self, depth: int = 20) -> dict:
+        bid_prices, bid_sizes = self.bids.top(depth)
+        ask_prices, ask_sizes = self.asks.top(depth)
+        return {
+            "symbol": self.symbol,
+            "sequence": self.sequence,
+            "bids": np.column_stack((bid_prices, bid_sizes)).tolist(),
+            "asks": np.column_stack((ask_prices, ask_sizes)).tolist(),
+            "mid": self.mid,
+            "spread": self.spread,
+            "imbalance": self.imbalance(depth),
+            "updates": self.updates,
+            "resyncs": self.resyncs,
+        }
+
+
+async def maintain_book(book: OrderBook, diffs, snapshot):
+    """
+    Keep ``book`` in sync with a diff stream.
+
+    Diffs are buffered while the snapshot is fetched, the ones it already
+    contains are skipped and the others replayed. On a sequence gap the book
+    is reset and rebuilt from a new snapshot.
+
+    Parameters:
+    book (OrderBook): The book to maintain.
+    diffs (AsyncIterator[dict]): Diffs with 'first', 'last', 'bids' and 'asks',
+                                 subscribed before the snapshot is requested.
+    snapshot (Callable): ``snapshot()`` returning (sequence, bids, asks), called in a thread.
+    """
+    pending = deque(maxlen=MAX_PENDING_DIFFS)
+    loading = None
+    async for diff in diffs:
+        if book.sequence is not None:
+            try:
+                book.apply(**diff)
+                continue
+            except SequenceGap as e:
+                print(f"Order book out of sync, resyncing: {e}")
+                book.reset()
+                book.resyncs += 1
+        pending.append(diff)
+        if loading is None:
+            loading = asyncio.create_task(asyncio.to_thread(snapshot))
+        if not loading.done():
+            continue
+        book.load(*loading.result())
+        loading = None
+        while pending:
+            try:
+                book.apply(**pending[0])
+            except SequenceGap as e:
+                # Snapshot older than the buffered diffs, or diffs lost meanwhile
+                print(f"Order book out of sync, resyncing: {e}")
+                book.reset()
+                book.resyncs += 1
+                break
+            pending.popleft()
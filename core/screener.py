@@ -0,0 +1,278 @@
+"""
+Market screener.
+
+Keeps live indicator/signal state for a universe of symbols. Every finished
+candle updates the state of its symbol incrementally and writes the latest
+values into one column array per field, so a query is just a vectorized
+mask + sort over precomputed values (no indicator is recomputed on demand).
+"""
+
+import math
+import operator
+import re
+
+import numpy as np
+
+from core.candles import Candles
+from core.strategiez.incremental import MACD, RSI, SmaCross
+
+FIELDS = (
+    "time",
+    "close",
+    "change",
+    "volume",
+    "sma",
+    "rsi",
+    "macd_hist",
+    "cross",
+    "cross_age",
+)
+
+# "signal" reads nicer in queries like signal=BUY
+FIELD_ALIASES = {"signal": "cross", "macd": "macd_hist", "price": "close"}
+SIDE_VALUES = {"BUY": 1.0, "SELL": -1.0, "NONE": 0.0}
+
+OPERATORS = {
+    "<": operator.lt,
+    "<=": operator.le,
+    ">": operator.gt,
+    ">=": operator.ge,
+    "=": operator.eq,
+    "==": operator.eq,
+    "!=": operator.ne,
+}
+
+_CONDITION_RE = re.compile(r"^\s*(\w+)\s*(<=|>=|==|!=|<|>|=)\s*([\w.+-]+)\s*$")
+
+
+def parse_condition(condition: str):
+    """
+    Parse a condition such as ``rsi<30``, ``cross_age<=1`` or ``signal=BUY``.
+
+    Returns:
+    Tuple: (field, operator function, value)
+
+    Raises:
+    ValueError: If the condition, field or value is not understood.
+    """
+    match = _CONDITION_RE.match(condition)
+    if not match:
+        raise ValueError(f"Invalid condition: {condition!r}")
+    field, op, raw_value = match.groups()
+    field = FIELD_ALIASES.get(field.lower(), field.lower())
+    if field not in FIELDS:
+        raise ValueError(f"Unknown field {field!r}, expected one of {FIELDS}")
+    if raw_value.upper() in SIDE_VALUES:
+        value = SIDE_VALUES[raw_value.upper()]
+    else:
+        try:
+            value = float(raw_value)
+        except ValueError:
+            raise ValueError(f"Invalid value in condition: {condition!r}") from None
+    return field, OPERATORS[op], value
+
+
+class SymbolState:
+    """Incremental indicator state of a single symbol."""
+
+    def __init__(
+        self,
+        sma_window: int = 21,
+        rsi_length: int = 14,
+        macd_params=None,
+        sma_lookback: int = 3,
+    ):
+        self.sma_cross = SmaCross(window=sma_window, lookback=sma_lookback)
+        self.rsi = RSI(length=rsi_length)
+        self.macd = MACD(**(macd_params or {}))
+        self.last_close = None
+        self.cross = 0.0
+        self.cross_age = math.inf
+
+    def update(self, candle: dict) -> dict:
+        """Push a finished candle and return the new values of every field."""
+        close = candle["close"]
+        side = self.sma_cross.update(candle["high"], candle["low"], close)
+        if side:
+            self.cross = SIDE_VALUES[side]
+            self.cross_age = 0
+        else:
+            self.cross_age += 1
+        change = (
+            (close - self.last_close) / self.last_close * 100
+            if self.last_close
+            else math.nan
+        )
+        self.last_close = close
+        return {
+            "time": candle["time"],
+            "close": close,
+            "change": change,
+            "volume": candle.get("volume", math.nan),
+            "sma": self.sma_cross.value,
+            "rsi": self.rsi.update(close),
+            "macd_hist": self.macd.update(close),
+            "cross": self.cross,
+            "cross_age": self.cross_age,
+        }
+
+
+class Screener:
+    """
+    Ranks a universe of symbols by their live indicator state.
+
+    Parameters:
+    symbols (iterable): Initial universe.
+    sma_window (int): Window of the ``smacrossprice`` SMA.
+    sma_lookback (int): Candles ``smacrossprice`` looks back over.
+    rsi_length (int): RSI length.
+    macd_params (dict, optional): fast_length / slow_length / signal_length.
+    """
+
+    def __init__(
+        self,
+        symbols=(),
+        sma_window: int = 21,
+        rsi_length: int = 14,
+        macd_params=None,
+        sma_lookback: int = 3,
+    ):
+        self.sma_window = sma_window
+        self.sma_lookback = sma_lookback
+        self.rsi_length = rsi_length
+        self.macd_params = macd_params or {}
+        self.symbols = []
+        self._slots = {}
+        self._states = {}
+        self._seeded = np.zeros(0, dtype=bool)
+        self._columns = {field: np.zeros(0) for field in FIELDS}
+        for symbol in symbols:
+            self.add(symbol)
+
+    def __len__(self):
+        return len(self.symbols)
+
+    def __contains__(self, symbol):
+        return symbol in self._slots
+
+    @property
+    def ready(self) -> bool:
+        """True once every symbol of the universe has been seeded from history."""
+        return bool(self._seeded[: len(self.symbols)].all())
+
+    def add(self, symbol: str):
+        if symbol in self._slots:
+            return
+        slot = len(self.symbols)
+        if slot >= len(self._seeded):
+            self._grow(max(16, 2 * len(self._seeded)))
+        self.symbols.append(symbol)
+        self._slots[symbol] = slot
+        self._states[symbol] = SymbolState(
+            self.sma_window, self.rsi_length, self.macd_params, self.sma_lookback
+        )
+        for column in self._columns.values():
+            column[slot] = np.nan
+        self._seeded[slot] = False
+
+    def _grow(self, capacity: int):
+        for field, column in self._columns.items():
+            grown = np.full(capacity, np.nan)
+            grown[: len(column)] = column
+            self._columns[field] = grown
+        seeded = np.zeros(capacity, dtype=bool)
+        seeded[: len(self._seeded)] = self._seeded
+        self._seeded = seeded
+
+    def _write(self, slot: int, values: dict):
+        for field, value in values.items():
+            self._columns[field][slot] = value
+
+    def seed(self, symbol: str, df):
+        """
+        Replay historical candles (oldest first) of ``symbol`` through its state.
+
+        ``df`` is ``Candles`` or a DataFrame with the columns returned by
+        ``exchanges.Exchange.history``.
+        """
+        self.add(symbol)
+        slot = self._slots[symbol]
+        state = self._states[symbol]
+        values = None
+        candles = df if isinstance(df, Candles) else Candles.from_frame(df)
+        for candle in candles:
+            values = state.update(candle)
+        if values:
+            self._write(slot, values)
+        self._seeded[slot] = True
+
+    def update(self, symbol: str, candle: dict):
+        """
+        Apply a streamed candle (as yielded by ``exchanges.Exchange.candles``).
+
+        Finished candles advance the indicator state; in-progress ones only
+        refresh the live price and change.
+        """
+        slot = self._slots.get(symbol)
+        if slot is None:
+            return
+        if candle["is_final"]:
+            # Skip a candle the seeded history already ends with (time is NaN before)
+            if not candle["time"] <= self._columns["time"][slot]:
+                self._write(slot, self._states[symbol].update(candle))
+            return
+        last_close = self._states[symbol].last_close
+        self._columns["close"][slot] = candle["close"]
+        if last_close:
+            self._columns["change"][slot] = (
+                (candle["close"] - last_close) / last_close * 100
+            )
+
+    def query(
+        self,
+        conditions=(),
+        sort_by: str = None,
+        descending: bool = False,
+        limit: int = None,
+    ):
+        """
+        Filter and rank the universe.
+
+        Parameters:
+        conditions (iterable): Strings like ``"rsi<30"`` or ``"cross_age<=1"``, all must hold.
+        sort_by (str, optional): Field to rank by, NaN values always go last.
+        descending (bool): Rank from the highest value.
+        limit (int, optional): Maximum number of rows.
+
+        Returns:
+        List[dict]: One dict per matching symbol with every field.
+        """
+        count = len(self.symbols)
+        mask = self._seeded[:count].copy()
+        for condition in conditions:
+            field, op, value = parse_condition(condition)
+            mask &= op(self._columns[field][:count], value)
+        rows = np.flatnonzero(mask)
+
+        if sort_by:
+            field = FIELD_ALIASES.get(sort_by, sort_by)
+            if field not in FIELDS:
+                raise ValueError(f"Unknown field {sort_by!r}, expected one of {FIELDS}")
+            keys = self._columns[field][rows]
+            order = np.argsort(-keys if descending else keys, kind="stable")
+            rows = rows[order]
+        if limit is not None:
+            rows = rows[:limit]
+
+        return [self.snapshot(self.symbols[row]) for row in rows]
+
+    def snapshot(self, symbol: str) -> dict:
+        slot = self._slots[symbol]
+        result = {"symbol": symbol}
+        for field in FIELDS:
+            value = float(self._columns[field][slot])
+            # NaN/inf are not valid JSON
+            result[field] = value if math.isfinite(value) else None
+        if result["cross"] is not None:
+            result["signal"] = {1.0: "BUY", -1.0: "SELL"}.get(result["cross"])
+        return result
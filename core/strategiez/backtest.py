@@ -0,0 +1,42 @@
+"""
+Array based backtesting.
+
+Same trading rules as ``src_to_rafactor.backtest_signals`` (long only, one
+unit, BUY opens, SELL closes, an open position is valued at the last close),
+but on NumPy arrays so that it can be run thousands of times in a study.
+"""
+
+import numpy as np
+import pandas as pd
+
+from core.strategiez import jit
+from core.strategiez.kernels import sma_cross_masks
+
+
+def sma_cross_signal_arrays(high, low, close, sma, lookback: int = 3):
+    """``kernels.sma_cross_masks`` on plain arrays, returns two boolean arrays."""
+    buy, sell = sma_cross_masks(
+        pd.Series(high), pd.Series(low), pd.Series(close), pd.Series(sma), lookback
+    )
+    return buy.to_numpy(), sell.to_numpy()
+
+
+def simulate_trades(close, buy, sell):
+    """
+    Walk through the BUY/SELL events and return the trades.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray, np.ndarray]: entry indexes, exit indexes and
+    profit of every trade. A position still open at the end exits on the last bar.
+    """
+    entries, exits = jit.position_events(buy, sell)
+    if len(exits) < len(entries):
+        exits = np.append(exits, len(close) - 1)
+
+    return entries, exits, close[exits] - close[entries]
+
+
+def backtest_arrays(close, buy, sell, initial_balance: float = 10000.0) -> float:
+    """Final balance, same result as ``backtest_signals`` for the same signals."""
+    _, _, profits = simulate_trades(close, buy, sell)
+    return initial_balance + profits.sum()
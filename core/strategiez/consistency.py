@@ -0,0 +1,113 @@
+"""
+Live-vs-backtest consistency check of the ``smacrossprice`` strategy.
+
+A historical series is replayed candle by candle through the live evaluator
+(``incremental.SmaCross``, used by ``/ws/kucoin`` and ``/ws/stream``) and
+evaluated at once by the batch one (``generate_signals``, built on
+``kernels.sma_cross_masks`` as the backtests). Both go through ``sma_cross_rule``,
+so any divergence reported here means one of the evaluators changed the
+inputs of the rule (SMA, lookback window, ...).
+"""
+
+import math
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+
+from core.candles import as_frame
+from core.strategiez.incremental import SmaCross
+from core.strategiez.src_to_rafactor import generate_signals
+
+
+def batch_signals(df: pd.DataFrame, window: int = 21, lookback: int = 3):
+    """
+    Vectorized evaluation, through ``generate_signals``.
+
+    Returns:
+    Tuple[np.ndarray, list]: The SMA and the side ("BUY", "SELL" or None) of every candle.
+    """
+    # generate_signals adds its 'sma' column to the frame
+    df = as_frame(df).copy()
+    settings = SimpleNamespace(
+        strategies=[SimpleNamespace(params={"window": window, "lookback": lookback})]
+    )
+    sides = {
+        signal["timestamp"]: signal["type"] for signal in generate_signals(df, settings)
+    }
+    return df["sma"].to_numpy(), [
+        sides.get(float(timestamp)) for timestamp in df["timestamp"].to_numpy()
+    ]
+
+
+def live_signals(df: pd.DataFrame, window: int = 21, lookback: int = 3):
+    """
+    Candle by candle evaluation, same as the live websockets.
+
+    Returns:
+    Tuple[np.ndarray, list]: The SMA and the side ("BUY", "SELL" or None) of every candle.
+    """
+    df = as_frame(df)
+    cross = SmaCross(window, lookback)
+    sma, sides = [], []
+    for high, low, close in zip(
+        df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy()
+    ):
+        sides.append(cross.update(float(high), float(low), float(close)))
+        sma.append(cross.value)
+    return np.asarray(sma, dtype="float64"), sides
+
+
+def _same(a: float, b: float, tolerance: float) -> bool:
+    if math.isnan(a) or math.isnan(b):
+        return math.isnan(a) and math.isnan(b)
+    return math.isclose(a, b, rel_tol=tolerance, abs_tol=tolerance)
+
+
+def check_consistency(
+    df: pd.DataFrame, window: int = 21, lookback: int = 3, tolerance: float = 1e-9
+):
+    """
+    Replay ``df`` through both evaluators and report every divergence.
+
+    Parameters:
+    df (pd.DataFrame | Candles): Candles with 'timestamp', 'high', 'low' and 'close', oldest first.
+    window (int): SMA window.
+    lookback (int): Number of previous candles checked by the rule.
+    tolerance (float): Relative/absolute tolerance of the SMA comparison.
+
+    Returns:
+    dict: 'consistent', the signal counts of both evaluators and 'divergences',
+    one dict per candle where the SMA or the side differ.
+    """
+    df = as_frame(df)
+    batch_sma, batch_sides = batch_signals(df, window, lookback)
+    live_sma, live_sides = live_signals(df, window, lookback)
+    timestamps = df["timestamp"].to_numpy()
+
+    divergences = []
+    for i in range(len(df)):
+        sma_ok = _same(batch_sma[i], live_sma[i], tolerance)
+        if sma_ok and batch_sides[i] == live_sides[i]:
+            continue
+        divergences.append(
+            {
+                "index": i,
+                "timestamp": float(timestamps[i]),
+                "field": "signal" if sma_ok else "sma",
+                "batch_sma": None if math.isnan(batch_sma[i]) else batch_sma[i],
+                "live_sma": None if math.isnan(live_sma[i]) else live_sma[i],
+                "batch_signal": batch_sides[i],
+                "live_signal": live_sides[i],
+            }
+        )
+
+    return {
+        "consistent": not divergences,
+        "candles": len(df),
+        "window": window,
+        "lookback": lookback,
+        "batch_signals": sum(side is not None for side in batch_sides),
+        "live_signals": sum(side is not None for side in live_sides),
+        "divergences": divergences,
+    }
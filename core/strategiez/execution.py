@@ -0,0 +1,238 @@
+"""
+Execution model for the backtests.
+
+``backtest_signals`` trades one unit at the signal price for free. ``simulate_execution``
+adds what matters for sizing decisions: maker/taker fees, spread and slippage,
+fractional position sizing, short positions and stop-loss / take-profit
+checked against the intrabar high and low.
+
+Only entry bars are visited one by one; the exit of a position is searched in
+blocks of bars with NumPy, so the cost is proportional to the number of trades,
+not to the number of bars.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+SIDES = ("LONG", "SHORT", "BOTH")
+# Bars scanned at once when looking for the exit of a position
+SCAN_BLOCK = 256
+
+
+@dataclass(frozen=True)
+class ExecutionModel:
+    """
+    Parameters:
+    maker_fee (float): Fee of limit orders (take-profit), fraction of the notional.
+    taker_fee (float): Fee of market orders (entries, signal exits and stops).
+    spread (float): Bid/ask spread as a fraction of the price, half is paid per market order.
+    slippage (float): Extra adverse move per market order, fraction of the price.
+    position_size (float): Fraction of the equity put in every position.
+    stop_loss (float, optional): Distance of the stop from the entry, fraction of the price.
+    take_profit (float, optional): Distance of the target from the entry, fraction of the price.
+    side (str): "LONG", "SHORT" or "BOTH" (as ``Strategy.side``).
+    """
+
+    maker_fee: float = 0.001
+    taker_fee: float = 0.001
+    spread: float = 0.0
+    slippage: float = 0.0
+    position_size: float = 1.0
+    stop_loss: float = None
+    take_profit: float = None
+    side: str = "LONG"
+
+    def __post_init__(self):
+        if self.side not in SIDES:
+            raise ValueError(f"side must be one of {SIDES}")
+        if not 0 < self.position_size <= 1:
+            raise ValueError("position_size must be in (0, 1]")
+
+
+def _market_price(price, direction, model):
+    """Fill price of a market order, ``direction`` is +1 to buy and -1 to sell."""
+    return price * (1 + direction * (model.spread / 2 + model.slippage))
+
+
+def _find_exit(start, direction, stop, target, high, low, exit_signal):
+    """
+    First bar >= ``start`` where the position is closed.
+
+    Returns:
+    Tuple[int, str]: Bar index and reason ("stop_loss", "take_profit", "signal"),
+    or (-1, None) if the position is still open at the end.
+    """
+    n = len(high)
+    for block_start in range(start, n, SCAN_BLOCK):
+        block = slice(block_start, min(block_start + SCAN_BLOCK, n))
+        if direction > 0:
+            stop_hit = low[block] <= stop
+            target_hit = high[block] >= target
+        else:
+            stop_hit = high[block] >= stop
+            target_hit = low[block] <= target
+        hit = stop_hit | target_hit | exit_signal[block]
+        if hit.any():
+            offset = int(hit.argmax())
+            # When everything happens in the same bar, assume the worst (the stop)
+            if stop_hit[offset]:
+                reason = "stop_loss"
+            elif target_hit[offset]:
+                reason = "take_profit"
+            else:
+                reason = "signal"
+            return block_start + offset, reason
+    return -1, None
+
+
+def simulate_execution(
+    open_,
+    high,
+    low,
+    close,
+    buy,
+    sell,
+    model: ExecutionModel,
+    initial_balance: float = 10000.0,
+):
+    """
+    Backtest the BUY/SELL masks with ``model``.
+
+    Orders are filled on the close of the signal bar. A signal exit immediately
+    reverses the position when the opposite side is allowed.
+
+    Returns:
+    dict: 'final_balance', 'total_fees', 'max_drawdown', 'win_rate' and the
+    list of 'trades'.
+    """
+    open_, high, low, close = (
+        np.asarray(a, dtype="float64") for a in (open_, high, low, close)
+    )
+    buy, sell = np.asarray(buy, dtype=bool), np.asarray(sell, dtype=bool)
+    no_stop = np.inf
+
+    long_entries = buy if model.side in ("LONG", "BOTH") else np.zeros_like(buy)
+    short_entries = sell if model.side in ("SHORT", "BOTH") else np.zeros_like(sell)
+    entry_bars = np.flatnonzero(long_entries | short_entries)
+
+    equity = initial_balance
+    peak, max_drawdown, total_fees = equity, 0.0, 0.0
+    trades = []
+    i = 0
+    while True:
+        k = np.searchsorted(entry_bars, i)
+        if k >= len(entry_bars):
+            break
+        entry = int(entry_bars[k])
+        direction = 1 if long_entries[entry] else -1
+        entry_price = _market_price(close[entry], direction, model)
+        quantity = equity * model.position_size / entry_price
+        fees = quantity * entry_price * model.taker_fee
+
+        stop = (
+            entry_price * (1 - direction * model.stop_loss)
+            if model.stop_loss
+            else -direction * no_stop
+        )
+        target = (
+            entry_price * (1 + direction * model.take_profit)
+            if model.take_profit
+            else direction * no_stop
+        )
+        exit_signal = sell if direction > 0 else buy
+        exit_bar, reason = _find_exit(
+            entry + 1, direction, stop, target, high, low, exit_signal
+        )
+
+        if reason == "stop_loss":
+            # A gap through the stop fills at the open
+            level = (
+                min(open_[exit_bar], stop)
+                if direction > 0
+                else max(open_[exit_bar], stop)
+            )
+            exit_price = _market_price(level, -direction, model)
+            fee_rate = model.taker_fee
+        elif reason == "take_profit":
+            level = (
+                max(open_[exit_bar], target)
+                if direction > 0
+                else min(open_[exit_bar], target)
+            )
+            exit_price, fee_rate = level, model.maker_fee
+        else:
+            if reason is None:
+                exit_bar, reason = len(close) - 1, "end"
+            exit_price = _market_price(close[exit_bar], -direction, model)
+            fee_rate = model.taker_fee
+        fees += quantity * exit_price * fee_rate
+
+        profit = direction * quantity * (exit_price - entry_price) - fees
+        equity += profit
+        total_fees += fees
+        peak = max(peak, equity)
+        max_drawdown = max(max_drawdown, (peak - equity) / peak if peak > 0 else 0.0)
+        trades.append(
+            {
+                "entry_index": entry,
+                "exit_index": int(exit_bar),
+                "side": "LONG" if direction > 0 else "SHORT",
+                "entry_price": float(entry_price),
+                "exit_price": float(exit_price),
+                "quantity": float(quantity),
+                "fees": float(fees),
+                "profit": float(profit),
+                "exit_reason": reason,
+            }
+        )
+        # A signal exit may open the opposite position on the same bar
+        i = exit_bar if reason == "signal" else exit_bar + 1
+
+    wins = sum(trade["profit"] > 0 for trade in trades)
+    return {
+        "final_balance": float(equity),
+        "total_fees": float(total_fees),
+        "max_drawdown": float(max_drawdown),
+        "win_rate": wins / len(trades) if trades else None,
+        "trades": trades,
+    }
+
+
+def candle_times(df: pd.DataFrame):
+    """Unix seconds of every candle, from 'timestamp' or 'datetime'."""
+    if "timestamp" in df.columns:
+        return df["timestamp"].astype("float64").to_numpy()
+    return (
+        (pd.to_datetime(df["datetime"]).astype(int) // 10**9)
+        .astype("float64")
+        .to_numpy()
+    )
+
+
+def signals_to_masks(times, signals):
+    """
+    Turn signals into BUY/SELL masks aligned with ``times``.
+
+    Signals can be ``(timestamp, price, type)`` tuples (``backtest_signals``) or
+    ``{"timestamp", "price", "type"}`` dicts (``generate_signals``). Signals that
+    don't match a candle time are ignored.
+
+    Raises:
+    ValueError: If ``times`` is not sorted oldest first.
+    """
+    times = np.asarray(times, dtype="float64")
+    if np.any(np.diff(times) < 0):
+        raise ValueError("Candles must be sorted oldest first")
+    buy = np.zeros(len(times), dtype=bool)
+    sell = np.zeros(len(times), dtype=bool)
+    for signal in signals:
+        if isinstance(signal, dict):
+            timestamp, side = signal["timestamp"], signal["type"]
+        else:
+            timestamp, _, side = signal
+        index = np.searchsorted(times, float(timestamp))
+        if index < len(times) and times[index] == float(timestamp):
+            (buy if side == "BUY" else sell)[index] = True
+    return buy, sell
@@ -0,0 +1,163 @@
+"""
+Incremental (one candle at a time) versions of the indicators in
+``src_to_rafactor.calculate_indicator_signals`` and ``generate_signals``.
+
+Each class keeps just enough state to produce the same value the pandas
+version would produce for the latest row, in O(1) (or O(window)) per candle.
+"""
+
+import math
+from collections import deque
+
+from core.strategiez.kernels import sma_cross_rule
+
+NAN = float("nan")
+
+
+class RollingMean:
+    """Same as ``Series.rolling(window).mean()`` for the last value."""
+
+    def __init__(self, window: int):
+        self.window = window
+        self.values = deque(maxlen=window)
+
+    def update(self, value: float) -> float:
+        self.values.append(value)
+        if len(self.values) < self.window:
+            return NAN
+        return math.fsum(self.values) / self.window
+
+
+class EMA:
+    """Same as ``Series.ewm(span=span, adjust=False).mean()`` for the last value."""
+
+    def __init__(self, span: int):
+        self.alpha = 2 / (span + 1)
+        self.value = None
+
+    def update(self, value: float) -> float:
+        if self.value is None:
+            self.value = value
+        else:
+            self.value = self.alpha * value + (1 - self.alpha) * self.value
+        return self.value
+
+
+class RSI:
+    """Rolling-mean RSI as computed by ``calculate_indicator_signals``."""
+
+    def __init__(self, length: int = 14):
+        self.gain = RollingMean(length)
+        self.loss = RollingMean(length)
+        self.last_close = None
+
+    def update(self, close: float) -> float:
+        # The first diff is NaN in pandas, which counts as 0 gain and 0 loss
+        delta = 0.0 if self.last_close is None else close - self.last_close
+        self.last_close = close
+        gain = self.gain.update(delta if delta > 0 else 0.0)
+        loss = self.loss.update(-delta if delta < 0 else 0.0)
+        if math.isnan(gain) or math.isnan(loss):
+            return NAN
+        if loss == 0:
+            return 100.0 if gain > 0 else NAN
+        return 100 - (100 / (1 + gain / loss))
+
+
+class MACD:
+    """MACD histogram as computed by ``calculate_indicator_signals``."""
+
+    def __init__(
+        self, fast_length: int = 12, slow_length: int = 26, signal_length: int = 9
+    ):
+        self.fast = EMA(fast_length)
+        self.slow = EMA(slow_length)
+        self.signal = EMA(signal_length)
+
+    def update(self, close: float) -> float:
+        line = self.fast.update(close) - self.slow.update(close)
+        return line - self.signal.update(line)
+
+
+def _window_min(values) -> float:
+    # pandas' rolling min/max is NaN as soon as one value in the window is NaN
+    if any(math.isnan(v) for v in values):
+        return NAN
+    return min(values)
+
+
+def _window_max(values) -> float:
+    if any(math.isnan(v) for v in values):
+        return NAN
+    return max(values)
+
+
+class SmaCross:
+    """
+    Live evaluator of the ``smacrossprice`` strategy.
+
+    Feeds the previous ``lookback`` candles into ``sma_cross_rule`` exactly like
+    ``kernels.sma_cross_masks`` does with ``shift(1).rolling(lookback)``.
+    """
+
+    def __init__(self, window: int = 21, lookback: int = 3):
+        self.lookback = lookback
+        self.sma = RollingMean(window)
+        self.prev_sma = deque(maxlen=lookback)
+        self.prev_high = deque(maxlen=lookback)
+        self.prev_low = deque(maxlen=lookback)
+        self.value = NAN
+
+    def update(self, high: float, low: float, close: float):
+        """Push a finished candle, returns "BUY", "SELL" or None."""
+        sma = self.sma.update(close)
+        self.value = sma
+        side = None
+        if len(self.prev_sma) == self.lookback:
+            buy, sell = sma_cross_rule(
+                high,
+                low,
+                close,
+                sma,
+                _window_min(self.prev_sma),
+                _window_max(self.prev_sma),
+                max(self.prev_high),
+                min(self.prev_low),
+            )
+            side = "BUY" if buy else "SELL" if sell else None
+        self.prev_sma.append(sma)
+        self.prev_high.append(high)
+        self.prev_low.append(low)
+        return side
+
+
+class LiveSmaCross:
+    """
+    ``SmaCross`` fed by a live candle stream (``exchanges.Exchange.candles``).
+
+    Only final candles newer than the last evaluated one are pushed, so
+    in-progress updates and repeated finals never produce a signal.
+    """
+
+    def __init__(self, window: int = 21, lookback: int = 3):
+        self.cross = SmaCross(window, lookback)
+        self.last_time = None
+
+    @property
+    def sma(self):
+        """Latest SMA, None during the warm-up."""
+        return None if math.isnan(self.cross.value) else self.cross.value
+
+    def seed(self, candles):
+        """Push finished candles (dicts or ``Candles``), oldest first."""
+        for candle in candles:
+            self.update({**candle, "is_final": True})
+
+    def update(self, candle: dict):
+        """Push a stream update, returns "BUY", "SELL" or None."""
+        if not candle["is_final"] or (
+            self.last_time is not None and not candle["time"] > self.last_time
+        ):
+            return None
+        self.last_time = candle["time"]
+        return self.cross.update(candle["high"], candle["low"], candle["close"])
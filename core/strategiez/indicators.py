@@ -1,5 +1,7 @@
 import pandas as pd
 
+from core.candles import as_frame
+
 
 def calculate_macd(df, fast_length, slow_length, signal_length):
     df["EMA_fast"] = df["Close"].ewm(span=fast_length, adjust=False).mean()
@@ -20,7 +22,7 @@ def calculate_rsi(df, length):
 
 
 def calculate_sma(df, period: int) -> pd.DataFrame:
-    return df["close"].rolling(window=period).mean()
+    return as_frame(df)["close"].rolling(window=period).mean()
 
 
 def calculate_indicator_signals(df, indicator_name, variables, detect_divergence=False):
@@ -0,0 +1,141 @@
+"""
+Kernels for the path-dependent loops (crossings, position tracking).
+
+Every kernel has two implementations:
+
+- ``numba``: the plain loop, compiled with ``numba.njit`` on first use. Used
+  when numba is installed.
+- ``numpy``: the loop rewritten as exact vectorized NumPy.
+
+Both backends do the same comparisons and the same floating point operations
+in the same order, so their results are identical. ``KERNEL_BACKEND``
+(``auto``, ``numba`` or ``numpy``) forces one of them.
+"""
+
+import importlib.util
+import os
+
+import numpy as np
+
+BACKENDS = ("numba", "numpy")
+
+
+def _select_backend() -> str:
+    wanted = os.getenv("KERNEL_BACKEND", "auto")
+    if wanted not in ("auto", *BACKENDS):
+        raise ValueError(f"Invalid KERNEL_BACKEND: {wanted}")
+    if wanted == "numpy":
+        return "numpy"
+    # numba itself is only imported when a kernel is first compiled
+    if importlib.util.find_spec("numba") is None:
+        if wanted == "numba":
+            raise ImportError("KERNEL_BACKEND=numba but numba is not installed")
+        return "numpy"
+    return "numba"
+
+
+BACKEND = _select_backend()
+
+
+# Loops, compiled as they are by numba
+
+
+def _first_cross_loop(first, second):
+    for i in range(1, len(first)):
+        if first[i - 1] <= second[i - 1] and first[i] > second[i]:
+            return i
+        if first[i - 1] >= second[i - 1] and first[i] < second[i]:
+            return i
+    return -1
+
+
+def _position_events_loop(buy, sell):
+    entries = np.empty(len(buy), dtype=np.int64)
+    exits = np.empty(len(buy), dtype=np.int64)
+    n_entries = n_exits = 0
+    in_position = False
+    for i in range(len(buy)):
+        if buy[i] and not in_position:
+            entries[n_entries] = i
+            n_entries += 1
+            in_position = True
+        elif sell[i] and in_position:
+            exits[n_exits] = i
+            n_exits += 1
+            in_position = False
+    return entries[:n_entries], exits[:n_exits]
+
+
+# NumPy versions
+
+
+def _first_cross_numpy(first, second):
+    up = (first[:-1] <= second[:-1]) & (first[1:] > second[1:])
+    down = (first[:-1] >= second[:-1]) & (first[1:] < second[1:])
+    crossed = up | down
+    i = int(crossed.argmax()) if crossed.size else 0
+    return i + 1 if crossed.size and crossed[i] else -1
+
+
+def _position_events_numpy(buy, sell):
+    # Only bars with a signal can change the position. A BUY only bar leaves
+    # it long, a SELL only bar flat, a bar with both flips it.
+    events = np.flatnonzero(buy | sell)
+    b, s = buy[events], sell[events]
+    both = b & s
+    order = np.arange(events.size)
+    last_single = np.maximum.accumulate(np.where(both, -1, order))
+    has_single = last_single >= 0
+    last_single = np.where(has_single, last_single, 0)
+    flips = np.cumsum(both)
+    flips_since = flips - np.where(has_single, flips[last_single], 0)
+    state = (b[last_single] & has_single) ^ (flips_since % 2 == 1)
+    before = np.concatenate(([False], state))[:-1]
+    return events[state & ~before], events[~state & before]
+
+
+_NUMPY = {
+    "first_cross": _first_cross_numpy,
+    "position_events": _position_events_numpy,
+}
+_LOOPS = {
+    "first_cross": _first_cross_loop,
+    "position_events": _position_events_loop,
+}
+_compiled = {}
+
+
+def _kernel(name: str, backend: str = None):
+    backend = backend or BACKEND
+    if backend == "numpy":
+        return _NUMPY[name]
+    if backend != "numba":
+        raise ValueError(f"Unknown backend: {backend}")
+    if name not in _compiled:
+        import numba
+
+        _compiled[name] = numba.njit(cache=True)(_LOOPS[name])
+    return _compiled[name]
+
+
+def first_cross(first, second, backend: str = None) -> int:
+    """
+    Index of the first bar where ``first`` crosses ``second`` (either way),
+    -1 if they never cross.
+    """
+    first = np.asarray(first, dtype="float64")
+    second = np.asarray(second, dtype="float64")
+    return int(_kernel("first_cross", backend)(first, second))
+
+
+def position_events(buy, sell, backend: str = None):
+    """
+    Long only position tracking: a BUY opens when flat, a SELL closes when long.
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Entry and exit bar indexes. There is one
+    exit less than entries when the last position is still open.
+    """
+    buy = np.asarray(buy, dtype=bool)
+    sell = np.asarray(sell, dtype=bool)
+    return _kernel("position_events", backend)(buy, sell)
@@ -0,0 +1,57 @@
+"""
+Shared signal kernels.
+
+The rule itself is written once in ``sma_cross_rule`` and only uses ``&``,
+``<`` and ``>``, so the very same expression works on scalars (live, one
+candle at a time) and on Series / DataFrames (batch, whole history at once).
+"""
+
+
+def sma_cross_rule(
+    high, low, close, sma, sma_prev_min, sma_prev_max, high_prev_max, low_prev_min
+):
+    """
+    Evaluate the ``smacrossprice`` BUY/SELL rule.
+
+    Parameters:
+    high, low, close, sma: Values of the current candle.
+    sma_prev_min, sma_prev_max: Min/max of the SMA over the previous ``lookback`` candles.
+    high_prev_max, low_prev_min: Max high / min low over the previous ``lookback`` candles.
+
+    Returns:
+    Tuple: (buy, sell) booleans (or boolean Series/DataFrames for vectorized inputs).
+    """
+    # Main condition: current high above sma and low below sma
+    main_cond = (high > sma) & (low < sma)
+
+    # BUY condition: sma < close AND all previous sma values above all previous highs
+    buy = main_cond & (sma < close) & (sma_prev_min > high_prev_max)
+
+    # SELL condition: sma > close AND all previous sma values below all previous lows
+    sell = main_cond & (sma > close) & (sma_prev_max < low_prev_min)
+    return buy, sell
+
+
+def sma_cross_masks(high, low, close, sma, lookback: int = 3):
+    """
+    Vectorized ``smacrossprice`` rule over a whole history.
+
+    Works on Series (one symbol) and on DataFrames (one column per symbol).
+    The rolling windows are shifted by 1 to exclude the current row.
+
+    Returns:
+    Tuple: (buy_mask, sell_mask) aligned with the inputs.
+    """
+    sma_prev = sma.shift(1).rolling(window=lookback, min_periods=lookback)
+    high_prev_max = high.shift(1).rolling(window=lookback, min_periods=lookback).max()
+    low_prev_min = low.shift(1).rolling(window=lookback, min_periods=lookback).min()
+    return sma_cross_rule(
+        high,
+        low,
+        close,
+        sma,
+        sma_prev.min(),
+        sma_prev.max(),
+        high_prev_max,
+        low_prev_min,
+    )
@@ -1,3 +1,6 @@
+from core.strategiez import jit
+
+
 def cross_over(candles, column="Close", first_indicator=None, second_indicator=None):
     """
     Check if first_indicator and second_indicator functions cross each other.
@@ -26,16 +29,4 @@ def cross_over(candles, column="Close", first_indicator=None, second_indicator=N
         second_values = candles[column]
 
     # Check for crossover
-    for i in range(1, len(candles)):
-        if (
-            first_values[i - 1] <= second_values[i - 1]
-            and first_values[i] > second_values[i]
-        ):
-            return True
-        if (
-            first_values[i - 1] >= second_values[i - 1]
-            and first_values[i] < second_values[i]
-        ):
-            return True
-
-    return False
+    return jit.first_cross(first_values, second_values) >= 0
@@ -0,0 +1,371 @@
+"""
+Portfolio backtest of several strategies over many symbols.
+
+All symbols are aligned on the union of their candle times, every strategy
+of ``Settings.strategies`` is evaluated on all of them at once (DataFrames
+with one column per symbol), and the positions share one capital:
+
+- every (strategy, symbol) pair holds at most one position, sized as
+  ``model.position_size`` of the current equity;
+- ``PortfolioLimits`` caps the exposure per symbol (all strategies together),
+  the gross exposure and the number of open positions. They are checked on
+  entries: entries that don't fit are scaled down, the ones beyond
+  ``max_positions`` are skipped (open positions aren't resized when prices move).
+
+Fills, fees, spread, slippage, stops and targets follow
+``execution.simulate_execution``. The simulation loops over bars only, each
+bar is a handful of NumPy operations on (strategies x symbols) arrays, so
+hundreds of symbols take seconds.
+"""
+
+from dataclasses import dataclass
+
+import numpy as np
+import pandas as pd
+
+from core.candles import Candles
+from core.strategiez.execution import SIDES, ExecutionModel
+from core.strategiez.kernels import sma_cross_masks
+
+PANEL_FIELDS = ("open", "high", "low", "close")
+# Bars between two ``progress`` calls
+PROGRESS_EVERY = 250
+
+
+@dataclass(frozen=True)
+class PortfolioLimits:
+    """
+    Parameters:
+    max_symbol_exposure (float): Max notional on one symbol, fraction of the equity.
+    max_gross_exposure (float): Max notional of all the positions, fraction of the equity.
+    max_positions (int, optional): Max number of open positions.
+    """
+
+    max_symbol_exposure: float = 0.25
+    max_gross_exposure: float = 1.0
+    max_positions: int = None
+
+    def __post_init__(self):
+        if self.max_symbol_exposure <= 0 or self.max_gross_exposure <= 0:
+            raise ValueError("Exposure limits must be positive")
+        if self.max_positions is not None and self.max_positions < 1:
+            raise ValueError("max_positions must be at least 1")
+
+
+def align_candles(candles: dict):
+    """
+    Align the candles of several symbols on the union of their times.
+
+    Parameters:
+    candles (dict): Symbol -> ``Candles`` or DataFrame ('timestamp', 'open', ...).
+
+    Returns:
+    Tuple[np.ndarray, dict, np.ndarray]: The times, one (times x symbols)
+    DataFrame per field of ``PANEL_FIELDS`` and the mask of the bars where a
+    symbol has a candle. Missing bars repeat the previous close.
+    """
+    candles = {
+        symbol: data if isinstance(data, Candles) else Candles.from_frame(data)
+        for symbol, data in candles.items()
+    }
+    panels = {
+        field: pd.DataFrame(
+            {
+                symbol: pd.Series(data[field], index=data.time)
+                for symbol, data in candles.items()
+            }
+        ).sort_index()
+        for field in PANEL_FIELDS
+    }
+    tradable = panels["close"].notna().to_numpy()
+    close = panels["close"] = panels["close"].ffill()
+    for field in ("open", "high", "low"):
+        panels[field] = panels[field].fillna(close)
+    return panels["close"].index.to_numpy(dtype="int64"), panels, tradable
+
+
+def strategy_masks(strategy: dict, high, low, close):
+    """
+    BUY/SELL masks of one strategy on (times x symbols) DataFrames.
+
+    Parameters:
+    strategy (dict): A ``Settings.strategies`` entry ('operator', 'params', 'side').
+
+    Returns:
+    Tuple[np.ndarray, np.ndarray]: Boolean (times x symbols) arrays.
+
+    Raises:
+    ValueError: If the operator isn't supported or ``params.window`` is missing.
+    """
+    if strategy["operator"] != "smacrossprice":
+        raise ValueError(f"Unsupported operator: {strategy['operator']}")
+    params = strategy.get("params") or {}
+    window = params.get("window")
+    if not isinstance(window, int) or isinstance(window, bool) or window < 1:
+        raise ValueError(
+            f"smacrossprice needs a positive integer params.window, got {window!r}"
+        )
+    sma = close.rolling(window=window).mean()
+    buy, sell = sma_cross_masks(high, low, close, sma, params.get("lookback", 3))
+    return buy.to_numpy(), sell.to_numpy()
+
+
+def _exit_fill(model, direction, price):
+    # Market order closing the position, ``direction`` of the position
+    return price * (1 - direction * (model.spread / 2 + model.slippage))
+
+
+def simulate_portfolio(
+    times,
+    open_,
+    high,
+    low,
+    close,
+    tradable,
+    buy,
+    sell,
+    sides,
+    model: ExecutionModel,
+    limits: PortfolioLimits,
+    initial_balance: float = 10000.0,
+    symbols=None,
+    progress=None,
+):
+    """
+    Simulate the shared-capital portfolio.
+
+    Parameters:
+    times (np.ndarray): Bar times.
+    open_, high, low, close (np.ndarray): (times x symbols) prices.
+    tradable (np.ndarray): (times x symbols) mask of the bars with a candle.
+    buy, sell (np.ndarray): (strategies x times x symbols) signal masks.
+    sides (list): "LONG", "SHORT" or "BOTH" per strategy.
+    symbols (list, optional): Symbol names used in the results.
+    progress (Callable, optional): Called with the fraction of bars done.
+
+    Returns:
+    dict: 'final_balance', 'total_return', 'max_drawdown', 'total_fees',
+    'win_rate', 'max_gross_exposure', the 'equity' curve, the profit 'by_symbol'
+    and 'by_strategy' and the list of 'trades'.
+    """
+    n_strategies, n_bars, n_symbols = buy.shape
+    symbols = list(symbols) if symbols is not None else list(range(n_symbols))
+    valued_close = np.nan_to_num(close)
+    allow_long = np.array([side in ("LONG", "BOTH") for side in sides])[:, None]
+    allow_short = np.array([side in ("SHORT", "BOTH") for side in sides])[:, None]
+    entry_cost = model.spread / 2 + model.slippage
+
+    shape = (n_strategies, n_symbols)
+    quantity = np.zeros(shape)  # Signed, negative for shorts
+    entry_price = np.zeros(shape)
+    entry_fee = np.zeros(shape)
+    entry_bar = np.zeros(shape, dtype="int64")
+    stop = np.zeros(shape)
+    target = np.zeros(shape)
+
+    cash = float(initial_balance)
+    total_fees = 0.0
+    max_gross = 0.0
+    equity_curve = np.empty(n_bars)
+    trades = []
+
+    def close_positions(t, mask, price, fee_rate, reason):
+        nonlocal cash, total_fees
+        direction = np.sign(quantity[mask])
+        qty = quantity[mask]
+        exit_fee = np.abs(qty) * price * fee_rate
+        cash += float(np.sum(qty * price - exit_fee))
+        total_fees += float(exit_fee.sum())
+        profit = qty * (price - entry_price[mask]) - entry_fee[mask] - exit_fee
+        for i, (k, s) in enumerate(zip(*np.nonzero(mask))):
+            trades.append(
+                {
+                    "strategy": int(k),
+                    "symbol": symbols[s],
+                    "side": "LONG" if direction[i] > 0 else "SHORT",
+                    "entry_time": int(times[entry_bar[k, s]]),
+                    "exit_time": int(times[t]),
+                    "entry_price": float(entry_price[k, s]),
+                    "exit_price": float(price[i]),
+                    "quantity": float(abs(qty[i])),
+                    "fees": float(entry_fee[k, s] + exit_fee[i]),
+                    "profit": float(profit[i]),
+                    "exit_reason": reason,
+                }
+            )
+        quantity[mask] = 0.0
+
+    for t in range(n_bars):
+        if progress is not None and t % PROGRESS_EVERY == 0:
+            progress(t / n_bars)
+        o, h, l, c = (np.broadcast_to(a[t], shape) for a in (open_, high, low, close))
+        is_long = quantity > 0
+        is_short = quantity < 0
+        live = tradable[t]
+
+        # Stops and targets, checked against the intrabar range
+        stopped = np.zeros(shape, dtype=bool)
+        if model.stop_loss:
+            hit = live & ((is_long & (l <= stop)) | (is_short & (h >= stop)))
+            if hit.any():
+                level = np.where(is_long, np.minimum(o, stop), np.maximum(o, stop))[hit]
+                direction = np.sign(quantity[hit])
+                close_positions(
+                    t,
+                    hit,
+                    _exit_fill(model, direction, level),
+                    model.taker_fee,
+                    "stop_loss",
+                )
+                stopped |= hit
+        if model.take_profit:
+            hit = (
+                live
+                & ((is_long & (h >= target)) | (is_short & (l <= target)))
+                & ~stopped
+            )
+            if hit.any():
+                level = np.where(is_long, np.maximum(o, target), np.minimum(o, target))[
+                    hit
+                ]
+                close_positions(t, hit, level, model.maker_fee, "take_profit")
+                stopped |= hit
+
+        # Signal exits, on the close
+        hit = live & (((quantity > 0) & sell[:, t]) | ((quantity < 0) & buy[:, t]))
+        if hit.any():
+            direction = np.sign(quantity[hit])
+            close_positions(
+                t, hit, _exit_fill(model, direction, c[hit]), model.taker_fee, "signal"
+            )
+
+        # Entries, scaled down to fit the limits
+        long_entry = buy[:, t] & allow_long
+        short_entry = sell[:, t] & allow_short
+        candidates = (quantity == 0) & live & ~stopped & (long_entry | short_entry)
+        exposure = np.abs(quantity) * valued_close[t]
+        equity = cash + float(np.sum(quantity * valued_close[t]))
+        if candidates.any() and equity > 0:
+            flat = np.flatnonzero(candidates)
+            if limits.max_positions is not None:
+                room = limits.max_positions - int(np.count_nonzero(quantity))
+                flat = flat[: max(room, 0)]
+            k, s = np.unravel_index(flat, shape)
+            requested = np.full(len(flat), equity * model.position_size)
+            symbol_room = np.maximum(
+                limits.max_symbol_exposure * equity - exposure.sum(axis=0), 0.0
+            )
+            symbol_requested = np.bincount(s, requested, minlength=n_symbols)
+            with np.errstate(divide="ignore", invalid="ignore"):
+                scale = np.minimum(1.0, symbol_room / symbol_requested)
+            notional = requested * scale[s]
+            gross_room = max(limits.max_gross_exposure * equity - exposure.sum(), 0.0)
+            if notional.sum() > gross_room:
+                notional *= gross_room / notional.sum()
+            keep = notional > 0
+            k, s, notional = k[keep], s[keep], notional[keep]
+            direction = np.where(long_entry[k, s], 1.0, -1.0)
+            price = close[t, s] * (1 + direction * entry_cost)
+            fee = notional * model.taker_fee
+            quantity[k, s] = direction * notional / price
+            entry_price[k, s] = price
+            entry_fee[k, s] = fee
+            entry_bar[k, s] = t
+            stop[k, s] = price * (1 - direction * (model.stop_loss or 0.0))
+            target[k, s] = price * (1 + direction * (model.take_profit or 0.0))
+            cash -= float(np.sum(direction * notional + fee))
+            total_fees += float(fee.sum())
+
+        equity_curve[t] = cash + float(np.sum(quantity * valued_close[t]))
+        if equity_curve[t] > 0:
+            gross = float(np.sum(np.abs(quantity) * valued_close[t])) / equity_curve[t]
+            max_gross = max(max_gross, gross)
+
+    # Positions still open are closed on the last bar
+    still_open = quantity != 0
+    if still_open.any():
+        direction = np.sign(quantity[still_open])
+        last_close = np.broadcast_to(close[-1], shape)[still_open]
+        close_positions(
+            n_bars - 1,
+            still_open,
+            _exit_fill(model, direction, last_close),
+            model.taker_fee,
+            "end",
+        )
+        equity_curve[-1] = cash
+
+    peak = np.maximum.accumulate(equity_curve) if n_bars else equity_curve
+    with np.errstate(divide="ignore", invalid="ignore"):
+        drawdown = np.where(peak > 0, (peak - equity_curve) / peak, 0.0)
+    by_symbol = dict.fromkeys(symbols, 0.0)
+    by_strategy = [0.0] * n_strategies
+    for trade in trades:
+        by_symbol[trade["symbol"]] += trade["profit"]
+        by_strategy[trade["strategy"]] += trade["profit"]
+    wins = sum(trade["profit"] > 0 for trade in trades)
+    return {
+        "final_balance": cash,
+        "total_return": cash / initial_balance - 1,
+        "max_drawdown": float(drawdown.max()) if n_bars else 0.0,
+        "total_fees": total_fees,
+        "win_rate": wins / len(trades) if trades else None,
+        "max_gross_exposure": max_gross,
+        "equity": {"time": times.tolist(), "equity": equity_curve.tolist()},
+        "by_symbol": by_symbol,
+        "by_strategy": by_strategy,
+        "trades": trades,
+    }
+
+
+def backtest_portfolio(
+    candles: dict,
+    strategies,
+    model: ExecutionModel = None,
+    limits: PortfolioLimits = None,
+    initial_balance: float = 10000.0,
+    progress=None,
+):
+    """
+    Backtest ``strategies`` on every symbol of ``candles`` with one shared capital.
+
+    Parameters:
+    candles (dict): Symbol -> ``Candles`` or DataFrame ('timestamp', 'open', 'high', 'low', 'close').
+    strategies (list): ``Settings.strategies`` entries as dicts; 'side' restricts the direction.
+    model (ExecutionModel, optional): Fees, costs, position size, stops. Its 'side' isn't used.
+    limits (PortfolioLimits, optional): Exposure limits.
+    initial_balance (float): Starting capital.
+    progress (Callable, optional): See ``simulate_portfolio``.
+
+    Returns:
+    dict: See ``simulate_portfolio``.
+    """
+    model = model or ExecutionModel()
+    limits = limits or PortfolioLimits()
+    if not candles:
+        raise ValueError("No symbols to backtest")
+    sides = [strategy.get("side", "LONG") for strategy in strategies]
+    for side in sides:
+        if side not in SIDES:
+            raise ValueError(f"side must be one of {SIDES}")
+
+    times, panels, tradable = align_candles(candles)
+    masks = [
+        strategy_masks(strategy, panels["high"], panels["low"], panels["close"])
+        for strategy in strategies
+    ]
+    buy = np.stack([mask[0] for mask in masks])
+    sell = np.stack([mask[1] for mask in masks])
+    return simulate_portfolio(
+        times,
+        *(panels[field].to_numpy(dtype="float64") for field in PANEL_FIELDS),
+        tradable,
+        buy,
+        sell,
+        sides,
+        model,
+        limits,
+        initial_balance,
+        symbols=list(panels["close"].columns),
+        progress=progress,
+    )
@@ -0,0 +1,299 @@
+"""
+Robustness analysis of the ``smacrossprice`` strategy.
+
+- ``walk_forward``: rolling optimization on a train window, evaluation on the
+  following out-of-sample window.
+- ``monte_carlo``: bootstrap / shuffled trade order to get a distribution of
+  final balances and drawdowns instead of a single number.
+- ``sensitivity``: final balance over a (window, lookback) grid, i.e. a heatmap.
+
+The independent backtests run on a process pool. Every worker receives the
+price arrays once (pool initializer) and keeps an ``IndicatorCache``, so the
+SMA of a given window and the signals of a given (window, lookback) are
+computed once per worker and then only sliced for every fold.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from itertools import product
+
+import numpy as np
+import pandas as pd
+
+from core.candles import as_frame
+from core.strategiez.backtest import sma_cross_signal_arrays, simulate_trades
+
+
+class IndicatorCache:
+    """Precomputed indicator and signal arrays of one price history."""
+
+    def __init__(self, high, low, close):
+        self.high = np.asarray(high, dtype="float64")
+        self.low = np.asarray(low, dtype="float64")
+        self.close = np.asarray(close, dtype="float64")
+        self._sma = {}
+        self._signals = {}
+
+    def sma(self, window: int):
+        if window not in self._sma:
+            self._sma[window] = (
+                pd.Series(self.close).rolling(window=window).mean().to_numpy()
+            )
+        return self._sma[window]
+
+    def signals(self, window: int, lookback: int = 3):
+        key = (window, lookback)
+        if key not in self._signals:
+            self._signals[key] = sma_cross_signal_arrays(
+                self.high, self.low, self.close, self.sma(window), lookback
+            )
+        return self._signals[key]
+
+    def trades(self, window: int, lookback: int = 3, start: int = 0, stop: int = None):
+        """Trades (entries, exits, profits) of the strategy restricted to ``[start, stop)``."""
+        buy, sell = self.signals(window, lookback)
+        stop = len(self.close) if stop is None else stop
+        entries, exits, profits = simulate_trades(
+            self.close[start:stop], buy[start:stop], sell[start:stop]
+        )
+        return entries + start, exits + start, profits
+
+    def profit(
+        self, window: int, lookback: int = 3, start: int = 0, stop: int = None
+    ) -> float:
+        return float(self.trades(window, lookback, start, stop)[2].sum())
+
+
+# Per-process cache, set by the pool initializer
+_worker_cache = None
+
+
+def _init_worker(high, low, close):
+    global _worker_cache
+    _worker_cache = IndicatorCache(high, low, close)
+
+
+def _profit_task(task):
+    window, lookback, start, stop = task
+    return _worker_cache.profit(window, lookback, start, stop)
+
+
+def _run_profits(df: pd.DataFrame, tasks, max_workers=None, progress=None):
+    """
+    Run ``IndicatorCache.profit`` for every (window, lookback, start, stop) task.
+
+    ``progress`` (optional) is called with the fraction of tasks done after
+    every batch of tasks (one task per worker).
+    """
+    arrays = (df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy())
+    max_workers = max_workers or os.cpu_count() or 1
+    batch_size = len(tasks) if progress is None else max_workers
+    batches = [
+        tasks[i : i + batch_size] for i in range(0, len(tasks), max(1, batch_size))
+    ]
+    profits = []
+
+    def report():
+        if progress is not None:
+            progress(len(profits) / len(tasks))
+
+    if max_workers == 1 or len(tasks) < 2:
+        _init_worker(*arrays)
+        for batch in batches:
+            profits.extend(_profit_task(task) for task in batch)
+            report()
+        return profits
+
+    with ProcessPoolExecutor(
+        max_workers=max_workers, initializer=_init_worker, initargs=arrays
+    ) as pool:
+        for batch in batches:
+            chunksize = max(1, len(batch) // (4 * max_workers))
+            profits.extend(pool.map(_profit_task, batch, chunksize=chunksize))
+            report()
+    return profits
+
+
+def walk_forward(
+    df: pd.DataFrame,
+    windows,
+    lookbacks=(3,),
+    train_size: int = 1000,
+    test_size: int = 250,
+    step: int = None,
+    max_workers: int = None,
+    progress=None,
+):
+    """
+    Rolling walk-forward optimization.
+
+    For every fold the (window, lookback) with the best profit on the train
+    window is selected and then evaluated on the next ``test_size`` candles.
+
+    Parameters:
+    df (pd.DataFrame | Candles): Candles with 'timestamp', 'high', 'low' and 'close', oldest first.
+    windows, lookbacks (iterable): Parameter grid.
+    train_size, test_size (int): Fold sizes in candles.
+    step (int, optional): Offset between folds, defaults to ``test_size``.
+    max_workers (int, optional): Process pool size, 1 runs everything in-process.
+    progress (Callable, optional): Called with the fraction of backtests done,
+                                   after every batch of in-sample runs and
+                                   every out-of-sample fold.
+
+    Returns:
+    dict: 'folds' (one dict per fold) and the out-of-sample totals.
+    """
+    df = as_frame(df)
+    step = step or test_size
+    grid = list(product(windows, lookbacks))
+    folds = [
+        (start, start + train_size, start + train_size + test_size)
+        for start in range(0, len(df) - train_size - test_size + 1, step)
+    ]
+    if not folds:
+        raise ValueError("Not enough candles for a single train/test fold")
+
+    # All in-sample runs at once, so the pool stays busy
+    in_sample = [
+        (window, lookback, start, train_end)
+        for start, train_end, _ in folds
+        for window, lookback in grid
+    ]
+    total = len(in_sample) + len(folds)
+
+    def stage_progress(done: int, size: int):
+        # Fraction of a stage of ``size`` backtests -> fraction of the total
+        if progress is None:
+            return None
+        return lambda fraction: progress((done + fraction * size) / total)
+
+    train_profits = np.asarray(
+        _run_profits(df, in_sample, max_workers, stage_progress(0, len(in_sample)))
+    ).reshape(len(folds), len(grid))
+    best = train_profits.argmax(axis=1)
+    out_of_sample = [
+        (*grid[best[i]], train_end, test_end)
+        for i, (_, train_end, test_end) in enumerate(folds)
+    ]
+    test_profits = _run_profits(
+        df,
+        out_of_sample,
+        # In-process when reporting, so progress comes once per fold
+        1 if progress else max_workers,
+        stage_progress(len(in_sample), len(folds)),
+    )
+
+    timestamps = df["timestamp"].to_numpy()
+    result_folds = []
+    for i, (start, train_end, test_end) in enumerate(folds):
+        window, lookback = grid[best[i]]
+        result_folds.append(
+            {
+                "train_start": float(timestamps[start]),
+                "test_start": float(timestamps[train_end]),
+                "test_end": float(timestamps[test_end - 1]),
+                "window": window,
+                "lookback": lookback,
+                "train_profit": float(train_profits[i, best[i]]),
+                "test_profit": float(test_profits[i]),
+            }
+        )
+    total_train = float(train_profits.max(axis=1).sum())
+    total_test = float(np.sum(test_profits))
+    return {
+        "folds": result_folds,
+        "total_test_profit": total_test,
+        # Out-of-sample / in-sample profit per candle, close to 1 means little overfitting
+        "walk_forward_efficiency": (
+            (total_test / test_size) / (total_train / train_size)
+            if total_train
+            else None
+        ),
+    }
+
+
+def monte_carlo(
+    profits,
+    runs: int = 10000,
+    initial_balance: float = 10000.0,
+    method: str = "bootstrap",
+    seed: int = None,
+    batch_size: int = 2000,
+):
+    """
+    Resample the trade order to get the distribution of outcomes.
+
+    ``bootstrap`` draws trades with replacement, ``shuffle`` only permutes them
+    (the final balance is then fixed, but drawdowns change). Runs are computed
+    as (batch_size x trades) matrices, which is much faster than a process pool
+    for this amount of work.
+
+    Returns:
+    dict: Percentiles of the final balance and of the max drawdown, and the
+    probability of ending below ``initial_balance``.
+    """
+    profits = np.asarray(profits, dtype="float64")
+    if profits.size == 0:
+        raise ValueError("No trades to resample")
+    if method not in ("bootstrap", "shuffle"):
+        raise ValueError(f"Unknown method: {method}")
+
+    rng = np.random.default_rng(seed)
+    finals, drawdowns = [], []
+    for offset in range(0, runs, batch_size):
+        size = min(batch_size, runs - offset)
+        if method == "bootstrap":
+            samples = rng.choice(profits, size=(size, profits.size), replace=True)
+        else:
+            samples = rng.permuted(
+                np.broadcast_to(profits, (size, profits.size)), axis=1
+            )
+        equity = initial_balance + np.cumsum(samples, axis=1)
+        peaks = np.maximum.accumulate(np.maximum(equity, initial_balance), axis=1)
+        finals.append(equity[:, -1])
+        drawdowns.append(((peaks - equity) / peaks).max(axis=1))
+
+    finals = np.concatenate(finals)
+    drawdowns = np.concatenate(drawdowns)
+    percentiles = [5, 25, 50, 75, 95]
+    return {
+        "runs": runs,
+        "trades": int(profits.size),
+        "final_balance": dict(
+            zip(map(str, percentiles), np.percentile(finals, percentiles).tolist())
+        ),
+        "max_drawdown": dict(
+            zip(map(str, percentiles), np.percentile(drawdowns, percentiles).tolist())
+        ),
+        "probability_of_loss": float((finals < initial_balance).mean()),
+    }
+
+
+def sensitivity(
+    df: pd.DataFrame,
+    windows,
+    lookbacks=(2, 3, 4, 5),
+    max_workers: int = None,
+    progress=None,
+):
+    """
+    Profit over the full history for every (window, lookback) pair.
+
+    ``progress`` (optional) is called with the fraction of the grid done,
+    after every chunk of the grid (one pair per worker).
+
+    Returns:
+    dict: 'windows', 'lookbacks' and 'profit', a len(windows) x len(lookbacks) matrix.
+    """
+    df = as_frame(df)
+    windows, lookbacks = list(windows), list(lookbacks)
+    tasks = [
+        (window, lookback, 0, len(df))
+        for window, lookback in product(windows, lookbacks)
+    ]
+    profits = np.asarray(_run_profits(df, tasks, max_workers, progress))
+    return {
+        "windows": windows,
+        "lookbacks": lookbacks,
+        "profit": profits.reshape(len(windows), len(lookbacks)).tolist(),
+    }
@@ -1,6 +1,8 @@
 import pandas as pd
 
+from core.candles import as_frame
 from core.strategiez.indicators import calculate_sma
+from core.strategiez.kernels import sma_cross_masks
 
 
 def calculate_indicator_signals(
@@ -10,7 +12,7 @@ def calculate_indicator_signals(
     Calculate indicator signals for a given financial data and indicator type.
 
     Parameters:
-    df (pd.DataFrame): A DataFrame containing financial data with at least a 'Close' column.
+    df (pd.DataFrame | Candles): Financial data with at least a 'close' column.
     indicator_name (str): The name of the indicator to calculate. Supported values are 'MACD' and 'RSI'.
     variables (dict): A dictionary containing indicator-specific parameters. For 'MACD', it includes
                       'fast_length', 'slow_length', and 'signal_length'. For 'RSI', it includes 'length'.
@@ -21,6 +23,7 @@ def calculate_indicator_signals(
                                a dictionary of signals with keys 'indicator', 'divergence_detected', 'side',
                                and 'last_value'.
     """
+    df = as_frame(df)
     signals = {"indicator": indicator_name, "divergence_detected": False, "side": None}
 
     if indicator_name == "MACD":
@@ -69,6 +72,7 @@ def generate_signals(
     df,
     settings=None,  # : Settings, type hinting creates circular import
 ):
+    df = as_frame(df)
     # Ensure datetime is in Unix time format
 
     # for i in range(len(df)):
@@ -109,26 +113,12 @@ def generate_signals(
     #         ):
     #             signal = "SELL"
 
-    sma_window = settings.strategies[0].params["window"] if settings else 50
-    df["sma"] = calculate_sma(df, sma_window)
+    params = settings.strategies[0].params if settings else {"window": 50}
+    df["sma"] = calculate_sma(df, params["window"])
 
-    # Main condition: current high above sma and low below sma
-    main_cond = (df["high"] > df["sma"]) & (df["low"] < df["sma"])
-
-    # For rolling window conditions, shift by 1 to exclude current row.
-    # BUY condition: sma.<close AND all previous 3 sma > previous 3 high
-    sma_prev_min = df["sma"].shift(1).rolling(window=3, min_periods=3).min()
-    high_prev_max = df["high"].shift(1).rolling(window=3, min_periods=3).max()
-    buy_cond = (df["sma"] < df["close"]) & (sma_prev_min > high_prev_max)
-
-    # SELL condition: sma > close AND all previous 3 sma < previous 3 low
-    sma_prev_max = df["sma"].shift(1).rolling(window=3, min_periods=3).max()
-    low_prev_min = df["low"].shift(1).rolling(window=3, min_periods=3).min()
-    sell_cond = (df["sma"] > df["close"]) & (sma_prev_max < low_prev_min)
-
-    # Combine with the overall main condition
-    buy_signals = main_cond & buy_cond
-    sell_signals = main_cond & sell_cond
+    buy_signals, sell_signals = sma_cross_masks(
+        df["high"], df["low"], df["close"], df["sma"], params.get("lookback", 3)
+    )
 
     # Create a signals list of dictionaries
     signals = []
@@ -0,0 +1,243 @@
+"""
+Chunked indicator calculation for price histories that don't fit in memory.
+
+``ChunkedIndicator`` produces the same columns as
+``calculate_indicator_signals`` but one chunk at a time: EMA values and the
+tails of the rolling windows are carried over chunk boundaries, so only one
+chunk is ever held in memory.
+"""
+
+import io
+import itertools
+import json
+
+import numpy as np
+import pandas as pd
+
+CSV = "text/csv"
+NDJSON = "application/x-ndjson"
+ARROW = "application/vnd.apache.arrow.stream"
+# Columns read by ChunkedIndicator
+REQUIRED_COLUMNS = ("close",)
+
+
+def _ewm_carry(values: pd.Series, span: int, last):
+    """``ewm(span, adjust=False).mean()`` continued from the previous chunk's last value."""
+    if last is None:
+        return values.ewm(span=span, adjust=False).mean()
+    # Prepending the previous EMA value makes the recursion resume exactly where it stopped
+    extended = pd.concat([pd.Series([last]), values], ignore_index=True)
+    result = extended.ewm(span=span, adjust=False).mean().iloc[1:]
+    result.index = values.index
+    return result
+
+
+def _rolling_mean_carry(values: pd.Series, window: int, tail: pd.Series):
+    """``rolling(window).mean()`` continued with the previous chunk's tail."""
+    extended = pd.concat([tail, values], ignore_index=True)
+    result = extended.rolling(window=window).mean().iloc[len(tail) :]
+    result.index = values.index
+    return result, extended.iloc[-(window - 1) :] if window > 1 else extended.iloc[:0]
+
+
+class ChunkedIndicator:
+    """
+    Stateful, chunk-by-chunk version of ``calculate_indicator_signals``.
+
+    Parameters:
+    indicator_name (str): 'MACD', 'RSI' or 'SMA'.
+    variables (dict): Same parameters as ``calculate_indicator_signals``
+                      ('period' for SMA).
+    """
+
+    def __init__(self, indicator_name: str, variables: dict):
+        if indicator_name not in ("MACD", "RSI", "SMA"):
+            raise ValueError(f"Unsupported indicator: {indicator_name}")
+        self.indicator_name = indicator_name
+        self.variables = variables
+        self.rows = 0
+        # MACD state
+        self.ema_fast = self.ema_slow = self.ema_signal = None
+        # RSI / SMA state
+        self.last_close = None
+        self.gain_tail = pd.Series(dtype="float64")
+        self.loss_tail = pd.Series(dtype="float64")
+        self.close_tail = pd.Series(dtype="float64")
+        # Last two values of the output, enough for the signals
+        self.last_values = []
+
+    def process(self, df: pd.DataFrame) -> pd.DataFrame:
+        """Add the indicator columns to ``df`` (the next chunk, oldest first)."""
+        if df.empty:
+            return df
+        close = df["close"].astype("float64")
+
+        if self.indicator_name == "MACD":
+            fast_length = self.variables.get("fast_length", 12)
+            slow_length = self.variables.get("slow_length", 26)
+            signal_length = self.variables.get("signal_length", 9)
+            df["EMA_fast"] = _ewm_carry(close, fast_length, self.ema_fast)
+            df["EMA_slow"] = _ewm_carry(close, slow_length, self.ema_slow)
+            df["MACD_line"] = df["EMA_fast"] - df["EMA_slow"]
+            df["MACD_signal"] = _ewm_carry(
+                df["MACD_line"], signal_length, self.ema_signal
+            )
+            df["MACD_hist"] = df["MACD_line"] - df["MACD_signal"]
+            self.ema_fast = df["EMA_fast"].iloc[-1]
+            self.ema_slow = df["EMA_slow"].iloc[-1]
+            self.ema_signal = df["MACD_signal"].iloc[-1]
+            output = df["MACD_hist"]
+
+        elif self.indicator_name == "RSI":
+            length = self.variables.get("length", 14)
+            previous = pd.Series(
+                [np.nan if self.last_close is None else self.last_close]
+            )
+            delta = pd.concat([previous, close], ignore_index=True).diff().iloc[1:]
+            delta.index = close.index
+            gain, self.gain_tail = _rolling_mean_carry(
+                delta.where(delta > 0, 0), length, self.gain_tail
+            )
+            loss, self.loss_tail = _rolling_mean_carry(
+                -delta.where(delta < 0, 0), length, self.loss_tail
+            )
+            rs = gain / loss
+            df["RSI"] = 100 - (100 / (1 + rs))
+            output = df["RSI"]
+
+        else:
+            period = self.variables.get("period", 21)
+            df[f"SMA_{period}"], self.close_tail = _rolling_mean_carry(
+                close, period, self.close_tail
+            )
+            output = df[f"SMA_{period}"]
+
+        self.last_close = close.iloc[-1]
+        self.rows += len(df)
+        self.last_values = (self.last_values + output.iloc[-2:].tolist())[-2:]
+        return df
+
+    def signals(self, detect_divergence: bool = False) -> dict:
+        """Signals of the whole history, same keys as ``calculate_indicator_signals``."""
+        signals = {
+            "indicator": self.indicator_name,
+            "divergence_detected": False,
+            "side": None,
+            "last_value": self.last_values[-1] if self.last_values else None,
+        }
+        if not detect_divergence or len(self.last_values) < 2:
+            return signals
+        previous, last = self.last_values
+        if self.indicator_name == "MACD":
+            if last > 0 and previous <= 0:
+                signals["divergence_detected"] = True
+                signals["side"] = "BUY"
+            elif last < 0 and previous >= 0:
+                signals["divergence_detected"] = True
+                signals["side"] = "SELL"
+        elif self.indicator_name == "RSI":
+            if last < 30:
+                signals["divergence_detected"] = True
+                signals["side"] = "BUY"
+            elif last > 70:
+                signals["divergence_detected"] = True
+                signals["side"] = "SELL"
+        return signals
+
+
+def _iter_arrow(file, chunk_rows):
+    import pyarrow.ipc
+
+    for batch in pyarrow.ipc.open_stream(file):
+        for offset in range(0, batch.num_rows, chunk_rows):
+            yield batch.slice(offset, chunk_rows).to_pandas()
+
+
+def iter_chunks(file, content_type: str, chunk_rows: int = 50_000):
+    """
+    Read a binary file-like object chunk by chunk.
+
+    Supports CSV (with a header), NDJSON and the Arrow IPC stream format
+    (the latter requires ``pyarrow``).
+
+    Returns:
+    Iterator[pd.DataFrame]: At most ``chunk_rows`` rows at a time.
+
+    Raises:
+    ValueError: If the content type is not supported.
+    """
+    content_type = content_type.split(";")[0].strip().lower()
+    if content_type in (CSV, "application/csv"):
+        return pd.read_csv(file, chunksize=chunk_rows)
+    if content_type in (NDJSON, "application/jsonl", "application/json-lines"):
+        text = io.TextIOWrapper(file, encoding="utf-8")
+        return pd.read_json(text, lines=True, chunksize=chunk_rows)
+    if content_type == ARROW:
+        try:
+            import pyarrow  # noqa: F401
+        except ImportError:
+            raise ValueError("Arrow uploads require pyarrow to be installed") from None
+        return _iter_arrow(file, chunk_rows)
+    raise ValueError(f"Unsupported content type: {content_type}")
+
+
+def process_chunks(chunks, indicator: ChunkedIndicator):
+    """Add the ``indicator`` columns to every chunk (``datetime`` as Unix time)."""
+    for df in chunks:
+        # Ensure datetime is in Unix time format
+        if "datetime" in df.columns:
+            df["datetime"] = pd.to_datetime(df["datetime"]).astype(int) // 10**9
+        yield indicator.process(df)
+
+
+def check_chunks(chunks, indicator: ChunkedIndicator, required=REQUIRED_COLUMNS):
+    """
+    Read, check and process the first chunk, so that a bad upload (missing
+    columns, values or variables the indicator can't use) is rejected before
+    the response starts.
+
+    Returns:
+    Iterator[pd.DataFrame]: All the chunks with the indicator columns, the
+    first one included (``encode_indicator`` input).
+
+    Raises:
+    ValueError: If there are no rows, a required column is missing or the
+    first chunk can't be processed.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, None)
+    if first is None or first.empty:
+        raise ValueError("The upload has no rows")
+    missing = [column for column in required if column not in first.columns]
+    if missing:
+        raise ValueError(f"Missing required columns: {missing}")
+    try:
+        (first,) = process_chunks([first], indicator)
+    except (ValueError, TypeError) as e:
+        raise ValueError(f"Can't calculate {indicator.indicator_name}: {e}") from e
+    return itertools.chain([first], process_chunks(chunks, indicator))
+
+
+def encode_indicator(frames, indicator: ChunkedIndicator, detect_divergence=False):
+    """
+    Yield processed ``frames`` as NDJSON lines.
+
+    Every row is written as one JSON object (NaN and infinite values replaced by
+    0 as in ``/calculate``), followed by a last line holding the signals.
+    """
+    for df in frames:
+        df = df.replace([float("inf"), -float("inf")], float("nan")).fillna(0)
+        yield df.to_json(orient="records", lines=True).rstrip("\n") + "\n"
+
+    signals = indicator.signals(detect_divergence)
+    last_value = signals["last_value"]
+    if last_value is not None and not np.isfinite(last_value):
+        signals["last_value"] = None
+    yield json.dumps({"signals": signals}, default=float) + "\n"
+
+
+def stream_indicator(chunks, indicator: ChunkedIndicator, detect_divergence=False):
+    """Compute ``indicator`` over ``chunks`` and yield NDJSON lines (``encode_indicator``)."""
+    yield from encode_indicator(
+        process_chunks(chunks, indicator), indicator, detect_divergence
+    )
@@ -0,0 +1,401 @@
+"""
+Multiplexed candle streams.
+
+One websocket per client carries any number of subscriptions, each one a
+(symbol, interval, indicators) triple. Symbols and intervals are normalized
+(``exchanges.normalize_symbol`` / ``normalize_interval``), the stream ids use
+the normalized names. Upstream exchange feeds are shared:
+``CandleHub`` runs a single feed per (symbol, interval) whatever the number of
+subscribers, computes the requested indicators incrementally and offers every
+candle to the subscriptions.
+
+A subscription never blocks the feed. It keeps the latest in-progress candle
+(latest value wins) plus a queue of finished candles, and the client session
+sends them at the rate the client asked for, as deltas: within a candle only
+the fields that changed since the last message are sent.
+
+Client messages::
+
+    {"op": "subscribe", "symbol": "BTC-USDT", "interval": "1min",
+     "indicators": ["sma:21", "rsi:14", "signal:21:3"], "fields": ["close", "sma:21"],
+     "rate": 2}
+    {"op": "unsubscribe", "symbol": "BTC-USDT", "interval": "1min"}
+
+Server messages::
+
+    {"type": "subscribed", "stream": "BTC-USDT:1min"}
+    {"type": "candle", "stream": "BTC-USDT:1min", "full": true, "data": {...}}
+    {"type": "candle", "stream": "BTC-USDT:1min", "data": {"time": ..., "close": ...}}
+    {"type": "error", "message": "..."}
+"""
+
+import asyncio
+import math
+from collections import deque
+
+from core.candles import CandleBuffer, Candles
+from core.exchanges import normalize_interval, normalize_symbol
+from core.strategiez.incremental import EMA, MACD, RSI, RollingMean, SmaCross
+from core.ws_sender import SlowConsumer
+
+CANDLE_FIELDS = ("time", "open", "high", "low", "close", "volume", "is_final")
+# Final candles kept per feed, to warm up indicators added by later subscribers
+HISTORY_SIZE = 1000
+MAX_RATE = 20.0
+# Undelivered final candles per subscription before the client is evicted
+MAX_QUEUED_FINALS = 256
+
+
+def stream_id(symbol: str, interval: str) -> str:
+    return f"{symbol}:{interval}"
+
+
+def make_indicator(spec: str):
+    """
+    Build an incremental indicator from a spec such as ``sma:21``, ``ema:9``,
+    ``rsi:14``, ``macd`` / ``macd:12:26:9`` or ``signal:21`` / ``signal:21:3``
+    (smacrossprice side, window and lookback).
+
+    Returns:
+    Callable[[dict], Any]: Takes a finished candle and returns the new value.
+
+    Raises:
+    ValueError: If the spec is not understood.
+    """
+    name, *args = spec.lower().split(":")
+    try:
+        args = [int(arg) for arg in args]
+    except ValueError:
+        raise ValueError(f"Invalid indicator: {spec!r}") from None
+
+    if name == "sma" and len(args) == 1:
+        indicator = RollingMean(args[0])
+        return lambda candle: indicator.update(candle["close"])
+    if name == "ema" and len(args) == 1:
+        indicator = EMA(args[0])
+        return lambda candle: indicator.update(candle["close"])
+    if name == "rsi" and len(args) <= 1:
+        indicator = RSI(*args)
+        return lambda candle: indicator.update(candle["close"])
+    if name == "macd" and len(args) in (0, 3):
+        indicator = MACD(*args)
+        return lambda candle: indicator.update(candle["close"])
+    if name == "signal" and len(args) <= 2:
+        indicator = SmaCross(*args)
+        return lambda candle: indicator.update(
+            candle["high"], candle["low"], candle["close"]
+        )
+    raise ValueError(f"Invalid indicator: {spec!r}")
+
+
+def _json_value(value):
+    if isinstance(value, float) and not math.isfinite(value):
+        return None
+    return value
+
+
+class Feed:
+    """One upstream (symbol, interval) feed shared by all its subscriptions."""
+
+    def __init__(self, symbol: str, interval: str):
+        self.symbol = symbol
+        self.interval = interval
+        self.subscriptions = set()
+        self.indicators = {}
+        # Last value of every indicator, in-progress candles reuse them
+        self.values = {}
+        self.history = CandleBuffer(HISTORY_SIZE)
+        self.task = None
+        self.ready = False  # A candle came from the stream
+
+    def add_indicator(self, spec: str):
+        if spec in self.indicators:
+            return
+        indicator = make_indicator(spec)
+        value = None
+        for candle in self.history:
+            value = indicator(candle)
+        self.indicators[spec] = indicator
+        self.values[spec] = value
+
+    def push(self, candle: dict):
+        """Update the indicators (finished candles only) and offer the row to every subscriber."""
+        self.ready = True
+        row = {field: candle.get(field) for field in CANDLE_FIELDS}
+        # The history may already end with this candle
+        if candle["is_final"] and (
+            not self.history or candle["time"] > self.history.last_time
+        ):
+            self.history.append(candle)
+            for spec, indicator in self.indicators.items():
+                self.values[spec] = indicator(candle)
+        for spec, value in self.values.items():
+            # Signals only exist on the candle that produced them
+            if spec.startswith("signal") and not candle["is_final"]:
+                value = None
+            row[spec] = _json_value(value)
+        for subscription in self.subscriptions:
+            subscription.offer(row)
+
+
+class CandleHub:
+    """
+    Shares upstream feeds between subscriptions.
+
+    Parameters:
+    candles (Callable): ``candles(symbol, interval)`` async generator of candle
+                        dicts, e.g. ``exchanges.Exchange.candles``.
+    history (Callable, optional): ``history(symbol, interval)`` returning
+                        ``Candles`` (or a DataFrame) of past candles (oldest
+                        first, the last one still in progress), used to seed
+                        the indicators.
+                        Called in a thread.
+    """
+
+    def __init__(self, candles, history=None):
+        self.candles = candles
+        self.history = history
+        self.feeds = {}
+
+    @property
+    def ready(self) -> bool:
+        """True once every subscribed feed has streamed a candle."""
+        return all(feed.ready for feed in self.feeds.values())
+
+    def subscribe(self, subscription: "Subscription"):
+        key = stream_id(subscription.symbol, subscription.interval)
+        feed = self.feeds.get(key)
+        if feed is None:
+            feed = self.feeds[key] = Feed(subscription.symbol, subscription.interval)
+        for spec in subscription.indicators:
+            feed.add_indicator(spec)
+        feed.subscriptions.add(subscription)
+        if feed.task is None:
+            feed.task = asyncio.create_task(self._run(feed))
+
+    def unsubscribe(self, subscription: "Subscription"):
+        key = stream_id(subscription.symbol, subscription.interval)
+        feed = self.feeds.get(key)
+        if feed is None:
+            return
+        feed.subscriptions.discard(subscription)
+        if not feed.subscriptions:
+            feed.task.cancel()
+            del self.feeds[key]
+
+    async def _run(self, feed: Feed):
+        try:
+            if self.history is not None:
+                candles = await asyncio.to_thread(
+                    self.history, feed.symbol, feed.interval
+                )
+                if not isinstance(candles, Candles):
+                    candles = Candles.from_frame(candles)
+                # The last candle is still in progress, it comes again from the stream
+                feed.history.extend(candles[:-1])
+                for spec in list(feed.indicators):
+                    del feed.indicators[spec]
+                    feed.add_indicator(spec)
+            async for candle in self.candles(feed.symbol, feed.interval):
+                feed.push(candle)
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            key = stream_id(feed.symbol, feed.interval)
+            print(f"Feed {key} stopped: {e}")
+            # The next subscribe starts a fresh feed
+            if self.feeds.get(key) is feed:
+                del self.feeds[key]
+            for subscription in list(feed.subscriptions):
+                subscription.session.error(f"Stream {subscription.stream} stopped: {e}")
+
+
+def encode_delta(row: dict, last_sent: dict, fields=None):
+    """
+    Message data for ``row`` given what was last sent for the stream.
+
+    Returns:
+    Tuple[dict, bool]: (data, full). ``data`` is None when nothing changed.
+    """
+    selected = {
+        key: value for key, value in row.items() if fields is None or key in fields
+    }
+    selected["time"] = row["time"]
+    if not last_sent or last_sent.get("time") != row["time"]:
+        return selected, True
+    changed = {
+        key: value for key, value in selected.items() if last_sent.get(key) != value
+    }
+    if not changed:
+        return None, False
+    changed["time"] = row["time"]
+    return changed, False
+
+
+class Subscription:
+    """
+    A client's subscription to one (symbol, interval) stream.
+
+    In-progress candles are conflated (only the latest is kept) and sent at
+    most ``rate`` times per second; finished candles are queued and always sent.
+    """
+
+    def __init__(
+        self, session, symbol, interval, indicators=(), fields=None, rate=MAX_RATE
+    ):
+        self.session = session
+        self.symbol = symbol
+        self.interval = interval
+        self.stream = stream_id(symbol, interval)
+        self.indicators = list(indicators)
+        for spec in self.indicators:
+            make_indicator(spec)  # Validate before touching the hub
+        self.fields = set(fields) | {"time", "is_final"} if fields else None
+        self.min_interval = 1 / min(max(float(rate), 0.01), MAX_RATE)
+        self.pending = None
+        self.finals = deque()
+        self.last_sent = {}
+        self.next_send_at = 0.0
+
+    def offer(self, row: dict):
+        if row["is_final"]:
+            if len(self.finals) >= MAX_QUEUED_FINALS:
+                self.session.evict(f"slow consumer: {self.stream} is falling behind")
+                self.finals.popleft()
+            self.finals.append(row)
+            # The finished candle supersedes any in-progress version
+            self.pending = None
+        else:
+            self.pending = row
+        self.session.wake()
+
+    def due_at(self):
+        """Loop time at which this subscription has something to send, or None."""
+        if self.finals:
+            return 0.0
+        if self.pending is not None:
+            return self.next_send_at
+        return None
+
+    def take(self, now: float):
+        """Messages ready to be sent at ``now``."""
+        messages = []
+        while self.finals:
+            messages.append(self._encode(self.finals.popleft()))
+        if self.pending is not None and now >= self.next_send_at:
+            messages.append(self._encode(self.pending))
+            self.pending = None
+        if messages:
+            self.next_send_at = now + self.min_interval
+        return [message for message in messages if message is not None]
+
+    def _encode(self, row):
+        data, full = encode_delta(row, self.last_sent, self.fields)
+        if data is None:
+            return None
+        if full:
+            self.last_sent = dict(data)
+        else:
+            self.last_sent.update(data)
+        message = {"type": "candle", "stream": self.stream, "data": data}
+        if full:
+            message["full"] = True
+        return message
+
+
+class ClientSession:
+    """
+    Subscriptions and send loop of one websocket client.
+
+    Parameters:
+    hub (CandleHub): Shared feeds.
+    send (Callable): ``await send(message)``, e.g. ``ClientSender.send``.
+    evict (Callable, optional): ``evict(reason)``, e.g. ``ClientSender.evict``.
+    """
+
+    def __init__(self, hub: CandleHub, send, evict=None):
+        self.hub = hub
+        self.send = send
+        self.evict = evict or (lambda reason: None)
+        self.subscriptions = {}
+        self.errors = deque()
+        self._wake = asyncio.Event()
+
+    def wake(self):
+        self._wake.set()
+
+    def error(self, message: str):
+        self.errors.append({"type": "error", "message": message})
+        self.wake()
+
+    async def handle(self, message: dict):
+        """Apply a client message (subscribe / unsubscribe)."""
+        op = message.get("op")
+        symbol, interval = message.get("symbol"), message.get("interval", "1min")
+        if op not in ("subscribe", "unsubscribe") or not symbol:
+            self.error(f"Invalid message: {message}")
+            return
+        try:
+            # One feed per market, whatever the spelling ("btcusdt", "1m", ...)
+            symbol, interval = normalize_symbol(symbol), normalize_interval(interval)
+        except (ValueError, AttributeError):
+            self.error(f"Invalid symbol or interval: {message}")
+            return
+        key = stream_id(symbol, interval)
+        if op == "unsubscribe":
+            if key in self.subscriptions:
+                self.hub.unsubscribe(self.subscriptions.pop(key))
+            await self.send({"type": "unsubscribed", "stream": key})
+            return
+        try:
+            subscription = Subscription(
+                self,
+                symbol,
+                interval,
+                message.get("indicators", ()),
+                message.get("fields"),
+                message.get("rate", MAX_RATE),
+            )
+        except (ValueError, TypeError) as e:
+            self.error(str(e))
+            return
+        # Subscribe before dropping the old subscription, so the feed keeps running
+        self.hub.subscribe(subscription)
+        if key in self.subscriptions:
+            self.hub.unsubscribe(self.subscriptions[key])
+        self.subscriptions[key] = subscription
+        await self.send({"type": "subscribed", "stream": key})
+
+    async def run(self):
+        """Send loop: waits for data, respects every subscription's rate."""
+        try:
+            await self._send_loop()
+        except SlowConsumer:
+            pass
+
+    async def _send_loop(self):
+        loop = asyncio.get_running_loop()
+        while True:
+            # Cleared first: anything offered while we are sending wakes us up again
+            self._wake.clear()
+            while self.errors:
+                await self.send(self.errors.popleft())
+            for subscription in list(self.subscriptions.values()):
+                for message in subscription.take(loop.time()):
+                    await self.send(message)
+
+            dues = [
+                subscription.due_at() for subscription in self.subscriptions.values()
+            ]
+            dues = [due for due in dues if due is not None]
+            next_due = min(dues) if dues else None
+            timeout = None if next_due is None else max(next_due - loop.time(), 0)
+            try:
+                await asyncio.wait_for(self._wake.wait(), timeout)
+            except asyncio.TimeoutError:
+                pass
+
+    def close(self):
+        for subscription in self.subscriptions.values():
+            self.hub.unsubscribe(subscription)
+        self.subscriptions.clear()
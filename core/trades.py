@@ -0,0 +1,140 @@
+"""
+Trade stream aggregation into per-candle order-flow metrics.
+
+``TradeAggregator`` is the streaming version (one trade at a time, only
+running sums are kept), ``aggregate_trades`` the batch one (recorded trades,
+NumPy). Both give the same candles, up to the rounding of the sums.
+"""
+
+from collections import deque
+
+import numpy as np
+
+TRADE_CANDLE_FIELDS = (
+    "time",
+    "open",
+    "high",
+    "low",
+    "close",
+    "volume",
+    "buy_volume",
+    "sell_volume",
+    "count",
+    "vwap",
+)
+
+# Finished candles kept per symbol
+HISTORY_SIZE = 1000
+
+
+class TradeAggregator:
+    """
+    Per-candle VWAP, buy/sell volume and trade count of one symbol.
+
+    Parameters:
+    interval (int): Candle length in seconds.
+    history (int): Number of finished candles kept in ``candles``.
+    """
+
+    def __init__(self, interval: int = 60, history: int = HISTORY_SIZE):
+        self.interval = interval
+        self.candles = deque(maxlen=history)
+        self.late = 0  # Trades of an already finished candle, dropped
+        self._start = None
+        self._reset()
+
+    def _reset(self):
+        self._open = self._high = self._low = self._close = None
+        self._volume = self._buy_volume = self._notional = 0.0
+        self._count = 0
+
+    def add(self, time: float, price: float, size: float, side: str):
+        """
+        Add one trade, ``side`` is the taker side ("buy" or "sell").
+
+        Returns:
+        dict: The previous candle if this trade finished it, else None.
+        """
+        start = int(time // self.interval) * self.interval
+        finished = None
+        if self._start is None:
+            self._start = start
+        elif start < self._start:
+            self.late += 1
+            return None
+        elif start > self._start:
+            finished = self.current()
+            self.candles.append(finished)
+            self._start = start
+            self._reset()
+
+        if self._open is None:
+            self._open = self._high = self._low = price
+        elif price > self._high:
+            self._high = price
+        elif price < self._low:
+            self._low = price
+        self._close = price
+        self._volume += size
+        self._notional += price * size
+        if side == "buy":
+            self._buy_volume += size
+        self._count += 1
+        return finished
+
+    def current(self):
+        """The candle in progress, None before the first trade."""
+        if self._start is None:
+            return None
+        return {
+            "time": self._start,
+            "open": self._open,
+            "high": self._high,
+            "low": self._low,
+            "close": self._close,
+            "volume": self._volume,
+            "buy_volume": self._buy_volume,
+            "sell_volume": self._volume - self._buy_volume,
+            "count": self._count,
+            "vwap": self._notional / self._volume if self._volume else None,
+        }
+
+
+def aggregate_trades(times, prices, sizes, is_buy, interval: int = 60) -> dict:
+    """
+    Batch version of ``TradeAggregator`` for recorded trades, in time order.
+
+    Only candles with at least one trade are returned.
+
+    Returns:
+    dict: One array per field of ``TRADE_CANDLE_FIELDS``.
+    """
+    times = np.asarray(times, dtype="float64")
+    prices = np.asarray(prices, dtype="float64")
+    sizes = np.asarray(sizes, dtype="float64")
+    is_buy = np.asarray(is_buy, dtype=bool)
+
+    if not len(times):
+        return {field: np.empty(0) for field in TRADE_CANDLE_FIELDS}
+
+    starts = (times // interval).astype(np.int64) * interval
+    # Index of the first and last trade of every candle
+    first = np.flatnonzero(np.r_[True, starts[1:] != starts[:-1]])
+    last = np.r_[first[1:], len(times)] - 1
+    volume = np.add.reduceat(sizes, first)
+    buy_volume = np.add.reduceat(np.where(is_buy, sizes, 0.0), first)
+    notional = np.add.reduceat(prices * sizes, first)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        vwap = notional / volume
+    return {
+        "time": starts[first],
+        "open": prices[first],
+        "high": np.maximum.reduceat(prices, first),
+        "low": np.minimum.reduceat(prices, first),
+        "close": prices[last],
+        "volume": volume,
+        "buy_volume": buy_volume,
+        "sell_volume": volume - buy_volume,
+        "count": last - first + 1,
+        "vwap": vwap,
+    }
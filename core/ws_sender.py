@@ -0,0 +1,146 @@
+"""
+Backpressure-aware websocket sender.
+
+The upstream feed must never wait for a browser. ``ClientSender.offer`` never
+blocks: in-progress candles are stored per key and only the latest one is
+sent (latest value wins), final candles and signals go to a bounded queue and
+are always delivered in order. A background ``run`` task does the sending,
+tracks the send latency and evicts clients that can't keep up.
+"""
+
+import asyncio
+import time
+from collections import deque
+
+# Websocket close code for "try again later"
+SLOW_CONSUMER_CLOSE_CODE = 1013
+
+
+class SlowConsumer(Exception):
+    """Raised by ``ClientSender.send`` once the client has been evicted."""
+
+
+class ClientSender:
+    """
+    Parameters:
+    send (Callable): ``await send(message)``, e.g. ``websocket.send_json``.
+    close (Callable, optional): ``await close(code=..., reason=...)``, called on eviction.
+    max_queue (int): Max undelivered final messages before the client is evicted.
+    send_timeout (float): Max seconds for one send before the client is evicted.
+    max_latency (float): Max average seconds between offer and delivery.
+    """
+
+    def __init__(
+        self,
+        send,
+        close=None,
+        max_queue: int = 256,
+        send_timeout: float = 5.0,
+        max_latency: float = 10.0,
+    ):
+        self._send = send
+        self._close = close
+        self.max_queue = max_queue
+        self.send_timeout = send_timeout
+        self.max_latency = max_latency
+        self.reliable = deque()
+        self.latest = {}
+        self.closed = None  # Reason, once closed
+        self.sent = 0
+        self.conflated = 0
+        self.latency_avg = 0.0
+        self.latency_max = 0.0
+        self._wake = asyncio.Event()
+
+    def offer(self, message, key="default", reliable: bool = False) -> bool:
+        """
+        Queue ``message`` without waiting.
+
+        ``reliable`` messages (final candles, signals) are always delivered; the
+        others replace any undelivered message with the same ``key``.
+
+        Returns:
+        bool: False if the client is closed and the message was dropped.
+        """
+        if self.closed:
+            return False
+        now = time.monotonic()
+        if reliable:
+            if len(self.reliable) >= self.max_queue:
+                self.evict(f"slow consumer: {len(self.reliable)} messages queued")
+                return False
+            self.reliable.append((message, now))
+            # The final version supersedes the in-progress one
+            if self.latest.pop(key, None) is not None:
+                self.conflated += 1
+        else:
+            if key in self.latest:
+                self.conflated += 1
+            self.latest[key] = (message, now)
+        self._wake.set()
+        return True
+
+    def evict(self, reason: str):
+        if self.closed:
+            return
+        self.closed = reason
+        print(f"Evicting websocket client: {reason}")
+        self.reliable.clear()
+        self.latest.clear()
+        self._wake.set()
+        if self._close is not None:
+            # Close reasons are limited to 123 bytes
+            asyncio.create_task(self._close_quietly(reason[:120]))
+
+    async def _close_quietly(self, reason: str):
+        try:
+            await self._close(code=SLOW_CONSUMER_CLOSE_CODE, reason=reason)
+        except Exception:
+            pass
+
+    async def send(self, message, offered_at: float = None):
+        """Send right away, with the timeout and latency checks."""
+        if self.closed:
+            raise SlowConsumer(self.closed)
+        start = time.monotonic()
+        try:
+            await asyncio.wait_for(self._send(message), self.send_timeout)
+        except asyncio.TimeoutError:
+            self.evict(f"slow consumer: send took more than {self.send_timeout}s")
+            raise SlowConsumer(self.closed) from None
+
+        latency = time.monotonic() - (offered_at or start)
+        self.sent += 1
+        self.latency_max = max(self.latency_max, latency)
+        self.latency_avg = 0.8 * self.latency_avg + 0.2 * latency
+        if self.latency_avg > self.max_latency:
+            self.evict(f"slow consumer: average latency {self.latency_avg:.1f}s")
+
+    async def run(self):
+        """Deliver queued messages until the client is closed or evicted."""
+        try:
+            while not self.closed:
+                self._wake.clear()
+                while self.reliable:
+                    await self.send(*self.reliable.popleft())
+                for key in list(self.latest):
+                    item = self.latest.pop(key, None)
+                    if item is not None:
+                        await self.send(*item)
+                if not self.reliable and not self.latest:
+                    await self._wake.wait()
+        except SlowConsumer:
+            pass
+        except Exception as e:
+            # Usually the client went away
+            self.closed = self.closed or f"send failed: {e!r}"
+
+    def stats(self) -> dict:
+        return {
+            "closed": self.closed,
+            "sent": self.sent,
+            "conflated": self.conflated,
+            "queued": len(self.reliable) + len(self.latest),
+            "latency_avg_ms": round(self.latency_avg * 1000, 3),
+            "latency_max_ms": round(self.latency_max * 1000, 3),
+        }
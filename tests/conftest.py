@@ -0,0 +1,67 @@
+import threading
+import time
+
+import numpy as np
+import pandas as pd
+import pytest
+import uvicorn
+
+from core import brokers_api
+from core.mock_exchange import create_app
+
+
+def _make_candles(n=300, seed=0, start=0):
+    rng = np.random.default_rng(seed)
+    close = 100 + np.cumsum(rng.normal(0, 1, n))
+    return pd.DataFrame(
+        {
+            "timestamp": (start + np.arange(n)) * 60,
+            "open": close + rng.normal(0, 0.5, n),
+            "high": close + rng.uniform(0, 2, n),
+            "low": close - rng.uniform(0, 2, n),
+            "close": close,
+            "volume": rng.uniform(1, 10, n),
+        }
+    )
+
+
+@pytest.fixture
+def make_candles():
+    """Random walk 1min candles: ``make_candles(n=300, seed=0, start=0)``."""
+    return _make_candles
+
+
+@pytest.fixture
+def start_mock_exchange(monkeypatch):
+    """
+    Start mock KuCoin servers (``core.mock_exchange``) on free local ports:
+    ``start_mock_exchange(**create_app_kwargs)``. ``brokers_api`` uses the
+    last one started, its URL is returned.
+    """
+    servers = []
+
+    def start(**kwargs):
+        server = uvicorn.Server(
+            uvicorn.Config(
+                create_app(**kwargs), host="127.0.0.1", port=0, log_level="warning"
+            )
+        )
+        thread = threading.Thread(target=server.run, daemon=True)
+        thread.start()
+        servers.append((server, thread))
+        while not server.started:
+            time.sleep(0.01)
+        port = server.servers[0].sockets[0].getsockname()[1]
+        url = f"http://127.0.0.1:{port}"
+        monkeypatch.setattr(brokers_api, "KUCOIN_API_URL", url)
+        return url
+
+    yield start
+    for server, thread in servers:
+        server.should_exit = True
+        thread.join()
+
+
+@pytest.fixture
+def mock_exchange(start_mock_exchange):
+    return start_mock_exchange(rate=500, ticks_per_candle=3, history=200)
@@ -0,0 +1,75 @@
+import sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.candles import FIELDS, CandleBuffer, Candles
+
+
+def test_views_share_memory(make_candles):
+    candles = Candles.from_frame(make_candles(500))
+    df = candles.to_frame()
+    assert list(df.columns) == ["timestamp", "open", "high", "low", "close", "volume"]
+    assert np.shares_memory(df["close"].to_numpy(), candles.close)
+    assert df["timestamp"].dtype == "int64"
+
+    start = int(candles.time[100])
+    window = candles.between(start, start + 60 * 50)
+    assert len(window) == 50 and window.time[0] == start
+    assert np.shares_memory(window.close, candles.close)
+    assert len(candles.between(end=start)) == 100
+
+
+def test_from_rows_kucoin_order():
+    rows = [
+        ["120", "2", "3", "4", "1", "10", "30"],
+        ["60", "1", "2", "3", "0.5", "5", "10"],
+    ]
+    columns = ("time", "open", "close", "high", "low", "volume", "turnover")
+    candles = Candles.from_rows(rows, columns).sorted()
+    assert candles.time.tolist() == [60, 120]
+    assert candles[1] == {
+        "time": 120,
+        "open": 2.0,
+        "high": 4.0,
+        "low": 1.0,
+        "close": 3.0,
+        "volume": 10.0,
+    }
+
+
+def test_buffer_keeps_last_candles(make_candles):
+    candles = Candles.from_frame(make_candles(2500))
+    buffer = CandleBuffer(100)
+    buffer.extend(candles[:30])
+    for i, candle in enumerate(candles[30:], start=31):
+        buffer.append(candle)
+        assert len(buffer) == min(100, i)
+        assert buffer.last_time == candle["time"]
+    view = buffer.view()
+    for field in FIELDS:
+        assert np.array_equal(getattr(view, field), getattr(candles, field)[-100:])
+    assert buffer.last_time == candles.time[-1]
+
+    buffer.extend(candles[:250])
+    assert np.array_equal(buffer.view().time, candles.time[150:250])
+
+
+def test_buffer_needs_room_for_a_candle():
+    with pytest.raises(ValueError):
+        CandleBuffer(0)
+
+
+def test_memory_footprint(make_candles):
+    n = 10_000
+    candles = Candles.from_frame(make_candles(n), dtype="float32")
+    records = candles.to_frame().to_dict(orient="records")
+    dict_bytes = sum(
+        sys.getsizeof(record) + sum(sys.getsizeof(v) for v in record.values())
+        for record in records
+    )
+    assert candles.nbytes / n == 28
+    assert dict_bytes / candles.nbytes >= 10
+    assert Candles.from_frame(make_candles(n)).nbytes / n == 48
+    assert isinstance(candles.astype("float64").to_frame(), pd.DataFrame)
@@ -0,0 +1,45 @@
+from core.strategiez import consistency
+from core.strategiez.incremental import LiveSmaCross, SmaCross
+
+
+def test_live_and_batch_signals_agree(make_candles):
+    df = make_candles(3000)
+    for window, lookback in ((5, 3), (21, 3), (10, 2)):
+        report = consistency.check_consistency(df, window, lookback)
+        assert report["consistent"], report["divergences"][:3]
+        assert report["batch_signals"] == report["live_signals"] > 0
+
+
+def test_divergences_are_reported(monkeypatch, make_candles):
+    class IncludesCurrentCandle(SmaCross):
+        # The old /ws/kucoin rule: the lookback window includes the current candle
+        def update(self, high, low, close):
+            self.prev_high.append(high)
+            self.prev_low.append(low)
+            return super().update(high, low, close)
+
+    monkeypatch.setattr(consistency, "SmaCross", IncludesCurrentCandle)
+    report = consistency.check_consistency(make_candles(3000), 5, 3)
+    assert not report["consistent"]
+    assert {d["field"] for d in report["divergences"]} == {"signal"}
+    assert all(d["batch_signal"] != d["live_signal"] for d in report["divergences"])
+
+
+def test_open_candle_ticks_never_signal(make_candles):
+    df = make_candles(1000)
+    _, expected = consistency.batch_signals(df, 5, 3)
+    live = LiveSmaCross(5, 3)
+    live.seed(df.iloc[:100].rename(columns={"timestamp": "time"}).to_dict("records"))
+    sides = []
+    for candle in (
+        df.iloc[100:].rename(columns={"timestamp": "time"}).to_dict("records")
+    ):
+        # In-progress updates far outside the final range, as a spike would give
+        for close in (candle["close"] * 1.5, candle["close"] * 0.5):
+            tick = {**candle, "close": close, "high": close, "low": close}
+            assert live.update({**tick, "is_final": False}) is None
+        sides.append(live.update({**candle, "is_final": True}))
+        # A repeated final update of the same candle
+        assert live.update({**candle, "is_final": True}) is None
+    assert sides == expected[100:]
+    assert any(sides)
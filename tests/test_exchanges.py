@@ -0,0 +1,64 @@
+import asyncio
+from contextlib import aclosing
+
+import pandas as pd
+import pytest
+
+from core.exchanges import (
+    get_exchange,
+    normalize_candles,
+    normalize_interval,
+    normalize_symbol,
+)
+
+
+def test_normalization():
+    for symbol in ("BTCUSDT", "btcusdt", "BTC-USDT", "BTC/USDT", "btc_usdt"):
+        assert normalize_symbol(symbol) == "BTC-USDT"
+    assert normalize_symbol("ETHBTC") == "ETH-BTC"
+    assert normalize_interval("1m") == normalize_interval("1min") == "1min"
+    assert normalize_interval("4h") == "4hour"
+    with pytest.raises(ValueError):
+        normalize_interval("7min")
+
+    binance = get_exchange("binance")
+    assert (binance.symbol("BTC-USDT"), binance.interval("1min")) == ("BTCUSDT", "1m")
+
+    recorded = pd.read_csv("tests/Historical_data.csv")
+    df = normalize_candles(recorded)
+    assert list(df.columns) == ["timestamp", "open", "high", "low", "close", "volume"]
+    assert df["timestamp"].is_monotonic_increasing
+    assert df["close"].iloc[-1] == recorded["Close"].iloc[0]
+
+    prices = recorded.drop(columns=["Volume"])
+    assert normalize_candles(prices)["volume"].eq(0).all()
+    with pytest.raises(ValueError, match="close"):
+        normalize_candles(prices.drop(columns=["Close"]))
+    with pytest.raises(ValueError, match="timestamp"):
+        normalize_candles(prices.drop(columns=["Date"]))
+
+
+def test_kucoin_adapter_on_mock_exchange(mock_exchange):
+    exchange = get_exchange("kucoin")
+    history = exchange.history("ethusdt", "1m", limit=50)
+    assert len(history) == 50
+    assert history["timestamp"].diff().iloc[1:].eq(60).all()
+
+    async def collect():
+        candles = []
+        async with aclosing(exchange.candles("ETHUSDT", "1m")) as stream:
+            async for candle in stream:
+                candles.append(candle)
+                if len(candles) == 8:
+                    return candles
+
+    candles = asyncio.run(collect())
+    # 3 ticks per candle, the final one is repeated with is_final when the next starts
+    assert [c["is_final"] for c in candles] == [False] * 3 + [True] + [False] * 3 + [
+        True
+    ]
+    first, final = candles[0], candles[3]
+    # The last history candle is the one in progress
+    assert first["time"] == final["time"] == history["timestamp"].iloc[-1]
+    assert final["close"] == candles[2]["close"]
+    assert candles[4]["time"] == final["time"] + 60
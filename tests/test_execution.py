@@ -0,0 +1,52 @@
+import numpy as np
+import pytest
+
+from core.strategiez.backtest import simulate_trades
+from core.strategiez.execution import (
+    ExecutionModel,
+    signals_to_masks,
+    simulate_execution,
+)
+
+
+def test_frictionless_long_matches_simple_backtest(make_candles):
+    df = make_candles(500)
+    rng = np.random.default_rng(3)
+    buy = rng.random(500) < 0.05
+    sell = ~buy & (rng.random(500) < 0.05)
+    close = df["close"].to_numpy()
+
+    model = ExecutionModel(maker_fee=0, taker_fee=0)
+    result = simulate_execution(
+        df["open"], df["high"], df["low"], close, buy, sell, model
+    )
+    entries, exits, _ = simulate_trades(close, buy, sell)
+    assert [t["entry_index"] for t in result["trades"]] == entries.tolist()
+    assert [t["exit_index"] for t in result["trades"]] == exits.tolist()
+    assert result["total_fees"] == 0
+
+
+def test_stop_loss_fees_and_shorts():
+    close = np.array([100.0, 100, 100, 100, 100])
+    high = close + 1
+    low = np.array([99.0, 99, 90, 99, 99])
+    buy = np.array([True, False, False, False, False])
+    sell = np.array([False, False, False, True, False])
+
+    model = ExecutionModel(maker_fee=0, taker_fee=0.001, stop_loss=0.05, side="BOTH")
+    result = simulate_execution(close, high, low, close, buy, sell, model)
+    long, short = result["trades"]
+    assert long["exit_reason"] == "stop_loss" and long["exit_price"] == 95.0
+    assert short["side"] == "SHORT" and short["exit_reason"] == "end"
+    assert np.isclose(result["total_fees"], sum(t["fees"] for t in result["trades"]))
+    assert result["final_balance"] < 10000 * 0.95
+
+
+def test_signals_to_masks_needs_oldest_first():
+    times = [60.0, 120.0, 180.0]
+    signals = [{"timestamp": 120, "type": "BUY"}, (180, 1.0, "SELL"), (90, 1.0, "BUY")]
+    buy, sell = signals_to_masks(times, signals)
+    assert buy.tolist() == [False, True, False]
+    assert sell.tolist() == [False, False, True]
+    with pytest.raises(ValueError):
+        signals_to_masks(times[::-1], signals)
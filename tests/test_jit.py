@@ -0,0 +1,73 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.strategiez import jit
+from core.strategiez.operators import cross_over
+
+BACKENDS = [
+    "numpy",
+    pytest.param(
+        "numba",
+        marks=pytest.mark.skipif(
+            jit.BACKEND != "numba", reason="numba is not installed"
+        ),
+    ),
+]
+
+
+def reference_positions(buy, sell):
+    entries, exits = [], []
+    in_position = False
+    for i in range(len(buy)):
+        if buy[i] and not in_position:
+            entries.append(i)
+            in_position = True
+        elif sell[i] and in_position:
+            exits.append(i)
+            in_position = False
+    return entries, exits
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_kernels_match_reference(backend):
+    rng = np.random.default_rng(0)
+    for n in (0, 1, 2, 50, 500):
+        buy = rng.random(n) < 0.2
+        sell = rng.random(n) < 0.2
+        entries, exits = jit.position_events(buy, sell, backend)
+        assert (entries.tolist(), exits.tolist()) == reference_positions(buy, sell)
+
+        values = 100 + rng.normal(0, 1, n).cumsum()
+        first, second = values, values[::-1].copy()
+        expected = next(
+            (
+                i
+                for i in range(1, n)
+                if (first[i - 1] <= second[i - 1] and first[i] > second[i])
+                or (first[i - 1] >= second[i - 1] and first[i] < second[i])
+            ),
+            -1,
+        )
+        assert jit.first_cross(first, second, backend) == expected
+
+
+def test_backends_are_identical():
+    if jit.BACKEND != "numba":
+        pytest.skip("numba is not installed")
+    rng = np.random.default_rng(2)
+    close = 100 + rng.normal(0, 1, 5000).cumsum()
+    buy, sell = rng.random(5000) < 0.1, rng.random(5000) < 0.1
+    for a, b in zip(
+        jit.position_events(buy, sell, "numpy"), jit.position_events(buy, sell, "numba")
+    ):
+        np.testing.assert_array_equal(a, b)
+    assert jit.first_cross(close, close[::-1].copy(), "numpy") == jit.first_cross(
+        close, close[::-1].copy(), "numba"
+    )
+
+
+def test_cross_over():
+    candles = pd.DataFrame({"Close": [1.0, 2.0, 3.0, 4.0]})
+    assert cross_over(candles, first_indicator=lambda c: pd.Series([3.0] * 4))
+    assert not cross_over(candles, first_indicator=lambda c: pd.Series([9.0] * 4))
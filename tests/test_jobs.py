@@ -0,0 +1,226 @@
+import json
+import sqlite3
+import time
+from types import SimpleNamespace
+
+import pytest
+
+from core import brokers_api, jobs
+from core.candles import Candles
+from core.journal import SignalJournal
+from core.strategiez import robustness
+
+PARAMS = {
+    "api": "kucoin",
+    "symbol": "BTC-USDT",
+    "interval": "1min",
+    "limit": 150,
+    "windows": [10, 20],
+    "lookbacks": [2, 3],
+}
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    """
+    ``time.time()`` shifted to the middle of a minute, plus ``clock.offset``
+    seconds: cache keys don't change between two submissions of a test.
+    """
+    real_time = time.time
+    shift = 30 - real_time() % 60
+    clock = SimpleNamespace(offset=0)
+    monkeypatch.setattr(jobs.time, "time", lambda: real_time() + shift + clock.offset)
+    return clock
+
+
+@pytest.fixture
+def manager(tmp_path, mock_exchange, clock, monkeypatch):
+    # Spawned workers read the exchange URL from the environment
+    monkeypatch.setenv("KUCOIN_API_URL", brokers_api.KUCOIN_API_URL)
+    manager = jobs.JobManager(str(tmp_path / "jobs.db"), max_workers=1)
+    yield manager
+    manager.close()
+
+
+def test_run_and_cache(manager):
+    job, cached = manager.submit("sensitivity", PARAMS)
+    assert not cached and job["status"] in ("queued", "running")
+    job = manager.wait(job["id"], timeout=60)
+    assert job["status"] == "done", job["error"]
+    assert job["progress"] == 1.0
+    assert len(job["result"]["profit"]) == 2
+
+    again, cached = manager.submit("sensitivity", dict(reversed(PARAMS.items())))
+    assert cached and again["id"] == job["id"] and again["result"] == job["result"]
+    fresh, cached = manager.submit("sensitivity", PARAMS, use_cache=False)
+    assert not cached and fresh["id"] != job["id"]
+    assert [j["id"] for j in manager.list(kind="sensitivity")] == [
+        fresh["id"],
+        job["id"],
+    ]
+
+    with pytest.raises(ValueError):
+        manager.submit("unknown", {})
+
+
+def test_cache_expires_with_new_candles(
+    tmp_path, start_mock_exchange, clock, monkeypatch
+):
+    path = str(tmp_path / "jobs.db")
+    results = []
+    for seed, offset in ((0, 0), (0, 0), (1, 60)):
+        clock.offset = offset
+        # Spawned workers read the exchange URL from the environment
+        monkeypatch.setenv(
+            "KUCOIN_API_URL", start_mock_exchange(history=200, seed=seed)
+        )
+        manager = jobs.JobManager(path, max_workers=1)
+        try:
+            job, cached = manager.submit("sensitivity", PARAMS)
+            results.append((cached, manager.wait(job["id"], timeout=60)))
+        finally:
+            manager.close()
+    (_, first), (cached, again), (refreshed, later) = results
+    # Same candles: the cached job, even though the history changed
+    assert cached and again["id"] == first["id"]
+    # A new candle opened: the job runs again on the new history
+    assert not refreshed and later["id"] != first["id"]
+    assert later["status"] == "done"
+    assert later["result"]["profit"] != first["result"]["profit"]
+
+
+def test_invalid_params_are_rejected_on_submit(tmp_path):
+    manager = jobs.JobManager(str(tmp_path / "jobs.db"), max_workers=1)
+    try:
+        for kind, params in (
+            ("walk_forward", {k: v for k, v in PARAMS.items() if k != "windows"}),
+            ("portfolio_backtest", {"api": "kucoin", "interval": "1min"}),
+            ("sensitivity", {**PARAMS, "interval": 5}),
+            ("sensitivity", {**PARAMS, "windows": []}),
+            ("sensitivity", {**PARAMS, "interval": "7min"}),
+        ):
+            with pytest.raises(ValueError):
+                manager.submit(kind, params)
+        assert manager.list() == []
+    finally:
+        manager.close()
+
+
+def test_backfills_are_never_cached(tmp_path):
+    manager = jobs.JobManager(str(tmp_path / "jobs.db"), max_workers=1)
+    try:
+        params = {"api": "kucoin", "interval": "1min", "symbols": ["BTC-USDT"]}
+        first, _ = manager.submit(
+            "signal_backfill", params, not_before=time.time() + 60
+        )
+        again, cached = manager.submit(
+            "signal_backfill", params, not_before=time.time() + 60
+        )
+        assert not cached and again["id"] != first["id"]
+    finally:
+        manager.close()
+
+
+def test_queue_survives_restart(tmp_path):
+    path = str(tmp_path / "jobs.db")
+    manager = jobs.JobManager(path, max_workers=1)
+    delayed, _ = manager.submit("sensitivity", PARAMS, not_before=time.time() + 3600)
+    other, _ = manager.submit("walk_forward", PARAMS, not_before=time.time() + 3600)
+    manager.close()
+
+    # A job interrupted while running
+    with sqlite3.connect(path) as connection:
+        connection.execute(
+            "UPDATE jobs SET status = 'running' WHERE id = ?", (other["id"],)
+        )
+
+    manager = jobs.JobManager(path, max_workers=1)
+    try:
+        assert manager.get(delayed["id"])["status"] == "queued"
+        assert manager.get(other["id"])["status"] == "queued"
+        assert manager.cancel(delayed["id"])["status"] == "cancelled"
+        # Cancelled jobs aren't served from the cache
+        _, cached = manager.submit("sensitivity", PARAMS, not_before=time.time() + 60)
+        assert not cached
+    finally:
+        manager.close()
+
+
+def test_running_job_stops_on_cancel(tmp_path, monkeypatch):
+    connection = jobs._connect(str(tmp_path / "jobs.db"))
+    connection.executescript(jobs.SCHEMA)
+    with connection:
+        job_id = connection.execute(
+            "INSERT INTO jobs (kind, params, key, status, not_before, created_at) "
+            "VALUES ('slow', '{}', '', 'running', 0, 0)"
+        ).lastrowid
+    steps = []
+
+    def slow(params, progress, context):
+        for i in range(100):
+            steps.append(i)
+            if i == 5:
+                with connection:
+                    connection.execute("UPDATE jobs SET cancel_requested = 1")
+            progress(i / 100, f"step {i}")
+
+    monkeypatch.setitem(jobs.JOB_KINDS, "slow", (slow, (), ()))
+    # In-process, as a worker runs it
+    jobs._run_job(str(tmp_path / "jobs.db"), job_id, {})
+    row = connection.execute("SELECT status, message FROM jobs").fetchone()
+    connection.close()
+    assert steps == list(range(6))
+    assert tuple(row) == ("cancelled", "step 5")
+
+
+def test_running_walk_forward_stops_on_cancel(tmp_path, monkeypatch, make_candles):
+    path = str(tmp_path / "jobs.db")
+    connection = jobs._connect(path)
+    connection.executescript(jobs.SCHEMA)
+    params = {**PARAMS, "windows": [10, 20, 50], "train_size": 500, "test_size": 250}
+    with connection:
+        job_id = connection.execute(
+            "INSERT INTO jobs (kind, params, key, status, not_before, created_at) "
+            "VALUES ('walk_forward', ?, '', 'running', 0, 0)",
+            (json.dumps(params),),
+        ).lastrowid
+    candles = make_candles(3000)
+    monkeypatch.setattr(jobs, "_history", lambda params, symbol: candles)
+    monkeypatch.setattr(jobs, "PROGRESS_INTERVAL", 0)
+    runs = []
+    profit = robustness.IndicatorCache.profit
+
+    def cancel_at_fifth_run(self, *args):
+        runs.append(args)
+        if len(runs) == 5:
+            with connection:
+                connection.execute("UPDATE jobs SET cancel_requested = 1")
+        return profit(self, *args)
+
+    monkeypatch.setattr(robustness.IndicatorCache, "profit", cancel_at_fifth_run)
+    jobs._run_job(path, job_id, {})
+    row = connection.execute("SELECT status, progress FROM jobs").fetchone()
+    connection.close()
+    # 10 folds x 6 in-sample runs + 10 out-of-sample ones, stopped after the fifth
+    assert len(runs) == 5
+    assert row["status"] == "cancelled" and 0.1 < row["progress"] < 0.2
+
+
+def test_backfill_journals_normalized_symbols(tmp_path, monkeypatch, make_candles):
+    candles = Candles.from_frame(make_candles())
+    monkeypatch.setattr(jobs, "_history", lambda params, symbol: candles)
+    path = str(tmp_path / "signals.db")
+    params = {
+        **PARAMS,
+        "symbols": ["btcusdt"],
+        "strategies": [{"operator": "smacrossprice", "params": {"window": 10}}],
+    }
+    result = jobs.run_signal_backfill(
+        params, lambda *args: None, {"journal_path": path}
+    )
+    assert list(result["signals"]) == ["BTC-USDT"]
+
+    signals = SignalJournal(path)
+    recorded, _ = signals.query(symbol="BTC-USDT", limit=1000)
+    signals.close()
+    assert len(recorded) == result["signals"]["BTC-USDT"] > 0
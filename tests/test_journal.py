@@ -0,0 +1,37 @@
+from core.journal import SignalJournal
+
+
+def test_journal_dedupes_and_paginates(tmp_path):
+    journal = SignalJournal(str(tmp_path / "signals.db"))
+    common = dict(
+        source="batch",
+        strategy="smacrossprice",
+        params={"window": 21},
+        interval="1min",
+    )
+    signals = [
+        {"timestamp": 60 * i, "price": 100.0 + i, "type": "BUY" if i % 2 else "SELL"}
+        for i in range(25)
+    ]
+    journal.record_many(signals, symbol="BTC-USDT", **common)
+    journal.record_many(signals[:5], symbol="BTC-USDT", **common)  # duplicates
+    journal.record_many(signals[:3], symbol="ETH-USDT", **common)
+    journal.flush()
+
+    pages, cursor = [], None
+    while True:
+        page, cursor = journal.query(symbol="BTC-USDT", limit=10, cursor=cursor)
+        pages.append(page)
+        if cursor is None:
+            break
+    times = [signal["candle_time"] for page in pages for signal in page]
+    assert [len(page) for page in pages] == [10, 10, 5]
+    assert times == sorted({60 * i for i in range(25)}, reverse=True)
+    assert pages[0][0]["params"] == {"window": 21}
+
+    buys, _ = journal.query(side="BUY", start=0, end=600, limit=100)
+    assert {signal["symbol"] for signal in buys} == {"BTC-USDT", "ETH-USDT"}
+    assert all(
+        signal["side"] == "BUY" and signal["candle_time"] <= 600 for signal in buys
+    )
+    journal.close()
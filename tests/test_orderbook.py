@@ -0,0 +1,68 @@
+import asyncio
+
+import numpy as np
+import pytest
+
+from core.orderbook import OrderBook, SequenceGap, maintain_book
+
+
+def random_levels(rng, n, low, high):
+    prices = np.round(rng.uniform(low, high, n), 2)
+    return [(float(p), float(s)) for p, s in zip(prices, rng.uniform(0, 5, n))]
+
+
+def test_book_matches_dict_reference():
+    rng = np.random.default_rng(0)
+    book = OrderBook("BTC-USDT", capacity=4)
+    bids = dict(random_levels(rng, 50, 90, 100))
+    asks = dict(random_levels(rng, 50, 100.01, 110))
+    book.load(1, list(bids.items()), list(asks.items()))
+
+    for sequence in range(2, 2000):
+        changes = {"bids": random_levels(rng, 3, 90, 100)}
+        changes["asks"] = random_levels(rng, 3, 100.01, 110)
+        for side in ("bids", "asks"):
+            # Remove some levels
+            changes[side] += [(p, 0.0) for p, _ in changes[side][:1]]
+        book.apply(sequence, sequence, **changes)
+        for reference, levels in ((bids, changes["bids"]), (asks, changes["asks"])):
+            for price, size in levels:
+                if size:
+                    reference[price] = size
+                else:
+                    reference.pop(price, None)
+
+    expected_bids = sorted(bids.items(), reverse=True)[:20]
+    expected_asks = sorted(asks.items())[:20]
+    snapshot = book.to_dict(20)
+    assert snapshot["bids"] == [list(level) for level in expected_bids]
+    assert snapshot["asks"] == [list(level) for level in expected_asks]
+    assert book.best_bid == expected_bids[0][0]
+    assert book.spread == pytest.approx(expected_asks[0][0] - expected_bids[0][0])
+    assert len(book.bids) == len(bids)
+
+
+def test_sequence_validation():
+    book = OrderBook("BTC-USDT")
+    book.load(10, [(99.0, 1.0)], [(101.0, 1.0)])
+    assert not book.apply(5, 10, bids=[(99.0, 0.0)])  # Already in the snapshot
+    assert book.apply(8, 12, bids=[(99.5, 2.0)])  # Overlaps the snapshot
+    assert book.best_bid == 99.5
+    with pytest.raises(SequenceGap):
+        book.apply(14, 15, asks=[(100.5, 1.0)])
+    assert book.sequence == 12
+
+
+def test_maintain_book_buffers_and_resyncs():
+    book = OrderBook("BTC-USDT")
+    snapshots = iter([(3, [(99.0, 1.0)], [(101.0, 1.0)]), (8, [(98.0, 1.0)], [])])
+
+    async def diffs():
+        for first in (2, 3, 4, 5, 7, 8, 9, 10):  # 6 is lost
+            yield {"first": first, "last": first, "bids": [(90.0 + first, 1.0)]}
+            await asyncio.sleep(0.01)
+
+    asyncio.run(maintain_book(book, diffs(), lambda: next(snapshots)))
+    assert book.resyncs == 1
+    assert book.sequence == 10
+    assert book.to_dict()["bids"] == [[100.0, 1.0], [99.0, 1.0], [98.0, 1.0]]
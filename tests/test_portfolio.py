@@ -0,0 +1,77 @@
+import numpy as np
+import pytest
+
+from core.strategiez.execution import ExecutionModel, simulate_execution
+from core.strategiez.portfolio import (
+    PortfolioLimits,
+    align_candles,
+    backtest_portfolio,
+    strategy_masks,
+)
+
+SMA_CROSS = {"operator": "smacrossprice", "params": {"window": 21}, "side": "BOTH"}
+
+
+def test_single_symbol_matches_execution_model(make_candles):
+    df = make_candles(2000, seed=1)
+    model = ExecutionModel(slippage=0.0001, stop_loss=0.002, side="BOTH")
+    result = backtest_portfolio(
+        {"BTC-USDT": df}, [SMA_CROSS], model, PortfolioLimits(1.0, 1.0)
+    )
+
+    _, panels, _ = align_candles({"BTC-USDT": df})
+    buy, sell = strategy_masks(
+        SMA_CROSS, panels["high"], panels["low"], panels["close"]
+    )
+    expected = simulate_execution(
+        df["open"], df["high"], df["low"], df["close"], buy[:, 0], sell[:, 0], model
+    )
+    assert len(result["trades"]) == len(expected["trades"])
+    assert result["final_balance"] == pytest.approx(expected["final_balance"])
+    assert result["total_fees"] == pytest.approx(expected["total_fees"])
+
+
+def test_shared_capital_respects_limits(make_candles):
+    # Symbols listed at different times share the index
+    candles = {f"S{i}": make_candles(1500, seed=i, start=50 * i) for i in range(20)}
+    strategies = [SMA_CROSS, {**SMA_CROSS, "params": {"window": 50}, "side": "LONG"}]
+    limits = PortfolioLimits(max_symbol_exposure=0.08, max_gross_exposure=0.5)
+    result = backtest_portfolio(
+        candles, strategies, ExecutionModel(position_size=0.05), limits
+    )
+
+    times, _, tradable = align_candles(candles)
+    assert len(times) == 1500 + 50 * 19
+    assert tradable.sum() == 20 * 1500
+    # Limits are enforced on entries, open positions then move with the prices
+    assert 0.4 < result["max_gross_exposure"] < 0.52
+    assert {trade["symbol"] for trade in result["trades"]} <= set(candles)
+    assert sum(result["by_strategy"]) == pytest.approx(result["final_balance"] - 10000)
+    assert result["equity"]["equity"][-1] == pytest.approx(result["final_balance"])
+
+
+def test_max_positions(make_candles):
+    candles = {f"S{i}": make_candles(1000, seed=i) for i in range(30)}
+    result = backtest_portfolio(
+        candles,
+        [SMA_CROSS],
+        ExecutionModel(position_size=0.01),
+        PortfolioLimits(max_positions=3),
+    )
+    events = sorted(
+        [(t["entry_time"], 1) for t in result["trades"]]
+        + [(t["exit_time"], -1) for t in result["trades"]]
+    )
+    # Exits come first on equal times, as in the simulation
+    assert max(np.cumsum([change for _, change in events])) <= 3
+
+
+def test_unsupported_operator(make_candles):
+    with pytest.raises(ValueError):
+        backtest_portfolio(
+            {"S": make_candles(100, seed=0)}, [{**SMA_CROSS, "operator": "rsi"}]
+        )
+    with pytest.raises(ValueError, match="window"):
+        backtest_portfolio(
+            {"S": make_candles(100, seed=0)}, [{**SMA_CROSS, "params": {"lookback": 2}}]
+        )
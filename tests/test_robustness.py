@@ -0,0 +1,56 @@
+import numpy as np
+import pandas as pd
+
+from core.strategiez.backtest import backtest_arrays, sma_cross_signal_arrays
+from core.strategiez.robustness import monte_carlo, sensitivity, walk_forward
+from core.strategiez.src_to_rafactor import backtest_signals, generate_signals
+
+
+def test_backtest_arrays_matches_backtest_signals(make_candles):
+    df = make_candles(2000)
+    signals = generate_signals(df.copy())
+    buy = [
+        (s["timestamp"], s["price"], s["type"]) for s in signals if s["type"] == "BUY"
+    ]
+    sell = [
+        (s["timestamp"], s["price"], s["type"]) for s in signals if s["type"] == "SELL"
+    ]
+    expected = backtest_signals(
+        df.assign(datetime=pd.to_datetime(df["timestamp"], unit="s")), buy, sell
+    )
+
+    sma = df["close"].rolling(50).mean().to_numpy()
+    buy_mask, sell_mask = sma_cross_signal_arrays(
+        df["high"].to_numpy(), df["low"].to_numpy(), df["close"].to_numpy(), sma
+    )
+    assert np.isclose(
+        backtest_arrays(df["close"].to_numpy(), buy_mask, sell_mask), expected
+    )
+
+
+def test_walk_forward_and_sensitivity(make_candles):
+    df = make_candles(3000)
+    fractions = []
+    result = walk_forward(
+        df,
+        windows=[10, 21, 50],
+        train_size=1000,
+        test_size=500,
+        max_workers=2,
+        progress=fractions.append,
+    )
+    assert len(result["folds"]) == 4
+    assert fractions == sorted(fractions) and fractions[-1] == 1.0
+    # 12 in-sample runs in batches of 2 (one per worker), then one call per fold
+    assert len(fractions) == 6 + 4
+    assert all(fold["window"] in (10, 21, 50) for fold in result["folds"])
+
+    heatmap = sensitivity(df, windows=[10, 21], lookbacks=[2, 3], max_workers=1)
+    assert np.array(heatmap["profit"]).shape == (2, 2)
+
+
+def test_monte_carlo_shuffle_keeps_final_balance():
+    profits = np.array([5.0, -3.0, 2.0, -1.0, 4.0])
+    result = monte_carlo(profits, runs=500, method="shuffle", seed=1)
+    assert np.allclose(list(result["final_balance"].values()), 10000 + profits.sum())
+    assert result["max_drawdown"]["95"] >= result["max_drawdown"]["5"]
@@ -0,0 +1,49 @@
+import numpy as np
+
+from core.screener import Screener
+from core.strategiez.kernels import sma_cross_masks
+from core.strategiez.src_to_rafactor import calculate_indicator_signals
+
+
+def test_screener_matches_batch_indicators(make_candles):
+    df = make_candles()
+    screener = Screener(["BTC-USDT"])
+    screener.seed("BTC-USDT", df)
+    row = screener.snapshot("BTC-USDT")
+
+    batch, _ = calculate_indicator_signals(df.copy(), "RSI", {"length": 14})
+    batch, _ = calculate_indicator_signals(batch, "MACD", {})
+    assert np.isclose(row["rsi"], batch["RSI"].iloc[-1])
+    assert np.isclose(row["macd_hist"], batch["MACD_hist"].iloc[-1])
+    assert np.isclose(row["sma"], df["close"].rolling(21).mean().iloc[-1])
+
+
+def test_screener_query_filters_and_ranks(make_candles):
+    screener = Screener()
+    for i, symbol in enumerate(["AAA-USDT", "BBB-USDT", "CCC-USDT"]):
+        screener.seed(symbol, make_candles(seed=i))
+    assert screener.ready
+
+    rsi = {row["symbol"]: row["rsi"] for row in screener.query()}
+    ranked = screener.query(sort_by="rsi", descending=True)
+    assert [row["rsi"] for row in ranked] == sorted(rsi.values(), reverse=True)
+
+    threshold = sorted(rsi.values())[1]
+    matching = screener.query([f"rsi<={threshold}"])
+    assert {row["symbol"] for row in matching} == {
+        symbol for symbol, value in rsi.items() if value <= threshold
+    }
+
+
+def test_screener_uses_strategy_lookback(make_candles):
+    df = make_candles()
+    screener = Screener(["BTC-USDT"], sma_window=10, sma_lookback=2)
+    screener.seed("BTC-USDT", df)
+    row = screener.snapshot("BTC-USDT")
+
+    buy, sell = sma_cross_masks(
+        df["high"], df["low"], df["close"], df["close"].rolling(10).mean(), 2
+    )
+    last = np.flatnonzero(buy | sell)[-1]
+    assert row["signal"] == ("BUY" if buy.iloc[last] else "SELL")
+    assert row["cross_age"] == len(df) - 1 - last
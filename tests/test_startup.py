@@ -0,0 +1,32 @@
+import os
+import subprocess
+import sys
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def test_api_import_is_lazy_and_needs_no_credentials():
+    env = {k: v for k, v in os.environ.items() if not k.startswith("BINANCE_")}
+    code = (
+        "import sys, api.main; "
+        "assert 'pandas.core.frame' not in sys.modules and 'binance' not in sys.modules"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
+
+
+def test_startup_leaves_heavy_work_to_the_warm_up(tmp_path):
+    env = {
+        **os.environ,
+        "SIGNAL_JOURNAL_PATH": str(tmp_path / "signals.db"),
+        "JOBS_DB_PATH": str(tmp_path / "jobs.db"),
+    }
+    code = (
+        "import asyncio, sys, api.main as m\n"
+        "async def main():\n"
+        "    await m.startup_event()\n"
+        "    assert 'numpy' not in sys.modules, 'numpy imported on the event loop'\n"
+        "    assert m.app.state.jobs is None and m.app.state.candle_hub is None\n"
+        "    m.app.state.warm_up_task.cancel()\n"
+        "asyncio.run(main())\n"
+    )
+    subprocess.run([sys.executable, "-c", code], cwd=ROOT, env=env, check=True)
@@ -0,0 +1,81 @@
+import io
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from core.strategiez.src_to_rafactor import calculate_indicator_signals
+from core.strategiez.streaming import (
+    CSV,
+    ChunkedIndicator,
+    check_chunks,
+    iter_chunks,
+    stream_indicator,
+)
+
+
+def make_prices(n=1000, seed=0):
+    rng = np.random.default_rng(seed)
+    return pd.DataFrame({"close": 100 + np.cumsum(rng.normal(0, 1, n))})
+
+
+def test_chunked_indicators_match_full_calculation():
+    df = make_prices()
+    for name, variables, column in [
+        ("MACD", {}, "MACD_hist"),
+        ("RSI", {"length": 14}, "RSI"),
+    ]:
+        expected, expected_signals = calculate_indicator_signals(
+            df.copy(), name, variables, detect_divergence=True
+        )
+        indicator = ChunkedIndicator(name, variables)
+        chunks = [
+            indicator.process(df.iloc[i : i + 97].copy()) for i in range(0, len(df), 97)
+        ]
+        result = pd.concat(chunks)
+        np.testing.assert_allclose(result[column], expected[column])
+        signals = indicator.signals(detect_divergence=True)
+        assert signals["side"] == expected_signals["side"]
+
+
+def test_stream_indicator_from_csv():
+    df = make_prices(200)
+    upload = io.BytesIO(df.to_csv(index=False).encode())
+    lines = list(
+        stream_indicator(
+            iter_chunks(upload, CSV, chunk_rows=50), ChunkedIndicator("RSI", {})
+        )
+    )
+    rows = [json.loads(line) for chunk in lines[:-1] for line in chunk.splitlines()]
+    assert len(rows) == 200
+    assert "signals" in json.loads(lines[-1])
+
+
+def test_check_chunks_rejects_bad_uploads():
+    df = make_prices(120)
+    frames = check_chunks(
+        iter_chunks(io.BytesIO(df.to_csv(index=False).encode()), CSV, 50),
+        ChunkedIndicator("RSI", {}),
+    )
+    assert [len(frame) for frame in frames] == [50, 50, 20]
+
+    upload = io.BytesIO(
+        df.rename(columns={"close": "price"}).to_csv(index=False).encode()
+    )
+    with pytest.raises(ValueError, match="close"):
+        check_chunks(iter_chunks(upload, CSV, 50), ChunkedIndicator("RSI", {}))
+    with pytest.raises(ValueError, match="no rows"):
+        check_chunks(
+            iter_chunks(io.BytesIO(b"close\n"), CSV, 50), ChunkedIndicator("RSI", {})
+        )
+    with pytest.raises(ValueError):
+        check_chunks(
+            iter_chunks(io.BytesIO(b"close\nabc\n1\n"), CSV, 50),
+            ChunkedIndicator("RSI", {}),
+        )
+    with pytest.raises(ValueError):
+        upload = io.BytesIO(df.to_csv(index=False).encode())
+        check_chunks(
+            iter_chunks(upload, CSV, 50), ChunkedIndicator("RSI", {"length": "x"})
+        )
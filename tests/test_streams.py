@@ -0,0 +1,137 @@
+import asyncio
+
+from core.strategiez.kernels import sma_cross_masks
+from core.streams import CandleHub, ClientSession, encode_delta, make_indicator
+
+
+def test_encode_delta_only_sends_changed_fields():
+    first = {"time": 60, "open": 1.0, "close": 1.0, "is_final": False}
+    data, full = encode_delta(first, {})
+    assert full and data == first
+
+    data, full = encode_delta({**first, "close": 1.5}, data)
+    assert not full and data == {"time": 60, "close": 1.5}
+    assert encode_delta(first, first) == (None, False)
+
+
+def test_session_conflates_in_progress_and_keeps_final_candles():
+    async def candles(symbol, interval):
+        for i in range(50):
+            yield {
+                "time": 60,
+                "open": 1.0,
+                "high": 2.0,
+                "low": 0.5,
+                "close": 1.0 + i,
+                "volume": 1.0,
+                "is_final": False,
+            }
+        yield {
+            "time": 120,
+            "open": 1.0,
+            "high": 2.0,
+            "low": 0.5,
+            "close": 9.0,
+            "volume": 1.0,
+            "is_final": True,
+        }
+        await asyncio.sleep(10)
+
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        session = ClientSession(CandleHub(candles), send)
+        runner = asyncio.create_task(session.run())
+        await session.handle(
+            {
+                "op": "subscribe",
+                "symbol": "BTC-USDT",
+                "interval": "1min",
+                "indicators": ["sma:2"],
+                "fields": ["close", "sma:2"],
+                "rate": 1,
+            }
+        )
+        await asyncio.sleep(0.1)
+        runner.cancel()
+        session.close()
+        return sent
+
+    sent = asyncio.run(scenario())
+    assert sent[0] == {"type": "subscribed", "stream": "BTC-USDT:1min"}
+    candles_sent = [message for message in sent if message["type"] == "candle"]
+    # 50 in-progress ticks conflated into far fewer messages, final candle delivered
+    assert len(candles_sent) < 5
+    assert candles_sent[-1]["data"]["is_final"] is True
+    assert set(candles_sent[-1]["data"]) <= {"time", "close", "sma:2", "is_final"}
+
+
+def test_spellings_of_a_market_share_one_feed():
+    async def candles(symbol, interval):
+        await asyncio.sleep(10)
+        yield
+
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        hub = CandleHub(candles)
+        sessions = [ClientSession(hub, send) for _ in range(3)]
+        for session, (symbol, interval) in zip(
+            sessions, (("btcusdt", "1m"), ("BTC/USDT", "1min"), ("BTC-USDT", "7m"))
+        ):
+            await session.handle(
+                {"op": "subscribe", "symbol": symbol, "interval": interval}
+            )
+        feeds = list(hub.feeds)
+        for session in sessions:
+            session.close()
+        return feeds, sent, sessions[2].errors
+
+    feeds, sent, errors = asyncio.run(scenario())
+    assert feeds == ["BTC-USDT:1min"]
+    assert sent == [{"type": "subscribed", "stream": "BTC-USDT:1min"}] * 2
+    assert errors[0]["type"] == "error"
+
+
+def test_signal_spec_takes_window_and_lookback(make_candles):
+    df = make_candles()
+    indicator = make_indicator("signal:10:2")
+    sides = [indicator(candle) for candle in df.to_dict("records")]
+
+    buy, sell = sma_cross_masks(
+        df["high"], df["low"], df["close"], df["close"].rolling(10).mean(), 2
+    )
+    assert sides == ["BUY" if b else "SELL" if s else None for b, s in zip(buy, sell)]
+
+
+def test_hub_is_ready_once_every_feed_streamed():
+    async def candles(symbol, interval):
+        await asyncio.sleep(0.05)
+        yield {"time": 60, "close": 1.0, "is_final": False}
+        await asyncio.sleep(10)
+
+    async def scenario():
+        async def send(message):
+            pass
+
+        hub = CandleHub(candles)
+        session = ClientSession(hub, send)
+        runner = asyncio.create_task(session.run())
+        states = [hub.ready]
+        await session.handle(
+            {"op": "subscribe", "symbol": "BTC-USDT", "interval": "1min"}
+        )
+        states.append(hub.ready)
+        await asyncio.sleep(0.1)
+        states.append(hub.ready)
+        runner.cancel()
+        session.close()
+        return states
+
+    assert asyncio.run(scenario()) == [True, False, True]
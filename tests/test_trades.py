@@ -0,0 +1,28 @@
+import numpy as np
+import pytest
+
+from core.trades import TRADE_CANDLE_FIELDS, TradeAggregator, aggregate_trades
+
+
+def test_streaming_matches_batch():
+    rng = np.random.default_rng(0)
+    times = np.sort(rng.uniform(0, 3600, 5000))
+    prices = 100 + rng.normal(0, 1, 5000).cumsum()
+    sizes = rng.uniform(0.01, 2, 5000)
+    is_buy = rng.random(5000) < 0.5
+
+    aggregator = TradeAggregator(interval=60)
+    for t, price, size, buy in zip(times, prices, sizes, is_buy):
+        aggregator.add(t, price, size, "buy" if buy else "sell")
+    aggregator.add(times[0], prices[0], 1.0, "buy")  # Late trade, dropped
+    streamed = [*aggregator.candles, aggregator.current()]
+
+    batch = aggregate_trades(times, prices, sizes, is_buy, interval=60)
+    assert len(streamed) == len(batch["time"]) == 60
+    assert aggregator.late == 1
+    for field in TRADE_CANDLE_FIELDS:
+        assert [candle[field] for candle in streamed] == pytest.approx(
+            batch[field].tolist()
+        ), field
+    assert batch["count"].sum() == 5000
+    assert np.all((batch["vwap"] >= batch["low"]) & (batch["vwap"] <= batch["high"]))
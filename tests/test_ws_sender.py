@@ -0,0 +1,49 @@
+import asyncio
+
+from core.ws_sender import ClientSender
+
+
+def test_latest_value_wins_and_finals_are_delivered_in_order():
+    async def scenario():
+        sent = []
+
+        async def send(message):
+            sent.append(message)
+
+        sender = ClientSender(send)
+        for i in range(10):
+            sender.offer({"close": i}, key="candle")
+        sender.offer({"close": 10, "is_final": True}, key="candle", reliable=True)
+        sender.offer({"close": 11}, key="candle")
+        running = asyncio.create_task(sender.run())
+        await asyncio.sleep(0.01)
+        running.cancel()
+        return sent, sender
+
+    sent, sender = asyncio.run(scenario())
+    assert sent == [{"close": 10, "is_final": True}, {"close": 11}]
+    assert sender.conflated == 10
+
+
+def test_slow_client_is_evicted_without_blocking_offers():
+    async def scenario():
+        closed = []
+
+        async def send(message):
+            await asyncio.sleep(1)
+
+        async def close(code, reason):
+            closed.append(code)
+
+        sender = ClientSender(send, close=close, max_queue=5, send_timeout=0.05)
+        running = asyncio.create_task(sender.run())
+        accepted = [sender.offer(i, reliable=True) for i in range(3)]
+        await asyncio.sleep(0.1)
+        accepted.append(sender.offer(3, reliable=True))
+        await running
+        return accepted, closed, sender
+
+    accepted, closed, sender = asyncio.run(scenario())
+    assert accepted == [True, True, True, False]
+    assert sender.closed.startswith("slow consumer")
+    assert closed == [1013]